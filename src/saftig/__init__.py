@@ -1,30 +1,102 @@
 """Static & Adaptive Filtering In Gravitational-wave-research
 Implementations of prediction techniques with a unified interface.
+
+Filters and submodules are imported on first access (PEP 562), so that ``import saftig``
+does not load numba, scipy, the compiled extension or the dependencies of ``saftig.external``.
 """
 
-from saftig import external
+from importlib import import_module
+from typing import TYPE_CHECKING
 
 from .common import RMS, total_power
 from .evaluation import (
     TestDataGenerator,
     residual_power_ratio,
     residual_amplitude_ratio,
+    rank_configurations,
     measure_runtime,
     FilterBase,
 )
+from .chunked import apply_chunks, apply_to_file
+from .cache import CoefficientCache
 
-from .wf import WienerFilter
-from .uwf import UpdatingWienerFilter
-from .lms import LMSFilter
-from .polylms import PolynomialLMSFilter
-
-from .lms_c import LMSFilterC
+#: Filter classes and the submodules that define them, in the order of all_filters
+_lazy_filters = {
+    "WienerFilter": "wf",
+    "FrequencyDomainWienerFilter": "fdwf",
+    "UpdatingWienerFilter": "uwf",
+    "LMSFilter": "lms",
+    "LMSFilterC": "lms_c",
+    "FrequencyDomainLMSFilter": "fdlms",
+    "RLSFilter": "rls",
+    "PolynomialLMSFilter": "polylms",
+    "VolterraLMSFilter": "volterra",
+}
+_lazy_submodules = {
+    "cache",
+    "chunked",
+    "common",
+    "correlation",
+    "evaluation",
+    "external",
+    "fdlms",
+    "fdwf",
+    "lms",
+    "lms_c",
+    "polylms",
+    "rls",
+    "toeplitz",
+    "uwf",
+    "volterra",
+    "wf",
+}
 
-#: A list of all filters for automated testing and comparisons
-all_filters = [
-    WienerFilter,
-    UpdatingWienerFilter,
-    LMSFilter,
-    LMSFilterC,
-    PolynomialLMSFilter,
+__all__ = [
+    "RMS",
+    "total_power",
+    "TestDataGenerator",
+    "residual_power_ratio",
+    "residual_amplitude_ratio",
+    "rank_configurations",
+    "measure_runtime",
+    "FilterBase",
+    "apply_chunks",
+    "apply_to_file",
+    "CoefficientCache",
+    "all_filters",
+    *_lazy_filters,
 ]
+
+if TYPE_CHECKING:  # pragma: no cover
+    from . import external
+    from .wf import WienerFilter
+    from .fdwf import FrequencyDomainWienerFilter
+    from .uwf import UpdatingWienerFilter
+    from .lms import LMSFilter
+    from .lms_c import LMSFilterC
+    from .fdlms import FrequencyDomainLMSFilter
+    from .rls import RLSFilter
+    from .polylms import PolynomialLMSFilter
+    from .volterra import VolterraLMSFilter
+
+    #: A list of all filters for automated testing and comparisons
+    all_filters: list[type[FilterBase]]
+
+
+def __getattr__(name: str):
+    """import filters and submodules on first access"""
+    if name in _lazy_filters:
+        value = getattr(import_module(f".{_lazy_filters[name]}", __name__), name)
+    elif name in _lazy_submodules:
+        value = import_module(f".{name}", __name__)
+    elif name == "all_filters":
+        # A list of all filters for automated testing and comparisons
+        value = [__getattr__(filter_name) for filter_name in _lazy_filters]
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__) | _lazy_submodules)
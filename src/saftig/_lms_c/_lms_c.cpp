@@ -8,17 +8,134 @@
 #include <vector>
 #include <iostream>
 #include <cmath>
+#include <cstdlib>
+#include <cstring>
+#include <algorithm>
+#ifdef _WIN32
+#include <malloc.h>
+#endif
 
 typedef struct {
     PyObject_HEAD;
     unsigned int n_filter, idx_target, n_channel;
     double step_scale, clip_coefficients;
     bool normalized;
+    bool use_float32;
 
-    std::vector<std::vector<double>> filter_coefficients;
-    /* Type-specific fields go here. */
+    // coefficients of all channels in one aligned block of memory
+    // channel c starts at c * row_stride, the padding entries are zero
+    void *coefficients;
+    npy_intp row_stride;
 } LMS_C_OBJECT;
 
+// alignment of the coefficient storage in bytes (a cache line, enough for AVX-512)
+constexpr size_t COEFFICIENT_ALIGNMENT = 64;
+
+/**
+ * portable aligned allocation (std::aligned_alloc is not available with MSVC)
+ * returns NULL on failure, the memory must be released with aligned_free()
+ */
+void *aligned_malloc(size_t alignment, size_t size) {
+#ifdef _WIN32
+    return _aligned_malloc(size, alignment);
+#else
+    void *ptr = NULL;
+    return posix_memalign(&ptr, alignment, size) == 0 ? ptr : NULL;
+#endif
+}
+
+void aligned_free(void *ptr) {
+#ifdef _WIN32
+    _aligned_free(ptr);
+#else
+    std::free(ptr);
+#endif
+}
+
+/**
+ * allocate zero initialized coefficient storage with aligned rows
+ * returns false and sets a python exception on failure
+ */
+template<typename T>
+bool allocate_coefficients(LMS_C_OBJECT *self) {
+    constexpr npy_intp values_per_line = COEFFICIENT_ALIGNMENT / sizeof(T);
+    self->row_stride = (self->n_filter + values_per_line - 1) / values_per_line * values_per_line;
+    size_t size = std::max<size_t>(1, self->n_channel * self->row_stride) * sizeof(T);
+
+    self->coefficients = aligned_malloc(COEFFICIENT_ALIGNMENT, size);
+    if (self->coefficients == NULL) {
+        PyErr_NoMemory();
+        return false;
+    }
+    std::memset(self->coefficients, 0, size);
+    return true;
+}
+
+/**
+ * one LMS step: predict the target from the window starting at w_sel and update the coefficients
+ * w_sel points to the first sample of channel 0, the channels are witness_stride values apart
+ *
+ * The loops are written so the compiler can vectorize them (see the simd pragmas and meson.build).
+ */
+template<typename T>
+inline T lms_step(const LMS_C_OBJECT *self, const T *__restrict w_sel, npy_intp witness_stride, T target) {
+    const npy_intp n_filter = self->n_filter;
+    T *__restrict coefficients = (T *) self->coefficients;
+
+    // calculate prediction
+    T prediction = 0, normalization = 0;
+    for (unsigned int channel = 0; channel < self->n_channel; channel++) {
+        const T *__restrict w = w_sel + channel * witness_stride;
+        const T *__restrict coef = coefficients + channel * self->row_stride;
+        #pragma omp simd reduction(+:prediction)
+        for (npy_intp k = 0; k < n_filter; k++) {
+            prediction += w[k] * coef[k];
+        }
+        if (self->normalized) {
+            #pragma omp simd reduction(+:normalization)
+            for (npy_intp k = 0; k < n_filter; k++) {
+                normalization += w[k] * w[k];
+            }
+        }
+    }
+    if (!self->normalized) {
+        normalization = 1;
+    }
+
+    // update filter
+    const T factor = 2 * (T) self->step_scale * (target - prediction) / normalization;
+    const bool clip = !std::isnan(self->clip_coefficients);
+    const T limit = (T) self->clip_coefficients;
+    for (unsigned int channel = 0; channel < self->n_channel; channel++) {
+        const T *__restrict w = w_sel + channel * witness_stride;
+        T *__restrict coef = coefficients + channel * self->row_stride;
+        #pragma omp simd
+        for (npy_intp k = 0; k < n_filter; k++) {
+            coef[k] += factor * w[k];
+        }
+        // clip the filter coefficients to self->clip_coefficients if the value is not NaN
+        if (clip) {
+            #pragma omp simd
+            for (npy_intp k = 0; k < n_filter; k++) {
+                coef[k] = std::min(std::max(coef[k], -limit), limit);
+            }
+        }
+    }
+    return prediction;
+}
+
+/**
+ * run lms_step() over a whole dataset
+ */
+template<typename T>
+void lms_process(const LMS_C_OBJECT *self, const T *witness, const T *target, T *out, npy_intp n_samples) {
+    const npy_intp offset_target = self->n_filter - self->idx_target - 1;
+    const npy_intp pred_length = n_samples - self->n_filter + 1;
+    for (npy_intp idx = 0; idx < pred_length; idx++) {
+        out[idx] = lms_step<T>(self, witness + idx, n_samples, target[idx + offset_target]);
+    }
+}
+
 /**
  * check that the array is 2D with the given shape and dtype double
  * raise an exception if not
@@ -57,11 +174,6 @@ static PyObject *
 LMS_C_step(LMS_C_OBJECT *self, PyObject *args)
 {
     PyArrayObject* array;
-    NpyIter *iter;
-    NpyIter_IterNextFunc *iternext;
-    NpyIter_GetMultiIndexFunc *get_multi_index;
-    npy_intp multi_index[2];
-    double** dataptr;
     double target;
 
     // get parameter
@@ -73,88 +185,259 @@ LMS_C_step(LMS_C_OBJECT *self, PyObject *args)
         return NULL;
     }
 
-    // get iterator
-    iter = NpyIter_New( array,
-            NPY_ITER_READONLY | NPY_ITER_MULTI_INDEX | NPY_ITER_REFS_OK,
-            NPY_KEEPORDER,
-            NPY_NO_CASTING,
-            NULL);
-    if (iter == NULL) {
+    double prediction;
+    if (self->use_float32) {
+        PyArrayObject *w_sel = (PyArrayObject *) PyArray_FROMANY(
+                (PyObject *) array, NPY_FLOAT32, 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+        if (w_sel == NULL) {
+            return NULL;
+        }
+        prediction = lms_step<float>(self, (const float *) PyArray_DATA(w_sel), self->n_filter, (float) target);
+        Py_DECREF(w_sel);
+    } else if (PyArray_STRIDE(array, 1) == sizeof(double) && PyArray_STRIDE(array, 0) % sizeof(double) == 0
+               && PyArray_ISALIGNED(array)) {
+        // rows are contiguous (e.g. a slice of a larger array), no copy is required
+        prediction = lms_step<double>(self, (const double *) PyArray_DATA(array),
+                                      PyArray_STRIDE(array, 0) / sizeof(double), target);
+    } else {
+        PyArrayObject *w_sel = (PyArrayObject *) PyArray_FROMANY(
+                (PyObject *) array, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY);
+        if (w_sel == NULL) {
+            return NULL;
+        }
+        prediction = lms_step<double>(self, (const double *) PyArray_DATA(w_sel), self->n_filter, target);
+        Py_DECREF(w_sel);
+    }
+
+    return PyFloat_FromDouble(prediction);
+}
+
+/**
+ * run the filter over a whole dataset
+ * the loop works on contiguous buffers and runs without the GIL
+ */
+static PyObject *
+LMS_C_process(LMS_C_OBJECT *self, PyObject *args, PyObject *kwds)
+{
+    static char * kwlist[] = { (char *) "witness",
+                               (char *) "target",
+                               (char *) "update_state",
+                               (char *) "out",
+                               (char *) NULL};
+    PyObject *witness_obj, *target_obj, *out_obj = Py_None;
+    int update_state = 1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|pO", kwlist,
+                                     &witness_obj, &target_obj, &update_state, &out_obj)) {
         return NULL;
     }
+    const int dtype = self->use_float32 ? NPY_FLOAT32 : NPY_FLOAT64;
 
-    if (NpyIter_GetIterSize(iter) == 0) {
-        NpyIter_Deallocate(iter);
+    // get contiguous arrays of the filter dtype (this only copies if required)
+    PyArrayObject *witness = (PyArrayObject *) PyArray_FROMANY(
+            witness_obj, dtype, 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+    if (witness == NULL) {
+        return NULL;
+    }
+    PyArrayObject *target = (PyArrayObject *) PyArray_FROMANY(
+            target_obj, dtype, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+    if (target == NULL) {
+        Py_DECREF(witness);
         return NULL;
     }
 
-    iternext = NpyIter_GetIterNext(iter, NULL);
-    dataptr = (double**)NpyIter_GetDataPtrArray(iter);
-    get_multi_index = NpyIter_GetGetMultiIndex(iter, NULL);
+    npy_intp n_samples = PyArray_DIM(target, 0);
+    npy_intp pred_length = n_samples - self->n_filter + 1;
+    if (PyArray_DIM(witness, 0) != self->n_channel) {
+        PyErr_SetString(PyExc_ValueError, "Input channel count missmatch");
+    } else if (PyArray_DIM(witness, 1) != n_samples) {
+        PyErr_SetString(PyExc_ValueError, "Missmatch between target and witness data shapes");
+    } else if (pred_length < 1) {
+        PyErr_SetString(PyExc_ValueError, "Input data must be at least one filter length");
+    }
+    if (PyErr_Occurred()) {
+        Py_DECREF(witness);
+        Py_DECREF(target);
+        return NULL;
+    }
 
-    if ((iternext == NULL) || (dataptr == NULL) || (get_multi_index == NULL)) {
-        NpyIter_Deallocate(iter);
+    // output array
+    PyArrayObject *out;
+    if (out_obj == Py_None) {
+        out = (PyArrayObject *) PyArray_SimpleNew(1, &pred_length, dtype);
+    } else {
+        if (!PyArray_Check(out_obj)
+                || PyArray_TYPE((PyArrayObject *) out_obj) != dtype
+                || PyArray_NDIM((PyArrayObject *) out_obj) != 1
+                || PyArray_DIM((PyArrayObject *) out_obj, 0) != pred_length
+                || !PyArray_ISCARRAY((PyArrayObject *) out_obj)) {
+            PyErr_SetString(PyExc_ValueError,
+                    "out must be a writeable contiguous array of the filter dtype with n_samples - n_filter + 1 entries");
+            Py_DECREF(witness);
+            Py_DECREF(target);
+            return NULL;
+        }
+        out = (PyArrayObject *) out_obj;
+        Py_INCREF(out);
+    }
+    if (out == NULL) {
+        Py_DECREF(witness);
+        Py_DECREF(target);
         return NULL;
     }
 
-    // calculate prediction
-    double prediction = 0, normalization = 0;
-    if(self->normalized) {
-        do {
-            get_multi_index(iter, multi_index);
-
-            // the following uses the fma() instruction that can be faster on some computers
-            // prediction += (**dataptr) * self->filter_coefficients[multi_index[0]][multi_index[1]];
-            prediction = fma((**dataptr), self->filter_coefficients[multi_index[0]][multi_index[1]], prediction);
-            // normalization += (**dataptr) * (**dataptr);
-            normalization = fma(**dataptr, **dataptr, normalization);
-        } while (iternext(iter));
+    // keep a copy of the coefficients to restore them if the state is not updated
+    const size_t coefficient_size = self->n_channel * self->row_stride * (self->use_float32 ? sizeof(float) : sizeof(double));
+    std::vector<char> backup;
+    if (!update_state) {
+        backup.assign((char *) self->coefficients, (char *) self->coefficients + coefficient_size);
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    if (self->use_float32) {
+        lms_process<float>(self, (const float *) PyArray_DATA(witness), (const float *) PyArray_DATA(target),
+                           (float *) PyArray_DATA(out), n_samples);
     } else {
-        do {
-            get_multi_index(iter, multi_index);
-            prediction += (**dataptr) * self->filter_coefficients[multi_index[0]][multi_index[1]];
-        } while (iternext(iter));
-        normalization = 1;
+        lms_process<double>(self, (const double *) PyArray_DATA(witness), (const double *) PyArray_DATA(target),
+                            (double *) PyArray_DATA(out), n_samples);
+    }
+    Py_END_ALLOW_THREADS
+
+    if (!update_state) {
+        std::memcpy(self->coefficients, backup.data(), coefficient_size);
     }
 
-    // calculate instantaneous prediction error
-    double error = target - prediction;
+    Py_DECREF(witness);
+    Py_DECREF(target);
+    return (PyObject *) out;
+}
 
-    // reset iterator to the start of the numpy array
-    char reset_fail_msg[] = "Iterator reset failed";
-    if(NpyIter_Reset(iter, (char**)&reset_fail_msg) != NPY_SUCCEED) {
+/**
+ * zero-copy view of the coefficient buffer with shape (n_channel, n_filter)
+ * the view keeps the filter object alive
+ */
+static PyObject *
+LMS_C_get_coefficients(LMS_C_OBJECT *self, void *closure)
+{
+    const int dtype = self->use_float32 ? NPY_FLOAT32 : NPY_FLOAT64;
+    const npy_intp itemsize = self->use_float32 ? sizeof(float) : sizeof(double);
+    npy_intp dims[2] = {self->n_channel, self->n_filter};
+    npy_intp strides[2] = {self->row_stride * itemsize, itemsize};
+
+    PyObject *view = PyArray_New(&PyArray_Type, 2, dims, dtype, strides, self->coefficients,
+                                 itemsize, NPY_ARRAY_ALIGNED | NPY_ARRAY_WRITEABLE, NULL);
+    if (view == NULL) {
+        return NULL;
+    }
+    Py_INCREF(self);
+    if (PyArray_SetBaseObject((PyArrayObject *) view, (PyObject *) self) < 0) {
+        Py_DECREF(view);
         return NULL;
     }
+    return view;
+}
 
-    // update filter
-    do {
-        get_multi_index(iter, multi_index);
+/**
+ * copy new coefficients into the buffer (existing views stay valid)
+ */
+static int
+LMS_C_set_coefficients(LMS_C_OBJECT *self, PyObject *value, void *closure)
+{
+    if (value == NULL) {
+        PyErr_SetString(PyExc_TypeError, "Cannot delete the coefficients");
+        return -1;
+    }
+    const int dtype = self->use_float32 ? NPY_FLOAT32 : NPY_FLOAT64;
+    PyArrayObject *array = (PyArrayObject *) PyArray_FROMANY(
+            value, dtype, 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+    if (array == NULL) {
+        return -1;
+    }
+    if (PyArray_DIM(array, 0) != self->n_channel || PyArray_DIM(array, 1) != self->n_filter) {
+        PyErr_SetString(PyExc_ValueError, "Coefficients must have the shape (n_channel, n_filter)");
+        Py_DECREF(array);
+        return -1;
+    }
 
-        self->filter_coefficients[multi_index[0]][multi_index[1]] += 2 * self->step_scale * error * (**dataptr) / normalization;
+    const npy_intp itemsize = PyArray_ITEMSIZE(array);
+    for (unsigned int channel = 0; channel < self->n_channel; channel++) {
+        std::memcpy((char *) self->coefficients + channel * self->row_stride * itemsize,
+                    (char *) PyArray_DATA(array) + channel * self->n_filter * itemsize,
+                    self->n_filter * itemsize);
+    }
+    Py_DECREF(array);
+    return 0;
+}
 
-        // clip the filter coefficients to self->clip_coefficients if the value is not NaN
-        if(!std::isnan(self->clip_coefficients)) {
-            if(self->filter_coefficients[multi_index[0]][multi_index[1]] > self->clip_coefficients) {
-                self->filter_coefficients[multi_index[0]][multi_index[1]] = self->clip_coefficients;
-            } else if(self->filter_coefficients[multi_index[0]][multi_index[1]] < -self->clip_coefficients) {
-                self->filter_coefficients[multi_index[0]][multi_index[1]] = -self->clip_coefficients;
-            }
-        }
-    } while (iternext(iter));
+static PyObject *
+LMS_C_reset(LMS_C_OBJECT *self, PyObject *Py_UNUSED(ignored))
+{
+    const size_t itemsize = self->use_float32 ? sizeof(float) : sizeof(double);
+    std::memset(self->coefficients, 0, self->n_channel * self->row_stride * itemsize);
+    Py_RETURN_NONE;
+}
 
-    // dealloc the iter instance
-    if (!NpyIter_Deallocate(iter)) {
+static PyObject *
+LMS_C_reduce(LMS_C_OBJECT *self, PyObject *Py_UNUSED(ignored))
+{
+    PyObject *view = LMS_C_get_coefficients(self, NULL);
+    if (view == NULL) {
+        return NULL;
+    }
+    PyObject *state = PyArray_NewCopy((PyArrayObject *) view, NPY_CORDER);
+    Py_DECREF(view);
+    if (state == NULL) {
         return NULL;
     }
+    return Py_BuildValue("O(IIIdidi)N", Py_TYPE(self),
+                         self->n_filter, self->idx_target, self->n_channel,
+                         self->step_scale, (int) self->normalized,
+                         self->clip_coefficients, (int) self->use_float32,
+                         state);
+}
 
-    return PyFloat_FromDouble(prediction);
+static PyObject *
+LMS_C_setstate(LMS_C_OBJECT *self, PyObject *state)
+{
+    if (LMS_C_set_coefficients(self, state, NULL) < 0) {
+        return NULL;
+    }
+    Py_RETURN_NONE;
 }
 
+static PyGetSetDef LMS_C_getset[] = {
+    {"coefficients",
+     (getter) LMS_C_get_coefficients,
+     (setter) LMS_C_set_coefficients,
+     "FIR coefficients (n_channel, n_filter) as a writeable view on the internal buffer.\n"
+     "Assigning an array copies it into the buffer.",
+     NULL},
+    {NULL}  /* Sentinel */
+};
+
 static PyMethodDef LMS_C_methods[] = {
     {"step",
      (PyCFunction) LMS_C_step,
      METH_VARARGS,
      "Return the name, combining the first and last name", },
+    {"process",
+     (PyCFunction) LMS_C_process,
+     METH_VARARGS | METH_KEYWORDS,
+     "process(witness, target, update_state=True, out=None)\n"
+     "Run the filter over a whole dataset and return the prediction.\n"
+     "The GIL is released during the calculation.", },
+    {"reset",
+     (PyCFunction) LMS_C_reset,
+     METH_NOARGS,
+     "Set all coefficients to zero", },
+    {"__reduce__",
+     (PyCFunction) LMS_C_reduce,
+     METH_NOARGS,
+     "Pickle support", },
+    {"__setstate__",
+     (PyCFunction) LMS_C_setstate,
+     METH_O,
+     "Pickle support", },
     {NULL}  /* Sentinel */
 };
 
@@ -167,32 +450,41 @@ LMS_C_init(LMS_C_OBJECT *self, PyObject *args, PyObject *kwds)
                                (char *) "step_scale",
                                (char *) "normalized",
                                (char *) "coefficient_clipping",
+                               (char *) "use_float32",
                                (char *) NULL}; // must be terminated with a NULL
 
-    self->normalized = true;
+    // numpy views returned by the coefficients getter point into the buffer, so it must not
+    // be replaced while the object is alive
+    if (self->coefficients != NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "LMS_C objects can not be re-initialized");
+        return -1;
+    }
+
+    int normalized = 1, use_float32 = 0;
     self->clip_coefficients = std::nan("");
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "IIId|pd", kwlist,
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "IIId|pdp", kwlist,
                                      &self->n_filter,
                                      &self->idx_target,
                                      &self->n_channel,
                                      &self->step_scale,
-                                     &self->normalized,
-                                     &self->clip_coefficients)) {
+                                     &normalized,
+                                     &self->clip_coefficients,
+                                     &use_float32)) {
         return -1;
     }
+    self->normalized = normalized;
+    self->use_float32 = use_float32;
 
     // set the filter size and reset all coefficients to zero
-    self->filter_coefficients.insert(self->filter_coefficients.begin(),
-            self->n_channel,
-            std::vector<double>(self->n_filter, 0));
-
-    return 0;
+    bool success = self->use_float32 ? allocate_coefficients<float>(self) : allocate_coefficients<double>(self);
+    return success ? 0 : -1;
 }
 
 static void
 LMS_C_dealloc(LMS_C_OBJECT *self)
 {
+    aligned_free(self->coefficients);
     // this must call Py_XDECREF(object) for all held python objects
     Py_TYPE(self)->tp_free((PyObject *) self);
 }
@@ -200,13 +492,14 @@ LMS_C_dealloc(LMS_C_OBJECT *self)
 
 static PyTypeObject LMS_C_TYPE = {
     .ob_base = PyVarObject_HEAD_INIT(NULL, 0)
-    .tp_name = "LMS_C.LMS_C",
+    .tp_name = "saftig._lms_c.LMS_C",
     .tp_basicsize = sizeof(LMS_C_OBJECT),
     .tp_itemsize = 0,
     .tp_dealloc = (destructor) LMS_C_dealloc,
     .tp_flags = Py_TPFLAGS_DEFAULT,
     .tp_doc = PyDoc_STR("LMS Filter implemented in C"),
     .tp_methods = LMS_C_methods,
+    .tp_getset = LMS_C_getset,
     .tp_init = (initproc) LMS_C_init,
     .tp_new = PyType_GenericNew,
 };
@@ -0,0 +1,190 @@
+"""Content addressed cache for filter coefficients"""
+
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Optional
+import json
+import os
+import tempfile
+
+import numpy as np
+from numpy.typing import NDArray
+
+#: Number of samples that are hashed at once for arrays that are not contiguous
+HASH_CHUNK_SIZE = 2**16
+
+
+def _update_hash(hasher: Any, A: NDArray) -> None:
+    """add the dtype, shape and content of an array to a hash
+
+    The content is always hashed in C order, so the key does not depend on the memory layout.
+    """
+    hasher.update(f"{A.dtype.str}{A.shape}".encode())
+    if A.flags.c_contiguous:
+        hasher.update(A.data)
+        return
+    for row in A.reshape(-1, A.shape[-1]):
+        for start in range(0, len(row), HASH_CHUNK_SIZE):
+            hasher.update(
+                np.ascontiguousarray(row[start : start + HASH_CHUNK_SIZE]).data
+            )
+
+
+class CoefficientCache:
+    """Cache for filter coefficients with an in-memory LRU and an optional on-disk store
+
+    Entries are addressed by a blake2b hash of the input data and the parameters (see key()).
+    Recently used entries are kept in memory. If a directory is given, all entries are also
+    stored there as .npz files and can be shared between processes. The least recently used
+    files are deleted once the directory exceeds max_disk_bytes.
+
+    :param directory: directory of the on-disk store, None keeps the entries in memory only
+    :param max_memory_bytes: size limit of the coefficients that are kept in memory
+    :param max_disk_bytes: size limit of the on-disk store
+
+    >>> import saftig as sg
+    >>> witness, target = sg.TestDataGenerator(0.1).generate(int(1e4))
+    >>> cache = CoefficientCache()
+    >>> filt = sg.WienerFilter(32, 0, 1, cache=cache)
+    >>> _coefficients, full_rank = filt.condition(witness, target)
+    >>> _coefficients, full_rank = filt.condition(witness, target)
+    >>> cache.hits, cache.misses
+    (1, 1)
+
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str | os.PathLike] = None,
+        max_memory_bytes: int = 2**28,
+        max_disk_bytes: int = 2**32,
+    ):
+        self.directory = None if directory is None else os.fspath(directory)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        assert self.max_memory_bytes >= 0, "max_memory_bytes must not be negative"
+        assert self.max_disk_bytes >= 0, "max_disk_bytes must not be negative"
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+        #: lookups that were answered from memory
+        self.memory_hits = 0
+        #: lookups that were answered from the on-disk store
+        self.disk_hits = 0
+        #: lookups without a cached entry
+        self.misses = 0
+
+        self._memory: OrderedDict[str, tuple[NDArray, bool]] = OrderedDict()
+        self._memory_bytes = 0
+
+    @property
+    def hits(self) -> int:
+        """total number of lookups that found an entry"""
+        return self.memory_hits + self.disk_hits
+
+    @staticmethod
+    def key(*arrays: NDArray, **parameters: Any) -> str:
+        """hash of the input arrays and parameters
+
+        :param arrays: input data
+        :param parameters: json serializable parameters that determine the result
+
+        :return: hexadecimal digest
+        """
+        hasher = blake2b(digest_size=20)
+        hasher.update(json.dumps(parameters, sort_keys=True).encode())
+        for A in arrays:
+            _update_hash(hasher, np.asarray(A))
+        return hasher.hexdigest()
+
+    def _path(self, key: str) -> str:
+        """file of an entry in the on-disk store"""
+        assert self.directory is not None
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def _remember(self, key: str, coefficients: NDArray, full_rank: bool) -> None:
+        """add an entry to the in-memory LRU and evict the least recently used ones"""
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[0].nbytes
+        self._memory[key] = (coefficients, full_rank)
+        self._memory_bytes += coefficients.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            self._memory_bytes -= self._memory.popitem(last=False)[1][0].nbytes
+
+    def get(self, key: str) -> Optional[tuple[NDArray, bool]]:
+        """look up an entry
+
+        :param key: as returned by key()
+
+        :return: a copy of the coefficients and the full rank flag, None if there is no entry
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            coefficients, full_rank = self._memory[key]
+            return coefficients.copy(), full_rank
+
+        if self.directory is not None:
+            try:
+                with np.load(self._path(key)) as entry:
+                    coefficients = entry["coefficients"]
+                    full_rank = bool(entry["full_rank"])
+                # the modification time orders the files for the eviction
+                os.utime(self._path(key))
+            except FileNotFoundError:
+                pass
+            else:
+                self.disk_hits += 1
+                self._remember(key, coefficients, full_rank)
+                return coefficients.copy(), full_rank
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, coefficients: NDArray, full_rank: bool) -> None:
+        """add an entry
+
+        :param key: as returned by key()
+        :param coefficients: filter coefficients, a copy is stored
+        :param full_rank: full rank flag of the solution
+        """
+        coefficients = np.array(coefficients)
+        self._remember(key, coefficients, full_rank)
+        if self.directory is None:
+            return
+
+        # written to a temporary file first, so that other processes never see partial entries
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, suffix=".tmp", delete=False
+        ) as file:
+            np.savez(file, coefficients=coefficients, full_rank=full_rank)
+        os.replace(file.name, self._path(key))
+        self._evict_files()
+
+    def _evict_files(self) -> None:
+        """delete the least recently used files until the store fits into max_disk_bytes"""
+        assert self.directory is not None
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz"):
+                status = entry.stat()
+                files.append((status.st_mtime, status.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        """remove all entries from memory and the on-disk store"""
+        self._memory.clear()
+        self._memory_bytes = 0
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".npz"):
+                    os.remove(entry.path)
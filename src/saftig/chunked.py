@@ -0,0 +1,182 @@
+"""Out-of-core application of filters to datasets that do not fit into memory"""
+
+from copy import deepcopy
+from contextlib import ExitStack
+from typing import Any, Optional
+import os
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+from .common import FilterBase
+
+#: Default number of samples that are read and processed at once
+DEFAULT_CHUNK_SIZE = 2**18
+
+#: File extensions that are opened with h5py
+HDF5_EXTENSIONS = (".h5", ".hdf5")
+
+
+def apply_chunks(
+    filt: FilterBase,
+    witness: Any,
+    target: Any,
+    out: Optional[Any] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    pad: bool = True,
+    update_state: bool = False,
+) -> Any:
+    """Apply a filter to a large dataset chunk by chunk
+
+    The input can be any array that supports slicing along the last axis, e.g. np.memmap,
+    np.load(..., mmap_mode="r") or an h5py dataset. Only one chunk is read at a time and
+    the n_filter-1 samples of overlap between chunks are carried over by FilterBase.push().
+    The memory usage is bounded by the chunk size. The result equals
+    filt.apply(witness, target, pad, update_state) on the whole dataset.
+
+    :param filt: The filter, it must support streaming (see FilterBase.push())
+    :param witness: Witness sensor data (1D or 2D array-like)
+    :param target: Target sensor data (1D array-like)
+    :param out: Output array with the shape of the prediction (e.g. a memmap or an h5py dataset).
+                An array is allocated in memory if it is not given.
+    :param chunk_size: Number of samples per chunk, at least n_filter
+    :param pad: if True, apply padding zeros so that the length matches the target signal
+    :param update_state: if True, the filter state will be changed. If false, the filter state will remain
+
+    :return: out
+
+    >>> import numpy as np
+    >>> import saftig as sg
+    >>> witness, target = sg.TestDataGenerator(0.1).generate(int(1e4))
+    >>> filt = sg.LMSFilter(16, 0, 1)
+    >>> prediction = apply_chunks(filt, witness, target, chunk_size=1000)
+    >>> bool(np.allclose(prediction, filt.apply(witness, target)))
+    True
+
+    """
+    if not filt.supports_streaming:
+        raise NotImplementedError(
+            f"{filt.filter_name} does not support chunked processing"
+        )
+    assert chunk_size >= filt.n_filter, "chunk_size must be at least n_filter"
+    n_samples = target.shape[-1]
+    assert (
+        witness.shape[-1] == n_samples
+    ), "Missmatch between target and witness data shapes"
+
+    # the push() history of the caller is kept
+    worker = filt if update_state else deepcopy(filt)
+    stream_state = (filt._stream_witness, filt._stream_target)
+    worker.reset_stream()
+
+    # prediction index = sample index - shift
+    shift = filt.idx_target if pad else filt.n_filter - 1
+    n_output = n_samples if pad else max(0, n_samples - filt.n_filter + 1)
+    try:
+        for start in range(0, n_samples, chunk_size):
+            stop = min(start + chunk_size, n_samples)
+            prediction = worker.push(witness[..., start:stop], target[..., start:stop])
+            if out is None:
+                out = np.zeros(prediction.shape[:-1] + (n_output,), prediction.dtype)
+            assert out.shape[-1] == n_output, "out does not match the prediction length"
+
+            first = max(start, shift)
+            if stop > first:
+                out[..., first - shift : stop - shift] = prediction[
+                    ..., first - start :
+                ]
+    finally:
+        worker.reset_stream()
+        if update_state:
+            filt._stream_witness, filt._stream_target = stream_state
+
+    if out is None:
+        out = np.zeros(n_output)
+    if pad and shift > 0:
+        # the last samples have no complete window
+        out[..., n_samples - shift :] = 0
+    return out
+
+
+def _is_hdf5(path: str) -> bool:
+    """check the file extension for HDF5 files"""
+    return os.path.splitext(path)[1].lower() in HDF5_EXTENSIONS
+
+
+def _open_hdf5(stack: ExitStack, files: dict, path: str, mode: str = "r") -> Any:
+    """open an HDF5 file once, files that are already open are reused
+
+    :param stack: Context that closes the files
+    :param files: open files by path
+    :param path: file path
+    :param mode: h5py file mode
+    """
+    if path not in files:
+        try:
+            import h5py  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise ImportError("h5py is required to process HDF5 files") from e
+        files[path] = stack.enter_context(h5py.File(path, mode))
+    return files[path]
+
+
+def _open_input(stack: ExitStack, files: dict, path: str, dataset: str) -> Any:
+    """memory map a .npy file or open a dataset of an HDF5 file, see _open_hdf5()"""
+    if _is_hdf5(path):
+        return _open_hdf5(stack, files, path)[dataset]
+    return np.load(path, mmap_mode="r")
+
+
+def apply_to_file(
+    filt: FilterBase,
+    witness_file: str,
+    target_file: str,
+    output_file: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    pad: bool = True,
+    update_state: bool = False,
+    dtype: DTypeLike = np.float64,
+    witness_dataset: str = "witness",
+    target_dataset: str = "target",
+    output_dataset: str = "prediction",
+) -> None:
+    """Apply a filter to data files and write the prediction to a file, see apply_chunks()
+
+    .npy files are memory mapped. Files with the extensions .h5 or .hdf5 are opened with
+    h5py (optional dependency), the dataset names select the arrays in them.
+    An existing output dataset is replaced.
+
+    :param filt: The filter, it must support streaming (see FilterBase.push())
+    :param witness_file: .npy or HDF5 file with the witness sensor data
+    :param target_file: .npy or HDF5 file with the target sensor data
+    :param output_file: .npy or HDF5 file for the prediction, can be one of the input HDF5 files
+    :param chunk_size: Number of samples per chunk, at least n_filter
+    :param pad: if True, apply padding zeros so that the length matches the target signal
+    :param update_state: if True, the filter state will be changed. If false, the filter state will remain
+    :param dtype: dtype of the output
+    :param witness_dataset: witness dataset name in HDF5 files
+    :param target_dataset: target dataset name in HDF5 files
+    :param output_dataset: prediction dataset name in HDF5 files
+    """
+    with ExitStack() as stack:
+        files: dict = {}
+        # an HDF5 output file must be opened writeable before it is opened for reading
+        if _is_hdf5(output_file):
+            _open_hdf5(stack, files, output_file, "a")
+        witness = _open_input(stack, files, witness_file, witness_dataset)
+        target = _open_input(stack, files, target_file, target_dataset)
+
+        n_samples = target.shape[-1]
+        shape = (n_samples if pad else max(0, n_samples - filt.n_filter + 1),)
+        if _is_hdf5(output_file):
+            group = files[output_file]
+            if output_dataset in group:
+                del group[output_dataset]
+            out = group.create_dataset(output_dataset, shape, dtype=dtype)
+        else:
+            out = np.lib.format.open_memmap(
+                output_file, mode="w+", dtype=dtype, shape=shape
+            )
+        apply_chunks(filt, witness, target, out, chunk_size, pad, update_state)
+        if not _is_hdf5(output_file):
+            out.flush()
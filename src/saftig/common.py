@@ -1,11 +1,23 @@
 """Shared functionality for all other modules"""
 
-from typing import Optional
+from typing import Any, Optional
 from collections.abc import Sequence
+from importlib import import_module
+import inspect
+import json
+import os
+import struct
 
 import numpy as np
 from numpy.typing import NDArray
 
+#: Identifier at the start of files written by FilterBase.save()
+FILE_MAGIC = b"\x93SAFTIG"
+#: Version of the file format written by FilterBase.save()
+FILE_FORMAT_VERSION = 1
+#: Alignment of the arrays in the file in bytes
+FILE_ALIGNMENT = 64
+
 
 def total_power(A: Sequence | NDArray) -> float:
     """calculate the total power of a signal (square or RMS)
@@ -16,13 +28,13 @@ def total_power(A: Sequence | NDArray) -> float:
     4.0
 
     """
-    A_npy: NDArray = np.array(A)
+    A_npy: NDArray = np.asarray(A)
     return float(np.mean(np.square(A_npy)))
 
 
 def RMS(A: Sequence | NDArray) -> float:
     """Calculate the root mean square value of an array"""
-    A_npy: NDArray = np.array(A)
+    A_npy: NDArray = np.asarray(A)
 
     # float() is used to convert this into a standard float instead of a 0D numpy array
     # this simplifies writing doctests
@@ -31,7 +43,9 @@ def RMS(A: Sequence | NDArray) -> float:
 
 def make_2d_array(A: Sequence | Sequence[Sequence] | NDArray) -> NDArray:
     """add a dimension to 1D arrays and leave 2D arrays as they are
-    This is intended to allow 1D array input for single channel application
+    This is intended to allow 1D array input for single channel application.
+    Arrays are not copied, the result is a view on the input with its dtype
+    (e.g. float32 or a read-only memmap stays as it is).
 
     :param A: input array
 
@@ -47,14 +61,25 @@ def make_2d_array(A: Sequence | Sequence[Sequence] | NDArray) -> NDArray:
            [3, 4]])
 
     """
-    A_npy = np.array(A)
-    if len(A_npy.shape) == 1:
-        return np.array([A_npy])
-    if len(A_npy.shape) == 2:
+    A_npy = np.asarray(A)
+    if A_npy.ndim == 1:
+        return A_npy[np.newaxis, :]
+    if A_npy.ndim == 2:
         return A_npy
     raise ValueError("Input must be 1D or 2D array")
 
 
+def _to_json(value: Any) -> Any:
+    """convert numpy types and tuples in constructor parameters to json compatible types"""
+    if isinstance(value, np.dtype):
+        return value.str
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
 class FilterBase:
     """common interface definition for Filter implementations
 
@@ -65,6 +90,12 @@ class FilterBase:
     """
 
     filter_name: str | None = None
+    #: False for filters that cannot process data sample by sample (see push())
+    supports_streaming: bool = True
+    #: Attributes that hold the trained state, see save(). None if saving is not supported.
+    _state_attributes: tuple[str, ...] | None = ("filter_state",)
+    #: Constructor parameters that save() does not store (they get their default value in load())
+    _unsaved_parameters: tuple[str, ...] = ()
 
     def __init__(self, n_filter: int, idx_target: int, n_channel: int = 1):
         self.n_filter = n_filter
@@ -79,11 +110,12 @@ class FilterBase:
         assert self.filter_name is not None, "BaseFilter childs must set their name"
 
         self.requries_apply_target = True
+        self.reset_stream()
 
     def condition(
         self,
-        witness: Sequence | Sequence[Sequence],
-        target: Sequence,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
     ) -> None:
         """Use an input dataset to condition the filter
 
@@ -114,6 +146,209 @@ class FilterBase:
             "This function must be implemented by the child class!"
         )
 
+    def reset_stream(self) -> None:
+        """Discard the witness and target history that push() carries over between chunks"""
+        self._stream_witness = np.zeros((self.n_channel, 0))
+        self._stream_target = np.zeros(0)
+
+    def push(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+    ) -> NDArray:
+        """Process the next chunk of a continuous data stream and update the filter state
+
+        The last n_filter-1 samples are kept between calls, so no samples are lost at the
+        chunk edges. One prediction is returned per input sample: the prediction of the
+        window that ends with that sample (zero until n_filter samples were pushed).
+        The concatenated output equals apply(pad=True, update_state=True) on the concatenated
+        input, delayed by idx_target samples. The cost per call is proportional to the chunk length.
+
+        :param witness: Witness sensor data chunk
+        :param target: Target sensor data chunk
+
+        :return: prediction for each sample of the chunk
+
+        >>> import numpy as np
+        >>> import saftig as sg
+        >>> witness, target = sg.TestDataGenerator(0.1).generate(1000)
+        >>> filt = sg.LMSFilter(16, 0, 1)
+        >>> prediction = np.concatenate([filt.push(witness[:, i : i + 100], target[i : i + 100])
+        ...                              for i in range(0, 1000, 100)])
+        >>> bool(np.allclose(prediction, sg.LMSFilter(16, 0, 1).apply(witness, target)))
+        True
+
+        """
+        if not self.supports_streaming:
+            raise NotImplementedError(f"{self.filter_name} does not support streaming")
+        witness_npy, target_npy = self.check_data_dimensions(witness, target)
+        assert (
+            witness_npy.shape[1] == target_npy.shape[-1]
+        ), "Missmatch between target and witness data shapes"
+        n_new = target_npy.shape[-1]
+
+        if self._stream_target.shape[-1] == 0:
+            # the history takes the shape of the first chunk (one row per target)
+            self._stream_target = np.zeros(target_npy.shape[:-1] + (0,))
+        witness_buffer = np.concatenate([self._stream_witness, witness_npy], axis=1)
+        target_buffer = np.concatenate([self._stream_target, target_npy], axis=-1)
+        n_buffer = target_buffer.shape[-1]
+        # the history is kept as a copy so the caller's buffers are not referenced
+        n_history = min(self.n_filter - 1, n_buffer)
+        self._stream_witness = witness_buffer[:, n_buffer - n_history :].copy()
+        self._stream_target = target_buffer[..., n_buffer - n_history :].copy()
+
+        prediction = np.zeros(target_npy.shape[:-1] + (n_new,))
+        if n_buffer >= self.n_filter:
+            windows = self.apply(
+                witness_buffer, target_buffer, pad=False, update_state=True
+            )
+            # the first windows end in the history if it is not full yet
+            n_windows = windows.shape[-1]
+            prediction = np.zeros(windows.shape[:-1] + (n_new,), dtype=windows.dtype)
+            prediction[..., n_new - n_windows :] = windows
+        return prediction
+
+    def save(self, path: str | os.PathLike) -> None:
+        """Store the constructor parameters and the trained state in a file
+
+        The file starts with FILE_MAGIC, the format version (uint8) and the length of a
+        JSON header (little endian uint32). The header holds the filter class, the constructor
+        parameters and the dtype, shape and offset of each state array. The arrays follow as raw
+        data aligned to FILE_ALIGNMENT bytes, which allows to memory map them in load().
+        The history of push() is not stored.
+
+        :param path: output file
+
+        >>> import os, tempfile
+        >>> import numpy as np
+        >>> import saftig as sg
+        >>> witness, target = sg.TestDataGenerator(0.1).generate(int(1e4))
+        >>> filt = sg.LMSFilter(32, 0, 1)
+        >>> filt.condition(witness, target)
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     filt.save(os.path.join(directory, "lms.saftig"))
+        ...     loaded = sg.FilterBase.load(os.path.join(directory, "lms.saftig"))
+        ...     bool(np.all(loaded.apply(witness, target) == filt.apply(witness, target)))
+        True
+
+        """
+        if self._state_attributes is None:
+            raise NotImplementedError(f"{self.filter_name} does not support saving")
+
+        parameters = {
+            name: _to_json(getattr(self, name))
+            for name in list(inspect.signature(type(self).__init__).parameters)[1:]
+            if name not in self._unsaved_parameters
+        }
+        arrays = {}
+        values = {}
+        offset = 0
+        for name in self._state_attributes:
+            value = getattr(self, name, None)
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value)
+                assert value.dtype != object, "object arrays can not be stored"
+                arrays[name] = (
+                    value,
+                    {
+                        "dtype": value.dtype.str,
+                        "shape": list(value.shape),
+                        "offset": offset,
+                    },
+                )
+                offset += -(-value.nbytes // FILE_ALIGNMENT) * FILE_ALIGNMENT
+            else:
+                values[name] = _to_json(value)
+
+        header = json.dumps(
+            {
+                "class": type(self).__name__,
+                "module": type(self).__module__,
+                "parameters": parameters,
+                "arrays": {
+                    name: description for name, (_, description) in arrays.items()
+                },
+                "values": values,
+            }
+        ).encode()
+        # the data section starts aligned
+        preamble_length = len(FILE_MAGIC) + 5
+        header += b" " * (-(preamble_length + len(header)) % FILE_ALIGNMENT)
+
+        with open(path, "wb") as file:
+            file.write(FILE_MAGIC)
+            file.write(struct.pack("<BI", FILE_FORMAT_VERSION, len(header)))
+            file.write(header)
+            for value, _ in arrays.values():
+                file.write(value.tobytes())
+                file.write(b"\0" * (-value.nbytes % FILE_ALIGNMENT))
+
+    @classmethod
+    def load(cls, path: str | os.PathLike, mmap: bool = True) -> "FilterBase":
+        """Restore a filter that was stored with save()
+
+        The filter class is taken from the file. If load() is called on a subclass, the stored
+        filter must be an instance of it.
+
+        :param path: file written by save()
+        :param mmap: if True, the state arrays are memory mapped (copy on write) instead of read,
+                     which makes loading large filters fast
+
+        :return: the restored filter
+
+        :raises: ValueError if the file is not a saftig filter file, has an unsupported version,
+                 contains a different filter class or refers to modules and attributes outside
+                 of saftig
+        """
+        with open(path, "rb") as file:
+            if file.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError(f"{path} is not a saftig filter file")
+            version, header_length = struct.unpack("<BI", file.read(5))
+            if version > FILE_FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported file format version {version} (supported up to {FILE_FORMAT_VERSION})"
+                )
+            header = json.loads(file.read(header_length))
+        data_start = len(FILE_MAGIC) + 5 + header_length
+
+        # only saftig modules are imported, the file content is not trusted
+        module = header["module"]
+        if module != __package__ and not module.startswith(f"{__package__}."):
+            raise ValueError(
+                f"{path} refers to the module {module}, which is not part of saftig"
+            )
+        filter_class = getattr(import_module(module), header["class"], None)
+        if not (isinstance(filter_class, type) and issubclass(filter_class, cls)):
+            raise ValueError(
+                f"{path} contains a {header['class']}, which is not a {cls.__name__}"
+            )
+        state_attributes = filter_class._state_attributes or ()
+        for name in (*header["arrays"], *header["values"]):
+            if name not in state_attributes:
+                raise ValueError(
+                    f"{path} contains the attribute {name}, which is not part of the {header['class']} state"
+                )
+        filt = filter_class(**header["parameters"])
+
+        for name, description in header["arrays"].items():
+            dtype = np.dtype(description["dtype"])
+            if dtype.hasobject:
+                raise ValueError(f"{path} contains an object array")
+            shape = tuple(description["shape"])
+            offset = data_start + description["offset"]
+            value: NDArray
+            if mmap and int(np.prod(shape)) > 0:
+                value = np.memmap(path, dtype, "c", offset, shape)
+            else:
+                value = np.fromfile(
+                    path, dtype, int(np.prod(shape)), offset=offset
+                ).reshape(shape)
+            setattr(filt, name, value)
+        for name, value in header["values"].items():
+            setattr(filt, name, value)
+        return filt
+
     def check_data_dimensions(
         self,
         witness: Sequence | NDArray,
@@ -121,6 +356,9 @@ class FilterBase:
     ) -> tuple[NDArray, NDArray]:
         """Check the dimensions of the provided input data and apply make_2d_array()
 
+        The returned arrays are views on the input data if it already is an array, its dtype is
+        preserved. Implementations must not write to them.
+
         :param witness: Witness sensor data
         :param target: Target sensor data
 
@@ -128,7 +366,7 @@ class FilterBase:
 
         :raises: AssertionError
         """
-        target_npy = np.array(target)
+        target_npy = np.asarray(target)
         witness_npy = make_2d_array(witness)
         assert (
             witness_npy.shape[0] == self.n_channel
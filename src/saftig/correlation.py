@@ -0,0 +1,479 @@
+"""Correlation estimates for the Wiener filter normal equations"""
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.fft import rfft, irfft, next_fast_len
+
+from .common import make_2d_array
+
+#: Upper limit for the number of elements of the cross-spectrum arrays in correlation_sums()
+SPECTRUM_SIZE_LIMIT = 2**22
+
+
+def correlation_sums(
+    witness: NDArray,
+    target: NDArray | None,
+    n_filter: int,
+    range_ww: tuple[int, int],
+    range_ws: tuple[int, int] = (0, 0),
+    segment_length: int | None = None,
+) -> tuple[NDArray, NDArray]:
+    """calculate the lagged witness auto-correlation and target cross-correlation in one pass
+
+    For the lags l = -(n_filter-1) ... n_filter-1 this calculates
+    sum_u witness[a, u+l] * witness[b, u] for u in range_ww and a >= b, and
+    sum_u target[..., u+l] * witness[b, u] for u in range_ws.
+    Samples outside of the data are treated as zero.
+
+    The data is processed in segments. Each witness segment is transformed once and its
+    spectrum is shared by the auto- and cross-correlation. All cross-spectra are formed in
+    vectorized operations and summed in the frequency domain, which requires only one
+    inverse transform per call. Only the lower channel triangle of the auto-correlation is
+    calculated, the upper triangle is left zero (see mirror_lower_channels()).
+
+    :param witness: Witness sensor data (2D array)
+    :param target: Target sensor data (1D array or 2D array for multiple targets),
+                   only required for a non-empty range_ws
+    :param n_filter: Length of the FIR filter
+    :param range_ww: (start, stop) sample indices for the auto-correlation
+    :param range_ws: (start, stop) sample indices for the cross-correlation
+    :param segment_length: number of samples that are processed at once (optional)
+
+    :return: auto-correlation[channel_a, channel_b, lag], cross-correlation[(target,) channel, lag]
+             the lag axis starts at -(n_filter-1)
+
+    >>> import numpy as np
+    >>> from scipy.signal import correlate
+    >>> witness, target = np.random.normal(size=(2, 100)), np.random.normal(size=100)
+    >>> r_ww, r_ws = correlation_sums(witness, target, 5, (10, 90), (20, 60), segment_length=16)
+    >>> bool(np.allclose(r_ww[1, 0], correlate(witness[1, 6:94], witness[0, 10:90], mode="valid")))
+    True
+    >>> bool(np.allclose(r_ws[1], correlate(target[16:64], witness[1, 20:60], mode="valid")))
+    True
+
+    """
+    n_channel, n_samples = witness.shape
+    n_lags = 2 * n_filter - 1
+    pairs = np.tril_indices(n_channel)
+
+    # split both ranges into segments that are fully inside or outside of each range
+    range_ww = (max(0, range_ww[0]), min(n_samples, range_ww[1]))
+    range_ws = (max(0, range_ws[0]), min(n_samples, range_ws[1]))
+    ranges = [r for r in (range_ww, range_ws) if r[1] > r[0]]
+    target_shape = (0,) if target is None else target.shape
+    target_2d = (
+        np.zeros((0, n_samples)) if target is None else target.reshape(-1, n_samples)
+    )
+    if len(ranges) == 0:
+        return np.zeros((n_channel, n_channel, n_lags)), np.zeros(
+            target_shape[:-1] + (n_channel, n_lags)
+        )
+    if segment_length is None:
+        segment_length = max(
+            n_lags, SPECTRUM_SIZE_LIMIT // (len(pairs[0]) + 2 * n_channel + 1)
+        )
+    segment_length = min(segment_length, max(r[1] - r[0] for r in ranges))
+    n_fft = next_fast_len(segment_length + n_lags - 1, real=True)
+    segment_length = n_fft - n_lags + 1
+
+    boundaries = sorted(set(sum(ranges, ())))
+    segments = []
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        in_ww = range_ww[0] <= start < range_ww[1]
+        in_ws = range_ws[0] <= start < range_ws[1]
+        if in_ww or in_ws:
+            segments += [
+                (seg_start, min(stop, seg_start + segment_length), in_ww, in_ws)
+                for seg_start in range(start, stop, segment_length)
+            ]
+
+    def extended_segment(data, start, stop):
+        """data[..., start-(n_filter-1) : stop+n_filter-1] with zeros outside of the data"""
+        pad = (max(0, n_filter - 1 - start), max(0, stop + n_filter - 1 - n_samples))
+        segment = data[..., max(0, start - n_filter + 1) : stop + n_filter - 1]
+        # only the segment is converted, e.g. float32 input is transformed in double precision
+        segment = segment.astype(np.float64, copy=False)
+        if pad != (0, 0):
+            segment = np.pad(segment, [(0, 0)] * (data.ndim - 1) + [pad])
+        return segment
+
+    spectrum_ww = np.zeros((len(pairs[0]), n_fft // 2 + 1), dtype=np.complex128)
+    spectrum_ws = np.zeros(
+        (len(target_2d), n_channel, n_fft // 2 + 1), dtype=np.complex128
+    )
+    for start, stop, in_ww, in_ws in segments:
+        witness_spectrum = rfft(
+            witness[:, start:stop].astype(np.float64, copy=False), n_fft
+        ).conj()
+        if in_ww:
+            extended_spectrum = rfft(extended_segment(witness, start, stop), n_fft)
+            spectrum_ww += extended_spectrum[pairs[0]] * witness_spectrum[pairs[1]]
+        if in_ws:
+            assert target is not None, "target data is required for range_ws"
+            extended_spectrum = rfft(extended_segment(target_2d, start, stop), n_fft)
+            spectrum_ws += extended_spectrum[:, None, :] * witness_spectrum[None, :, :]
+
+    r_ww = np.zeros((n_channel, n_channel, n_lags))
+    r_ww[pairs] = irfft(spectrum_ww, n_fft)[:, :n_lags]
+    r_ws = irfft(spectrum_ws, n_fft)[..., :n_lags]
+    if target is None:
+        return r_ww, np.zeros((n_channel, n_lags))
+    return r_ww, r_ws.reshape(target_shape[:-1] + (n_channel, n_lags))
+
+
+def witness_correlation_lags(witness: NDArray, n_filter: int) -> NDArray:
+    """calculate the lags of the witness auto-correlation matrix
+
+    The auto-correlation matrix is block-Toeplitz. Block (a, b) has the entries
+    r_ww[a, b, abs(i-j)]. r_ww[a, b] equals r_ww[b, a], which makes the matrix symmetric.
+
+    :param witness: Witness sensor data (2D array)
+    :param n_filter: Length of the FIR filter
+
+    :return: r_ww[channel_a, channel_b, lag]
+    """
+    return wf_correlation_lags(witness, None, n_filter)[0]
+
+
+def wf_correlation_lags(
+    witness: NDArray,
+    target: NDArray | None,
+    n_filter: int,
+    idx_target: int = 0,
+) -> tuple[NDArray, NDArray]:
+    """calculate the witness auto-correlation lags and the target cross-correlation lags
+
+    The auto-correlation matrix is block-Toeplitz. Block (a, b) has the entries
+    r_ww[a, b, abs(i-j)]. r_ww[a, b] equals r_ww[b, a], which makes the matrix symmetric.
+    Both are calculated in one pass over the witness data, see correlation_sums().
+
+    :param witness: Witness sensor data (2D array)
+    :param target: Target sensor data (1D array or 2D array for multiple targets),
+                   None skips the cross-correlation
+    :param n_filter: Length of the FIR filter
+    :param idx_target: offset of the prediction relative to the end of the array
+
+    :return: r_ww[channel_a, channel_b, lag], r_ws[(target,) channel, lag]
+    """
+    symmetric, range_ww, range_ws = wf_correlation_ranges(
+        witness.shape[1], n_filter, idx_target
+    )
+    if target is None:
+        range_ws = (0, 0)
+
+    r_ww, r_ws = correlation_sums(witness, target, n_filter, range_ww, range_ws)
+    return wf_lags_from_sums(r_ww, r_ws, n_filter, idx_target, symmetric)
+
+
+def wf_correlation_ranges(
+    n_samples: int, n_filter: int, idx_target: int = 0
+) -> tuple[bool, tuple[int, int], tuple[int, int]]:
+    """sample ranges of correlation_sums() that define the WF correlations of a dataset
+
+    :param n_samples: Length of the dataset
+    :param n_filter: Length of the FIR filter
+    :param idx_target: offset of the prediction relative to the end of the array
+
+    :return: symmetric (bool), range_ww, range_ws
+    """
+    symmetric = (
+        n_samples >= 3 * n_filter
+    )  # using both sides is only possible if enough data is provided
+    range_ww = (
+        (n_filter, n_samples - n_filter) if symmetric else (0, n_samples - n_filter + 1)
+    )
+    # the cross-correlation matches mean_cross_correlation_offset() for all channels
+    range_ws = (idx_target, n_samples - n_filter + 1 + idx_target)
+    return symmetric, range_ww, range_ws
+
+
+def wf_lags_from_sums(
+    r_ww: NDArray, r_ws: NDArray, n_filter: int, idx_target: int, symmetric: bool
+) -> tuple[NDArray, NDArray]:
+    """convert the output of correlation_sums() to the lags returned by wf_correlation_lags()
+
+    :param r_ww: two-sided auto-correlation sums (not modified)
+    :param r_ws: two-sided cross-correlation sums (not modified)
+    :param n_filter: Length of the FIR filter
+    :param idx_target: offset of the prediction relative to the end of the array
+    :param symmetric: as returned by wf_correlation_ranges()
+
+    :return: r_ww[channel_a, channel_b, lag], r_ws[(target,) channel, lag]
+    """
+    if symmetric:
+        # average positive and negative lag to make the result symmetric (as is expected for an autocorrelation)
+        r_ww = symmetrize_lags(r_ww)
+    else:
+        r_ww = r_ww[..., n_filter - 1 :].copy()
+    r_ws = r_ws[..., n_filter - 1 - idx_target : 2 * n_filter - 1 - idx_target].copy()
+
+    return mirror_lower_channels(r_ww), r_ws
+
+
+def symmetrize_lags(cc: NDArray) -> NDArray:
+    """average positive and negative lags of a two-sided correlation
+
+    :param cc: correlation for the lags -(n_filter-1) to n_filter-1 on the last axis
+
+    :return: correlation for the lags 0 to n_filter-1
+    """
+    n_filter = (cc.shape[-1] + 1) // 2
+    return np.concatenate(
+        [
+            cc[..., n_filter - 1 : n_filter],
+            (cc[..., n_filter:] + np.flip(cc[..., : n_filter - 1], axis=-1)) / 2,
+        ],
+        axis=-1,
+    )
+
+
+def mirror_lower_channels(r_ww: NDArray) -> NDArray:
+    """copy the lower channel triangle of r_ww to the upper one (in place)
+
+    The data edges make r_ww[a, b] and r_ww[b, a] differ slightly.
+    Only the lower block triangle is used for the (hermitian) solution.
+    """
+    lower = np.tril_indices(r_ww.shape[0], -1)
+    r_ww[lower[1], lower[0]] = r_ww[lower]
+    return r_ww
+
+
+class CorrelationAccumulator:
+    """Accumulate the correlations of wf_correlations() chunk by chunk
+
+    At most 3*n_filter-1 samples are kept between chunks, the memory usage does
+    not depend on the total data length. Chunks are buffered until at least
+    2*n_filter-1 samples are pending since the last accumulated sample, so short
+    chunks do not each pay for a full correlation. The result matches
+    wf_correlations() on the concatenated data to numerical precision.
+
+    :param n_channel: Number of witness sensor channels
+    :param n_filter: Length of the FIR filter
+    :param idx_target: offset of the prediction relative to the end of the array
+
+    >>> import numpy as np
+    >>> import saftig as sg
+    >>> witness, target = sg.TestDataGenerator([0.1, 0.1]).generate(1000)
+    >>> acc = CorrelationAccumulator(2, 16, 0)
+    >>> for idx in range(0, 1000, 300):
+    ...     acc.add(witness[:, idx : idx + 300], target[idx : idx + 300])
+    >>> r_ww, r_ws = acc.finalize()
+    >>> r_ww_ref, r_ws_ref = sg.wf.wf_correlations(witness, target, 16, 0)
+    >>> bool(np.allclose(r_ww, r_ww_ref) and np.allclose(r_ws, r_ws_ref))
+    True
+
+    """
+
+    def __init__(self, n_channel: int, n_filter: int, idx_target: int = 0):
+        self.n_channel = n_channel
+        self.n_filter = n_filter
+        self.idx_target = idx_target
+
+        assert self.n_filter > 0, "n_filter must be a positive integer"
+        assert (
+            self.idx_target >= 0 and self.idx_target < self.n_filter
+        ), "idx_target must not be negative and smaller than n_filter"
+
+        #: number of samples received so far
+        self.n_samples = 0
+
+        # witness auto-correlation for lags -(n_filter-1) to n_filter-1 (lower channel triangle)
+        self._r_ww_raw = np.zeros((n_channel, n_channel, 2 * n_filter - 1))
+        # the target shape is set by the first chunk
+        self._r_ws = np.zeros((n_channel, n_filter))
+        # end (exclusive) of the already accumulated sample indices
+        self._done_ww = n_filter
+        self._done_ws = 0
+
+        # recent samples and the global index of the first buffered sample
+        self._witness_buffer = np.zeros((n_channel, 0))
+        self._target_buffer = np.zeros(0)
+        self._buffer_start = 0
+        # the first 3*n_filter samples are required for short datasets
+        self._witness_head = np.zeros((n_channel, 0))
+
+    def add(self, witness: NDArray, target: NDArray) -> None:
+        """Add a chunk of data
+
+        :param witness: Witness sensor data chunk (1D or 2D array)
+        :param target: Target sensor data chunk (1D array or 2D array for multiple targets)
+        """
+        witness_npy = make_2d_array(witness)
+        target_npy = np.asarray(target)
+        if self.n_samples == 0:
+            self._target_buffer = np.zeros(target_npy.shape[:-1] + (0,))
+            self._r_ws = np.zeros(
+                target_npy.shape[:-1] + (self.n_channel, self.n_filter)
+            )
+        assert (
+            target_npy.shape[:-1] == self._target_buffer.shape[:-1]
+        ), "The number of targets must not change between chunks"
+        assert (
+            witness_npy.shape[0] == self.n_channel
+        ), "witness data shape does not match configured channel count"
+        assert (
+            witness_npy.shape[1] == target_npy.shape[-1]
+        ), "Missmatch between target and witness data shapes"
+
+        self._witness_buffer = np.concatenate(
+            [self._witness_buffer, witness_npy], axis=1
+        )
+        self._target_buffer = np.concatenate([self._target_buffer, target_npy], axis=-1)
+        self.n_samples += target_npy.shape[-1]
+
+        n_head = self._witness_head.shape[1]
+        if n_head < 3 * self.n_filter:
+            self._witness_head = np.concatenate(
+                [self._witness_head, witness_npy[:, : 3 * self.n_filter - n_head]],
+                axis=1,
+            )
+
+        # correlating costs at least one transform of length ~2*n_filter per channel
+        if self.n_samples - self._done_ws >= 2 * self.n_filter - 1:
+            self._accumulate()
+
+    def _accumulate(self) -> None:
+        """accumulate all sample indices for which the required lags are available"""
+        n_filter = self.n_filter
+        start = self._buffer_start
+        witness = self._witness_buffer
+        target = self._target_buffer
+
+        # auto-correlation for sample indices [n_filter, n_samples - n_filter)
+        # cross-correlation for sample indices [0, n_samples - n_filter + 1)
+        # shifted by idx_target for the witness data
+        stop_ww = max(self._done_ww, self.n_samples - n_filter)
+        stop_ws = max(self._done_ws, self.n_samples - n_filter + 1)
+        if stop_ww > self._done_ww or stop_ws > self._done_ws:
+            r_ww, r_ws = correlation_sums(
+                witness,
+                target,
+                n_filter,
+                (self._done_ww - start, stop_ww - start),
+                (
+                    self._done_ws + self.idx_target - start,
+                    stop_ws + self.idx_target - start,
+                ),
+            )
+            self._r_ww_raw += r_ww
+            self._r_ws += r_ws[
+                ..., n_filter - 1 - self.idx_target : 2 * n_filter - 1 - self.idx_target
+            ]
+            self._done_ww = stop_ww
+            self._done_ws = stop_ws
+
+        # drop samples that are no longer required
+        keep_from = max(0, min(self._done_ww - (n_filter - 1), self._done_ws))
+        self._witness_buffer = witness[:, keep_from - start :]
+        self._target_buffer = target[..., keep_from - start :]
+        self._buffer_start = keep_from
+
+    def finalize(self) -> tuple[NDArray, NDArray]:
+        """Get the correlations of all data added so far
+
+        :return: r_ww[channel_a, channel_b, lag], r_ws[(target,) channel, lag] as defined by wf_correlations()
+        """
+        assert (
+            self.n_filter <= self.n_samples
+        ), "Input data must be at least one filter length"
+
+        self._accumulate()
+
+        # short datasets are handled differently
+        if self.n_samples < 3 * self.n_filter:
+            r_ww = witness_correlation_lags(self._witness_head, self.n_filter)
+        else:
+            r_ww = mirror_lower_channels(symmetrize_lags(self._r_ww_raw))
+
+        return r_ww, self._r_ws.copy()
+
+
+class SlidingCorrelationSums:
+    """Running correlation_sums() for sample ranges that move forward through a dataset
+
+    Consecutive ranges usually overlap almost completely. Instead of summing over the whole
+    range again, the samples that enter a range are added and the ones that leave it are
+    subtracted, so the cost of an update only depends on how far the range moved.
+    To limit the accumulation of rounding errors, a range is summed from scratch once the
+    number of updated samples exceeds its length.
+
+    :param witness: Witness sensor data (2D array)
+    :param target: Target sensor data (1D array or 2D array for multiple targets)
+    :param n_filter: Length of the FIR filter
+
+    >>> import numpy as np
+    >>> witness, target = np.random.normal(size=(2, 1000)), np.random.normal(size=1000)
+    >>> sums = SlidingCorrelationSums(witness, target, 8)
+    >>> _ = sums.update((100, 500), (90, 490))
+    >>> r_ww, r_ws = sums.update((150, 560), (140, 550))
+    >>> r_ww_ref, r_ws_ref = correlation_sums(witness, target, 8, (150, 560), (140, 550))
+    >>> bool(np.allclose(r_ww, r_ww_ref) and np.allclose(r_ws, r_ws_ref))
+    True
+
+    """
+
+    def __init__(self, witness: NDArray, target: NDArray, n_filter: int):
+        self.witness = witness
+        self.target = target
+        self.n_filter = n_filter
+
+        self._r_ww, self._r_ws = correlation_sums(witness, target, n_filter, (0, 0))
+        self._range_ww = (0, 0)
+        self._range_ws = (0, 0)
+        # number of samples added or subtracted since the last full summation
+        self._updated_ww = 0
+        self._updated_ws = 0
+
+    @staticmethod
+    def _plan(
+        old: tuple[int, int], new: tuple[int, int], updated: int
+    ) -> tuple[tuple[int, int], tuple[int, int], bool]:
+        """determine the ranges to add and subtract for a range update
+
+        :return: range to add, range to subtract, True if the sum is restarted
+        """
+        moves_forward = old[0] <= new[0] <= old[1] <= new[1]
+        n_updated = new[0] - old[0] + new[1] - old[1]
+        if moves_forward and updated + n_updated <= new[1] - new[0]:
+            return (old[1], new[1]), (old[0], new[0]), False
+        return new, (0, 0), True
+
+    def update(
+        self, range_ww: tuple[int, int], range_ws: tuple[int, int]
+    ) -> tuple[NDArray, NDArray]:
+        """move the summation ranges and get the updated sums
+
+        :param range_ww: (start, stop) sample indices for the auto-correlation
+        :param range_ws: (start, stop) sample indices for the cross-correlation
+
+        :return: sums as returned by correlation_sums() for these ranges (internal buffers,
+                 copy them if they are modified)
+        """
+        add_ww, sub_ww, restart_ww = self._plan(
+            self._range_ww, range_ww, self._updated_ww
+        )
+        add_ws, sub_ws, restart_ws = self._plan(
+            self._range_ws, range_ws, self._updated_ws
+        )
+        if restart_ww:
+            self._r_ww[:] = 0
+            self._updated_ww = 0
+        else:
+            self._updated_ww += add_ww[1] - add_ww[0] + sub_ww[1] - sub_ww[0]
+        if restart_ws:
+            self._r_ws[:] = 0
+            self._updated_ws = 0
+        else:
+            self._updated_ws += add_ws[1] - add_ws[0] + sub_ws[1] - sub_ws[0]
+
+        for sign, r_ww_range, r_ws_range in ((1, add_ww, add_ws), (-1, sub_ww, sub_ws)):
+            if r_ww_range[1] > r_ww_range[0] or r_ws_range[1] > r_ws_range[0]:
+                r_ww, r_ws = correlation_sums(
+                    self.witness, self.target, self.n_filter, r_ww_range, r_ws_range
+                )
+                self._r_ww += sign * r_ww
+                self._r_ws += sign * r_ws
+
+        self._range_ww = range_ww
+        self._range_ws = range_ws
+        return self._r_ww, self._r_ws
@@ -140,8 +140,8 @@ def residual_power_ratio(
     :param stop: use only a section of the arrays, stop at this index
     :param remove DC component: remove DC component before calculation
     """
-    target_npy = np.array(target[start:stop]).astype(np.float64)
-    prediction_npy = np.array(prediction[start:stop]).astype(np.float64)
+    target_npy = np.asarray(target[start:stop], dtype=np.float64)
+    prediction_npy = np.asarray(prediction[start:stop], dtype=np.float64)
     assert target_npy.shape == prediction_npy.shape
 
     if remove_dc:
@@ -153,6 +153,43 @@ def residual_power_ratio(
     return float(total_power(residual) / total_power(target_npy))
 
 
+def rank_configurations(
+    target: Sequence,
+    predictions: Sequence[Sequence] | NDArray,
+    configurations: Sequence,
+    start: int | None = None,
+    stop: int | None = None,
+    remove_dc: bool = True,
+) -> list[tuple[float, object]]:
+    """Rank filter configurations by the residual power ratio of their predictions
+
+    :param target: target signal array
+    :param predictions: one prediction array for each configuration (e.g. from lms.lms_parameter_sweep())
+    :param configurations: the configurations that produced the predictions
+    :param start: use only a section of the arrays, start at this index
+    :param stop: use only a section of the arrays, stop at this index
+    :param remove DC component: remove DC component before calculation
+
+    :return: list of (residual_power_ratio, configuration), best configuration first
+
+    >>> import numpy as np
+    >>> target = np.array([1.0, -1.0, 1.0, -1.0])
+    >>> ranking = rank_configurations(target, [0.5 * target, target], ["half", "full"])
+    >>> [configuration for ratio, configuration in ranking]
+    ['full', 'half']
+
+    """
+    assert len(predictions) == len(
+        configurations
+    ), "there must be one prediction for every configuration"
+    ratios = [
+        residual_power_ratio(target, prediction, start, stop, remove_dc)
+        for prediction in predictions
+    ]
+    order = np.argsort(ratios, kind="stable")
+    return [(ratios[idx], configurations[idx]) for idx in order]
+
+
 def residual_amplitude_ratio(*args, **kwargs) -> float:
     """Calculate the ratio between residual amplitude of the residual and the target signal
 
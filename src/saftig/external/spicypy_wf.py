@@ -35,6 +35,10 @@ class SpicypyWienerFilter(FilterBase):
     """
 
     filter_name = "SpicypyWF"
+    # spicypy requires more than n_filter samples per call
+    supports_streaming = False
+    # the state is a spicypy object
+    _state_attributes = None
 
     def __init__(
         self,
@@ -0,0 +1,183 @@
+"""Frequency domain block Least Mean Squares filter"""
+
+from collections.abc import Sequence
+import numpy as np
+from numpy.typing import NDArray
+from scipy.fft import rfft, irfft
+
+from .common import FilterBase
+
+#: Regularization of the per-bin normalization relative to the mean power estimate.
+#: Bins without witness power (e.g. a lead-in of zeros) are not updated instead of producing NaN.
+POWER_REGULARIZATION = 1e-6
+
+
+class FrequencyDomainLMSFilter(FilterBase):
+    """Frequency domain (block) LMS filter implementation
+
+    The coefficients are updated once per block of n_filter samples. Prediction and
+    gradient are calculated with overlap-save FFT convolution and correlation of length
+    2*n_filter, which makes the cost per sample O(n_channel * log(n_filter)) instead of
+    O(n_channel * n_filter). The gradient is constrained to n_filter taps, so the
+    result is a regular FIR filter with the same filter_state layout as LMSFilter.
+
+    :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
+    :param idx_target: Position of the prediction
+    :param n_channel: Number of witness sensor channels
+    :param normalized: if True, the step size is normalized individually for every frequency bin
+                       by a running estimate of the witness power. Else, a fixed step size is used.
+    :param step_scale: the learning rate of the filter
+    :param coefficient_clipping: If set to a positive float, FIR filter coefficients will be
+                                 limited to this value. This can increase filter stability.
+    :param power_smoothing: forgetting factor of the per-bin power estimate (0 to 1)
+
+    >>> import saftig as sg
+    >>> n_filter = 128
+    >>> witness, target = sg.TestDataGenerator(0.1).generate(int(1e5))
+    >>> filt = sg.FrequencyDomainLMSFilter(n_filter, 0, 1)
+    >>> filt.condition(witness, target)
+    >>> prediction = filt.apply(witness, target) # check on the data used for conditioning
+    >>> residual_rms = sg.RMS(target-prediction)
+    >>> residual_rms > 0.05 and residual_rms < 0.15 # the expected RMS in this test scenario is 0.1
+    True
+
+    """
+
+    #: The current FIR coefficients of the filter
+    filter_state: NDArray
+    filter_name = "FDLMS"
+    # the coefficient updates depend on the block boundaries, which would shift with every chunk
+    supports_streaming = False
+    _state_attributes = ("filter_state", "power_estimate")
+
+    def __init__(
+        self,
+        n_filter: int,
+        idx_target: int,
+        n_channel: int = 1,
+        normalized: bool = True,
+        step_scale: float = 0.1,
+        coefficient_clipping: float | None = None,
+        power_smoothing: float = 0.9,
+    ):
+        super().__init__(n_filter, idx_target, n_channel)
+        self.normalized = normalized
+        self.step_scale = step_scale
+        self.coefficient_clipping = coefficient_clipping
+        self.power_smoothing = power_smoothing
+
+        assert self.step_scale > 0, "Step scale must be positive"
+        assert (
+            self.coefficient_clipping is None or self.coefficient_clipping > 0
+        ), "coefficient_clipping must be positive"
+        assert 0 <= self.power_smoothing < 1, "power_smoothing must be in [0, 1)"
+
+        self.reset()
+
+    def reset(self):
+        """reset the filter coefficients and the power estimate to zero"""
+        self.filter_state = np.zeros((self.n_channel, self.n_filter))
+        self.power_estimate = np.zeros(self.n_filter + 1)
+
+    def condition(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+    ):
+        """Use an input dataset to condition the filter
+
+        :param witness: Witness sensor data
+        :param target: Target sensor data
+        """
+        self.apply(witness, target, update_state=True)
+
+    def apply(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+        pad: bool = True,
+        update_state: bool = False,
+    ) -> NDArray:
+        """Apply the filter to input data
+
+        :param witness: Witness sensor data
+        :param target: Target sensor data
+        :param pad: if True, apply padding zeros so that the length matches the target signal
+        :param update_state: if True, the filter state will be changed. If false, the filter state will remain
+
+        :return: prediction
+        """
+        witness, target = self.check_data_dimensions(witness, target)
+        assert target is not None, "Target data must be supplied"
+
+        n_filter = self.n_filter
+        n_fft = 2 * n_filter
+        offset_target = n_filter - self.idx_target - 1
+        pred_length = len(target) - n_filter + 1
+
+        filter_state = np.array(self.filter_state, dtype=np.float64)
+        power_estimate = np.array(self.power_estimate)
+        prediction = np.zeros(max(pred_length, 0))
+        error = np.zeros(n_filter)
+
+        for start in range(0, pred_length, n_filter):
+            block_length = min(n_filter, pred_length - start)
+            segment = witness[:, start : start + n_fft - 1]
+            witness_spectrum = rfft(segment, n_fft)
+
+            # overlap-save correlation with the current coefficients
+            filter_spectrum = rfft(filter_state, n_fft)
+            block_prediction = irfft(
+                np.sum(witness_spectrum * filter_spectrum.conj(), axis=0), n_fft
+            )[:block_length]
+            prediction[start : start + block_length] = block_prediction
+
+            error[:block_length] = (
+                target[start + offset_target : start + offset_target + block_length]
+                - block_prediction
+            )
+            error[block_length:] = 0
+
+            # gradient as correlation of the error with the witness data
+            gradient_spectrum = witness_spectrum * rfft(error, n_fft).conj()
+            if self.normalized:
+                # scaled to match the squared input norm of the NLMS filter for white noise
+                block_power = np.sum(np.abs(witness_spectrum) ** 2, axis=0) / 2
+                if not np.any(power_estimate):
+                    power_estimate = block_power
+                else:
+                    power_estimate = (
+                        self.power_smoothing * power_estimate
+                        + (1 - self.power_smoothing) * block_power
+                    )
+                gradient_spectrum /= (
+                    power_estimate
+                    + POWER_REGULARIZATION * np.mean(power_estimate)
+                    + np.finfo(np.float64).tiny
+                )
+            filter_state += (
+                2 * self.step_scale * irfft(gradient_spectrum, n_fft)[:, :n_filter]
+            )
+
+            if self.coefficient_clipping is not None:
+                np.clip(
+                    filter_state,
+                    -self.coefficient_clipping,
+                    self.coefficient_clipping,
+                    out=filter_state,
+                )
+
+        if update_state:
+            self.filter_state = filter_state
+            self.power_estimate = power_estimate
+
+        if pad:
+            prediction = np.concatenate(
+                [
+                    np.zeros(offset_target),
+                    prediction,
+                    np.zeros(len(target) - pred_length - offset_target),
+                ]
+            )
+
+        return prediction
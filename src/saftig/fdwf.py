@@ -0,0 +1,313 @@
+"""Wiener filter solved per frequency bin from Welch cross-spectral densities"""
+
+from typing import Optional, Tuple
+from collections.abc import Sequence
+from warnings import warn
+
+import numpy as np
+from numpy.typing import NDArray, DTypeLike
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft, irfft, next_fast_len
+from scipy.signal import get_window
+
+from .common import FilterBase, make_2d_array
+from .wf import wf_apply, APPLY_DTYPES
+
+#: Approximate number of complex spectrum values that are calculated at once by csd_matrices()
+CSD_BATCH_SIZE = 2**20
+
+#: Default segment length relative to n_filter, the windowing bias decreases with this ratio
+DEFAULT_SEGMENT_RATIO = 64
+
+#: Minimum number of Welch segments per witness channel for the default segment length
+MIN_SEGMENTS_PER_CHANNEL = 4
+
+
+def default_n_fft(
+    n_filter: int, n_samples: int, n_channel: int = 1, overlap: float = 0.5
+) -> int:
+    """default Welch segment length
+
+    Long segments reduce the bias of the windowed estimate for impulse responses that fill the
+    filter length. The length is DEFAULT_SEGMENT_RATIO * n_filter, but it is reduced so that
+    the data yields at least MIN_SEGMENTS_PER_CHANNEL segments per channel, and never
+    below n_filter.
+
+    :param n_filter: Length of the FIR filter
+    :param n_samples: Length of the conditioning data
+    :param n_channel: Number of witness sensor channels
+    :param overlap: Overlap of neighbouring segments as a fraction of the segment length
+
+    :return: segment length
+
+    >>> default_n_fft(32, int(1e6))
+    2048
+    >>> default_n_fft(32, 5000)
+    2000
+
+    """
+    n_segments = MIN_SEGMENTS_PER_CHANNEL * n_channel
+    # n segments cover n_fft * (1 + (n - 1) * (1 - overlap)) samples
+    max_length = int(n_samples / (1 + (n_segments - 1) * (1 - overlap)))
+    n_fft = min(next_fast_len(DEFAULT_SEGMENT_RATIO * n_filter, real=True), max_length)
+    return max(n_filter, n_fft - n_fft % 2)
+
+
+def csd_matrices(
+    witness: NDArray,
+    target: NDArray,
+    n_fft: int,
+    overlap: float = 0.5,
+    window: str = "hann",
+) -> Tuple[NDArray, NDArray]:
+    """estimate the witness cross-spectral density matrices and the witness-target CSDs
+
+    The Welch segments are views on the input. They are transformed in batches and the
+    products of all segments in a batch are summed with one batched matrix multiplication.
+    The densities are not normalized, the scale cancels in the normal equations.
+
+    :param witness: Witness sensor data (2D array)
+    :param target: Target sensor data (2D array, one row per target)
+    :param n_fft: Segment length
+    :param overlap: Overlap of neighbouring segments as a fraction of n_fft
+    :param window: Window function, see scipy.signal.get_window()
+
+    :return: S_ww[bin, channel_a, channel_b], S_ws[bin, channel, target]
+    """
+    assert 0 <= overlap < 1, "overlap must be in [0, 1)"
+    n_channel, n_target = len(witness), len(target)
+    step = max(1, int(n_fft * (1 - overlap)))
+    weights = get_window(window, n_fft)
+
+    # (channel, segment, sample) views
+    witness_segments = sliding_window_view(witness, n_fft, axis=-1)[:, ::step]
+    target_segments = sliding_window_view(target, n_fft, axis=-1)[:, ::step]
+    n_segments = witness_segments.shape[1]
+    segments_per_batch = max(1, CSD_BATCH_SIZE // (n_fft * (n_channel + n_target)))
+
+    S_ww = np.zeros((n_fft // 2 + 1, n_channel, n_channel), dtype=np.complex128)
+    S_ws = np.zeros((n_fft // 2 + 1, n_channel, n_target), dtype=np.complex128)
+    for start in range(0, n_segments, segments_per_batch):
+        batch = slice(start, start + segments_per_batch)
+        # (bin, channel, segment)
+        W = rfft(witness_segments[:, batch] * weights).transpose(2, 0, 1)
+        S = rfft(target_segments[:, batch] * weights).transpose(2, 0, 1)
+        W_conj = W.conj()
+        S_ww += W_conj @ W.transpose(0, 2, 1)
+        S_ws += W_conj @ S.transpose(0, 2, 1)
+    return S_ww, S_ws
+
+
+def fdwf_solve(
+    S_ww: NDArray,
+    S_ws: NDArray,
+    n_filter: int,
+    idx_target: int = 0,
+    rcond: float = 1e-10,
+) -> Tuple[NDArray, bool]:
+    """solve the normal equations of all frequency bins and truncate the result to FIR taps
+
+    :param S_ww: witness CSD matrices as returned by csd_matrices()
+    :param S_ws: witness-target CSDs as returned by csd_matrices()
+    :param n_filter: Length of the FIR filter, at most the segment length
+    :param idx_target: offset of the prediction relative to the end of the array
+    :param rcond: diagonal loading of each bin relative to its mean witness power.
+                  This keeps bins without witness power or with linearly dependent channels solvable.
+
+    :return: filter coefficients (target, channel, tap), full_rank (bool)
+    """
+    n_bins, n_channel, _ = S_ww.shape
+    n_fft = 2 * (n_bins - 1)
+    assert n_filter <= n_fft, "n_filter must not exceed the segment length"
+
+    full_rank = bool(np.all(np.linalg.matrix_rank(S_ww, hermitian=True) == n_channel))
+
+    power = np.trace(S_ww, axis1=1, axis2=2).real / n_channel
+    loading = np.where(power > 0, rcond * power, 1)
+    H = np.linalg.solve(
+        S_ww + loading[:, np.newaxis, np.newaxis] * np.eye(n_channel), S_ws
+    )
+
+    # circular impulse responses h[lag, channel, target]
+    h = irfft(H, n_fft, axis=0)
+    # WFC[..., k] belongs to the lag n_filter - 1 - idx_target - k
+    lags = (n_filter - 1 - idx_target - np.arange(n_filter)) % n_fft
+    return h[lags].transpose(2, 1, 0), full_rank
+
+
+def fdwf_calculate(
+    witness: Sequence | NDArray,
+    target: Sequence | NDArray,
+    n_filter: int,
+    idx_target: int = 0,
+    n_fft: Optional[int] = None,
+    overlap: float = 0.5,
+    window: str = "hann",
+    rcond: float = 1e-10,
+) -> Tuple[NDArray, bool]:
+    """calculate the FIR coefficients of a wiener filter in the frequency domain
+
+    :param witness: Witness sensor data
+    :param target: Target sensor data (1D array or 2D array for multiple targets)
+    :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
+    :param idx_target: offset of the prediction relative to the end of the array
+    :param n_fft: Welch segment length, see default_n_fft() for the default.
+                  It is limited to the data length.
+    :param overlap: Overlap of neighbouring segments, see csd_matrices()
+    :param window: Window function, see csd_matrices()
+    :param rcond: diagonal loading, see fdwf_solve()
+
+    :return: filter coefficients (target, channel, tap) for 2D targets, else (channel, tap), full_rank (bool)
+    """
+    target_npy: NDArray = np.asarray(target)
+    witness_npy: NDArray = make_2d_array(witness)
+    assert target_npy.ndim in (1, 2), "target must be a 1D or 2D array"
+    assert (
+        witness_npy.shape[1] == target_npy.shape[-1]
+    ), "Missmatch between witness_npy and target_npy data shape"
+    assert (
+        n_filter <= target_npy.shape[-1]
+    ), "Input data must be at least one filter length"
+
+    if n_fft is None:
+        n_fft = default_n_fft(n_filter, target_npy.shape[-1], len(witness_npy), overlap)
+    n_fft = min(n_fft, target_npy.shape[-1])
+
+    S_ww, S_ws = csd_matrices(
+        witness_npy, make_2d_array(target_npy), n_fft, overlap, window
+    )
+    WFC, full_rank = fdwf_solve(S_ww, S_ws, n_filter, idx_target, rcond)
+    if target_npy.ndim == 1:
+        WFC = WFC[0]
+    return WFC, full_rank
+
+
+class FrequencyDomainWienerFilter(FilterBase):
+    """Static Wiener filter that is solved per frequency bin
+
+    Instead of the n_channel*n_filter time domain normal equations of WienerFilter,
+    an n_channel x n_channel system is solved for each frequency bin of Welch averaged
+    cross-spectral densities. The memory usage scales with n_channel**2 * n_fft instead of
+    (n_channel * n_filter)**2, which allows filters with tens of thousands of taps.
+    The solution is converted to FIR taps, so it is applied like a WienerFilter.
+    It converges to the WF solution for long segments and data.
+
+    :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
+    :param idx_target: Position of the prediction
+    :param n_channel: Number of witness sensor channels
+    :param n_fft: Welch segment length, by default derived from n_filter and the data length
+                  (see default_n_fft()). Longer segments reduce the windowing bias and increase
+                  the frequency resolution, shorter segments reduce the variance of the estimate.
+    :param overlap: Overlap of neighbouring segments as a fraction of n_fft
+    :param window: Window function, see scipy.signal.get_window()
+    :param rcond: Diagonal loading of each frequency bin relative to its witness power
+    :param apply_dtype: Precision used by apply(), see saftig.wf.wf_apply(). The default uses
+                        FFT convolution, which is much faster than np.longdouble for long filters.
+
+    >>> import saftig as sg
+    >>> n_filter = 128
+    >>> witness, target = sg.TestDataGenerator(0.1).generate(int(1e5))
+    >>> filt = sg.FrequencyDomainWienerFilter(n_filter, 0, 1)
+    >>> _coefficients, full_rank = filt.condition(witness, target)
+    >>> full_rank
+    True
+    >>> prediction = filt.apply(witness, target) # check on the data used for conditioning
+    >>> residual_rms = sg.RMS(target-prediction)
+    >>> residual_rms > 0.05 and residual_rms < 0.15 # the expected RMS in this test scenario is 0.1
+    True
+
+    """
+
+    #: The FIR coefficients of the WF
+    filter_state: NDArray | None = None
+    filter_name = "FDWF"
+
+    def __init__(
+        self,
+        n_filter: int,
+        idx_target: int,
+        n_channel: int = 1,
+        n_fft: Optional[int] = None,
+        overlap: float = 0.5,
+        window: str = "hann",
+        rcond: float = 1e-10,
+        apply_dtype: DTypeLike = np.float64,
+    ):
+        super().__init__(n_filter, idx_target, n_channel)
+        self.n_fft = n_fft
+        self.overlap = overlap
+        self.window = window
+        self.rcond = rcond
+        self.apply_dtype = np.dtype(apply_dtype)
+
+        assert (
+            self.n_fft is None or self.n_fft >= self.n_filter
+        ), "n_fft must be at least n_filter"
+        assert 0 <= self.overlap < 1, "overlap must be in [0, 1)"
+        assert self.rcond >= 0, "rcond must not be negative"
+        assert (
+            self.apply_dtype in APPLY_DTYPES
+        ), f"apply_dtype must be one of {APPLY_DTYPES}"
+
+    def condition(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+    ):
+        """Use an input dataset to condition the filter
+
+        :param witness: Witness sensor data
+        :param target: Target sensor data (1D array or 2D array with one row per target)
+        """
+        self.requries_apply_target = False
+
+        witness_npy, target_npy = self.check_data_dimensions(witness, target)
+        self.filter_state, full_rank = fdwf_calculate(
+            witness_npy,
+            target_npy,
+            self.n_filter,
+            idx_target=self.idx_target,
+            n_fft=self.n_fft,
+            overlap=self.overlap,
+            window=self.window,
+            rcond=self.rcond,
+        )
+
+        if not full_rank:
+            warn("Warning: Filter is not of full rank", RuntimeWarning)
+        return self.filter_state, full_rank
+
+    def apply(
+        self,
+        witness: Sequence | NDArray,
+        target: Optional[Sequence | NDArray] = None,
+        pad: bool = True,
+        update_state: bool = False,
+    ) -> NDArray:
+        """Apply the filter to input data
+
+        :param witness: Witness sensor data
+        :param target: Target sensor data (is ignored)
+        :param pad: if True, apply padding zeros so that the length matches the target signal
+        :param update_state: ignored
+
+        :return: prediction, 2D array with one row per target if conditioned on multiple targets
+        """
+        witness, target = self.check_data_dimensions(witness, target)
+        if self.filter_state is None:
+            raise RuntimeError(
+                "The filter must be conditioned before apply() can be used."
+            )
+
+        prediction = np.array(
+            [
+                wf_apply(WFC, witness, self.apply_dtype)
+                for WFC in self.filter_state.reshape(-1, *self.filter_state.shape[-2:])
+            ]
+        )
+        if pad:
+            prediction = np.pad(
+                prediction,
+                [(0, 0), (self.n_filter - 1 - self.idx_target, self.idx_target)],
+            )
+        return prediction.reshape(self.filter_state.shape[:-2] + prediction.shape[-1:])
@@ -5,10 +5,17 @@ import numpy as np
 from numpy.typing import NDArray
 import numba
 
-from .common import FilterBase
+from .common import FilterBase, make_2d_array
 
+#: The running NLMS normalization is recalculated from scratch after this many samples
+#: to avoid the accumulation of rounding errors.
+NORM_RECALCULATION_INTERVAL = 1024
+#: The running NLMS normalization is also recalculated if it dropped below this fraction of
+#: its peak value since the last recalculation.
+NORM_CANCELLATION_LIMIT = 1e-6
 
-@numba.njit
+
+@numba.njit(error_model="numpy")
 def _lms_loop(
     witness: NDArray,
     target: NDArray,
@@ -19,34 +26,239 @@ def _lms_loop(
     step_scale: float,
     coefficient_clipping: float | None,
 ) -> tuple[NDArray, NDArray, int, int]:
+    n_channel = witness.shape[0]
     offset_target = n_filter - idx_target - 1
     pred_length = len(target) - n_filter + 1
 
-    prediction = []
+    prediction = np.empty(max(pred_length, 0), dtype=np.float64)
+    norm = 0.0
+    norm_peak = 0.0
     for idx in range(0, pred_length):
         # make prediction
-        w_sel = witness[:, idx : idx + n_filter]  # input to predcition
-        pred = np.sum(filter_state * w_sel)
+        pred = 0.0
+        for channel in range(n_channel):
+            for k in range(n_filter):
+                pred += filter_state[channel, k] * witness[channel, idx + k]
         err = target[idx + offset_target] - pred
-
-        prediction.append(pred)
+        prediction[idx] = pred
 
         # update filter
+        factor = 2 * step_scale * err
         if normalized:
-            norm = np.sum(w_sel * w_sel)
+            # the squared input norm is a running sum over the input window
+            # it is recalculated periodically and after strong cancellation to limit rounding errors
+            if idx > 0:
+                for channel in range(n_channel):
+                    norm += (
+                        witness[channel, idx + n_filter - 1]
+                        * witness[channel, idx + n_filter - 1]
+                        - witness[channel, idx - 1] * witness[channel, idx - 1]
+                    )
+                norm_peak = max(norm_peak, norm)
+            if (
+                idx % NORM_RECALCULATION_INTERVAL == 0
+                or norm <= norm_peak * NORM_CANCELLATION_LIMIT
+            ):
+                norm = 0.0
+                for channel in range(n_channel):
+                    for k in range(n_filter):
+                        norm += witness[channel, idx + k] * witness[channel, idx + k]
+                norm_peak = norm
             if norm < 0:
                 raise ValueError(
                     "Overflow! You are probably passing integers of insufficient precision to this function."
                 )
-            filter_state += 2 * step_scale * err * w_sel / norm
-        else:
-            filter_state += 2 * step_scale * err * w_sel
+            factor /= norm
+
+        for channel in range(n_channel):
+            for k in range(n_filter):
+                filter_state[channel, k] += factor * witness[channel, idx + k]
+                if coefficient_clipping is not None:
+                    filter_state[channel, k] = min(
+                        max(filter_state[channel, k], -coefficient_clipping),
+                        coefficient_clipping,
+                    )
+    return prediction, filter_state, offset_target, pred_length
+
+
+@numba.njit(error_model="numpy")
+def _lms_sweep_loop(
+    witness: NDArray,
+    target: NDArray,
+    n_filter: int,
+    idx_target: int,
+    filter_states: NDArray,
+    normalized: NDArray,
+    step_scale: NDArray,
+    coefficient_clipping: NDArray,
+) -> NDArray:
+    """advance several LMS filters over the same data in lockstep
+
+    Every witness sample is loaded once per time step and used for all configurations.
+    The NLMS normalization only depends on the witness data and is shared.
+    The arithmetic of every configuration is identical to _lms_loop.
+
+    :param filter_states: zero coefficients with shape (n_channel, n_filter, n_config) (updated in place)
+    :param normalized: NLMS setting for each configuration
+    :param step_scale: step size for each configuration
+    :param coefficient_clipping: clipping limit for each configuration, inf to disable clipping
+
+    :return: prediction with shape (n_config, pred_length)
+    """
+    n_channel = witness.shape[0]
+    n_config = filter_states.shape[2]
+    offset_target = n_filter - idx_target - 1
+    pred_length = len(target) - n_filter + 1
+
+    prediction = np.empty((n_config, max(pred_length, 0)), dtype=np.float64)
+    pred = np.zeros(n_config)
+    pred_next = np.empty(n_config)
+    factor = np.empty(n_config)
+    norm = 0.0
+    norm_peak = 0.0
+    for idx in range(0, pred_length):
+        prediction[:, idx] = pred
+
+        # shared running normalization, see _lms_loop
+        if idx > 0:
+            for channel in range(n_channel):
+                norm += (
+                    witness[channel, idx + n_filter - 1]
+                    * witness[channel, idx + n_filter - 1]
+                    - witness[channel, idx - 1] * witness[channel, idx - 1]
+                )
+            norm_peak = max(norm_peak, norm)
+        if (
+            idx % NORM_RECALCULATION_INTERVAL == 0
+            or norm <= norm_peak * NORM_CANCELLATION_LIMIT
+        ):
+            norm = 0.0
+            for channel in range(n_channel):
+                for k in range(n_filter):
+                    norm += witness[channel, idx + k] * witness[channel, idx + k]
+            norm_peak = norm
 
-        if coefficient_clipping is not None:
-            filter_state = np.clip(
-                filter_state, -coefficient_clipping, coefficient_clipping
+        for config in range(n_config):
+            factor[config] = (
+                2 * step_scale[config] * (target[idx + offset_target] - pred[config])
             )
-    return np.array(prediction), filter_state, offset_target, pred_length
+            if normalized[config]:
+                if norm < 0:
+                    raise ValueError(
+                        "Overflow! You are probably passing integers of insufficient precision to this function."
+                    )
+                factor[config] /= norm
+
+        # update the filters and make the next predictions in the same pass over the coefficients
+        # the initial coefficients are zero, so the first prediction is zero
+        pred_next[:] = 0.0
+        has_next = idx + 1 < pred_length
+        for channel in range(n_channel):
+            for k in range(n_filter):
+                sample = witness[channel, idx + k]
+                sample_next = witness[channel, idx + k + 1] if has_next else 0.0
+                for config in range(n_config):
+                    coefficient = min(
+                        max(
+                            filter_states[channel, k, config] + factor[config] * sample,
+                            -coefficient_clipping[config],
+                        ),
+                        coefficient_clipping[config],
+                    )
+                    filter_states[channel, k, config] = coefficient
+                    pred_next[config] += coefficient * sample_next
+        pred[:] = pred_next
+    return prediction
+
+
+def lms_parameter_sweep(
+    witness: Sequence | NDArray,
+    target: Sequence | NDArray,
+    n_filter: int,
+    idx_target: int,
+    configurations: Sequence[dict],
+    pad: bool = True,
+) -> NDArray:
+    """Run LMSFilter configurations over the same data in a single pass
+
+    This is equivalent to conditioning a fresh LMSFilter for every configuration, but
+    the witness data is only streamed through memory once. Use rank_configurations()
+    to compare the results.
+
+    :param witness: Witness sensor data
+    :param target: Target sensor data
+    :param n_filter: Length of the FIR filter
+    :param idx_target: Position of the prediction
+    :param configurations: LMSFilter settings ('normalized', 'step_scale', 'coefficient_clipping') for each run.
+                           Missing settings take the LMSFilter defaults.
+    :param pad: if True, apply padding zeros so that the length matches the target signal
+
+    :return: prediction with shape (len(configurations), n_samples)
+
+    >>> import saftig as sg
+    >>> witness, target = sg.TestDataGenerator(0.1).generate(int(2e4))
+    >>> configurations = [{"step_scale": step_scale} for step_scale in [0.001, 0.01, 0.1]]
+    >>> predictions = lms_parameter_sweep(witness, target, 32, 0, configurations)
+    >>> predictions.shape
+    (3, 20000)
+
+    """
+    # LMSFilter defaults
+    defaults = {"normalized": True, "step_scale": 0.1, "coefficient_clipping": None}
+    configurations = [
+        defaults | dict(configuration) for configuration in configurations
+    ]
+    for configuration in configurations:
+        assert set(configuration) == set(
+            defaults
+        ), f"unknown settings {set(configuration) - set(defaults)}"
+        assert configuration["step_scale"] > 0, "Step scale must be positive"
+        assert (
+            configuration["coefficient_clipping"] is None
+            or configuration["coefficient_clipping"] > 0
+        ), "coefficient_clipping must be positive"
+
+    witness = make_2d_array(witness)
+    target = np.asarray(target)
+    assert target.shape == (
+        witness.shape[1],
+    ), "Missmatch between target and witness data shapes"
+
+    n_config = len(configurations)
+    prediction = _lms_sweep_loop(
+        witness,
+        target,
+        n_filter,
+        idx_target,
+        np.zeros((witness.shape[0], n_filter, n_config)),
+        np.array([c["normalized"] for c in configurations], dtype=np.bool_),
+        np.array([c["step_scale"] for c in configurations], dtype=np.float64),
+        np.array(
+            [
+                (
+                    np.inf
+                    if c["coefficient_clipping"] is None
+                    else c["coefficient_clipping"]
+                )
+                for c in configurations
+            ],
+            dtype=np.float64,
+        ),
+    )
+
+    if pad:
+        offset_target = n_filter - idx_target - 1
+        pred_length = len(target) - n_filter + 1
+        prediction = np.concatenate(
+            [
+                np.zeros((n_config, offset_target)),
+                prediction,
+                np.zeros((n_config, len(target) - pred_length - offset_target)),
+            ],
+            axis=1,
+        )
+
+    return prediction
 
 
 class LMSFilter(FilterBase):
@@ -136,7 +348,7 @@ class LMSFilter(FilterBase):
             target,
             self.n_filter,
             self.idx_target,
-            np.array(self.filter_state),
+            np.array(self.filter_state, dtype=np.float64),
             self.normalized,
             self.step_scale,
             self.coefficient_clipping,
@@ -2,7 +2,7 @@
 
 from collections.abc import Sequence
 import numpy as np
-from numpy.typing import NDArray
+from numpy.typing import NDArray, DTypeLike
 
 from ._lms_c import LMS_C  # type: ignore[attr-defined]
 from .common import FilterBase
@@ -16,6 +16,9 @@ class LMSFilterC(FilterBase):
     :param n_channel: Number of witness sensor channels
     :param normalized: if True: NLMS, else LMS
     :param step_scale: the learning rate of the LMS filter
+    :param coefficient_clipping: If set to a positive float, FIR filter coefficients will be limited to this value. This can increase filter stability.
+    :param dtype: np.float64 or np.float32. The float32 variant processes twice as many values per SIMD
+                  instruction but is less precise. Input data is converted to this dtype.
 
     >>> import saftig as sg
     >>> n_filter = 128
@@ -39,8 +42,18 @@ class LMSFilterC(FilterBase):
         step_scale: float = 0.1,
         normalized: bool = True,
         coefficient_clipping: float | None = None,
+        dtype: DTypeLike = np.float64,
     ):
         super().__init__(n_filter, idx_target, n_channel)
+        self.step_scale = step_scale
+        self.normalized = normalized
+        self.coefficient_clipping = coefficient_clipping
+        self.dtype = np.dtype(dtype)
+        assert self.dtype in (
+            np.float32,
+            np.float64,
+        ), "dtype must be np.float32 or np.float64"
+
         self.filter = LMS_C(
             n_filter,
             idx_target,
@@ -48,16 +61,31 @@ class LMSFilterC(FilterBase):
             step_scale,
             normalized,
             np.nan if coefficient_clipping is None else coefficient_clipping,
+            self.dtype == np.float32,
         )
 
+    @property
+    def filter_state(self) -> NDArray:
+        """The current FIR coefficients (n_channel, n_filter)
+
+        This is a writeable view on the coefficient buffer of the C implementation, changes
+        are applied to the filter. Assigning an array copies it into the buffer, e.g. to warm start
+        the filter from a Wiener filter solution.
+        """
+        return self.filter.coefficients
+
+    @filter_state.setter
+    def filter_state(self, value: NDArray) -> None:
+        self.filter.coefficients = value
+
     def reset(self) -> None:
         """reset the filter coefficients to zero"""
-        raise RuntimeError("This is not implemented yet")
+        self.filter.reset()
 
     def condition(
         self,
-        witness: Sequence[float] | Sequence[Sequence[float]],
-        target: Sequence[float],
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
     ):
         """Use an input dataset to condition the filter
 
@@ -78,6 +106,7 @@ class LMSFilterC(FilterBase):
         :param witness: Witness sensor data
         :param target: Target sensor data (is ignored)
         :param pad: if True, apply padding zeros so that the length matches the target signal
+        :param update_state: if True, the filter state will be changed. If false, the filter state will remain
 
         :return: prediction
         """
@@ -87,20 +116,18 @@ class LMSFilterC(FilterBase):
         offset_target = self.n_filter - self.idx_target - 1
         pred_length = len(target) - self.n_filter + 1
 
-        # iterate over data (the python loop is very slow)
-        prediction: NDArray = np.zeros(pred_length)
-        for idx in range(0, pred_length):
-            w_sel = witness[:, idx : idx + self.n_filter]  # input to predcition
-
-            pred = self.filter.step(w_sel, target[idx + offset_target])
-            prediction[idx] = pred
+        # the whole loop runs in C without holding the GIL
+        prediction: NDArray = self.filter.process(witness, target, update_state)
 
         if pad:
             prediction = np.concatenate(
                 (
-                    np.zeros(offset_target),
+                    np.zeros(offset_target, dtype=prediction.dtype),
                     prediction,
-                    np.zeros(len(target) - pred_length - offset_target),
+                    np.zeros(
+                        len(target) - pred_length - offset_target,
+                        dtype=prediction.dtype,
+                    ),
                 )
             )
 
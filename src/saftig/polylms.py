@@ -7,9 +7,10 @@ from numpy.typing import NDArray
 import numba
 
 from .common import FilterBase
+from .lms import NORM_RECALCULATION_INTERVAL, NORM_CANCELLATION_LIMIT
 
 
-@numba.njit
+@numba.njit(error_model="numpy")
 def _lms_loop(
     witness: NDArray,
     target: NDArray,
@@ -23,11 +24,16 @@ def _lms_loop(
 ) -> tuple[NDArray, NDArray, int, int]:
     """Run an LMS filter over intput sequences.
 
+    The powers of the witness samples in the input window are kept in a ring buffer that
+    stores every element twice, so the window is always a contiguous slice. Only the newest
+    sample is raised to the powers 1 to order (by repeated multiplication), which makes the
+    runtime linear in the order.
+
     :param witness: Witness sensor data
     :param target: Target sensor data (is ignored)
     :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
     :param idx_target: Position of the prediction
-    :param filter_state: The initial FIR filter state
+    :param filter_state: The initial FIR filter state (updated in place)
     :param normalized: if True: NLMS, else LMS
     :param step_scale: the learning rate of the LMS filter
 
@@ -38,44 +44,91 @@ def _lms_loop(
 
     :return: Prediction, Filter state, Target offset, Prediction length
     """
+    n_channel = witness.shape[0]
     offset_target = n_filter - idx_target - 1
     pred_length = len(target) - n_filter + 1
 
-    prediction = []
+    # powers[i, channel, slot] = sample^(i+1) with slot = sample index % n_filter (and + n_filter)
+    powers = np.empty((order, n_channel, 2 * n_filter))
+    for channel in range(n_channel):
+        for k in range(min(n_filter - 1, witness.shape[1])):
+            value = 1.0
+            for i in range(order):
+                value *= witness[channel, k]
+                powers[i, channel, k] = value
+                powers[i, channel, k + n_filter] = value
+
+    prediction = np.empty(max(pred_length, 0), dtype=np.float64)
+    factor = np.empty(order)
+    norm = 0.0
+    norm_peak = 0.0
     for idx in range(0, pred_length):
+        # power the sample that enters the window
+        slot = (idx + n_filter - 1) % n_filter
+        for channel in range(n_channel):
+            value = 1.0
+            for i in range(order):
+                value *= witness[channel, idx + n_filter - 1]
+                powers[i, channel, slot] = value
+                powers[i, channel, slot + n_filter] = value
+        start = idx % n_filter
+
         # make prediction
-        w_sel = witness[:, idx : idx + n_filter]  # input to predcition
-        pred = 0
+        pred = 0.0
         for i in range(order):
-            pred += np.sum(filter_state[i] * w_sel ** (i + 1))
+            for channel in range(n_channel):
+                for k in range(n_filter):
+                    pred += filter_state[i, channel, k] * powers[i, channel, start + k]
         err = target[idx + offset_target] - pred
-
-        prediction.append(pred)
+        prediction[idx] = pred
 
         # update filter
+        for i in range(order):
+            factor[i] = 2 * step_scale * err
         if normalized:
-            norm = np.sum(w_sel * w_sel)
+            # running squared input norm, see lms._lms_loop
+            if idx > 0:
+                for channel in range(n_channel):
+                    norm += (
+                        witness[channel, idx + n_filter - 1]
+                        * witness[channel, idx + n_filter - 1]
+                        - witness[channel, idx - 1] * witness[channel, idx - 1]
+                    )
+                norm_peak = max(norm_peak, norm)
+            if (
+                idx % NORM_RECALCULATION_INTERVAL == 0
+                or norm <= norm_peak * NORM_CANCELLATION_LIMIT
+            ):
+                norm = 0.0
+                for channel in range(n_channel):
+                    for k in range(n_filter):
+                        norm += witness[channel, idx + k] * witness[channel, idx + k]
+                norm_peak = norm
             if norm < 0:
                 raise ValueError(
                     "Overflow! You are probably passing integers of insufficient precision to this function."
                 )
 
+            # NOTE: this might not be the correct/optimal normalization
+            # order i + 1 is normalized by norm^((i + 2) / 2)
+            scale = norm
             for i in range(order):
-                # NOTE: this might not be the correct/optimal normalization
-                filter_state[i] += (
-                    2 * step_scale * err * w_sel ** (i + 1) / norm ** ((i + 2) / 2)
-                )
-        else:
-            for i in range(order):
-                filter_state[i] += 2 * step_scale * err * w_sel ** (i + 1)
+                factor[i] /= scale
+                scale *= np.sqrt(norm)
 
-        if coefficient_clipping is not None:
-            filter_state = np.clip(
-                filter_state, -coefficient_clipping, coefficient_clipping
-            )
+        for i in range(order):
+            for channel in range(n_channel):
+                for k in range(n_filter):
+                    filter_state[i, channel, k] += (
+                        factor[i] * powers[i, channel, start + k]
+                    )
+                    if coefficient_clipping is not None:
+                        filter_state[i, channel, k] = min(
+                            max(filter_state[i, channel, k], -coefficient_clipping),
+                            coefficient_clipping,
+                        )
 
-    prediction_npy = np.array(prediction, dtype=np.float64)
-    return prediction_npy, filter_state, offset_target, pred_length
+    return prediction, filter_state, offset_target, pred_length
 
 
 class PolynomialLMSFilter(FilterBase):
@@ -170,7 +223,7 @@ class PolynomialLMSFilter(FilterBase):
             target,
             self.n_filter,
             self.idx_target,
-            np.array(self.filter_state),
+            np.array(self.filter_state, dtype=np.float64),
             self.normalized,
             self.step_scale,
             self.coefficient_clipping,
@@ -0,0 +1,475 @@
+"""Recursive Least Squares filter"""
+
+from collections.abc import Sequence
+import numpy as np
+from numpy.typing import NDArray
+import numba
+
+from .common import FilterBase
+
+#: Relative weight of the discarded statistics when a restarted fast transversal state
+#: replaces the previous one. This determines the restart interval of the fast variant.
+RESTART_PRECISION = 1e-9
+
+
+@numba.njit
+def _regressor(extended: NDArray, end: int, n_filter: int) -> NDArray:
+    """lag ordered regressor x[lag * n_channel + channel] = extended[channel, end - lag]"""
+    n_channel = extended.shape[0]
+    x = np.empty(n_filter * n_channel)
+    for lag in range(n_filter):
+        for channel in range(n_channel):
+            x[lag * n_channel + channel] = extended[channel, end - lag]
+    return x
+
+
+@numba.njit
+def _rls_loop(
+    extended: NDArray,
+    target: NDArray,
+    n_filter: int,
+    n_bridge: int,
+    weights: NDArray,
+    inverse_correlation: NDArray,
+    forgetting_factor: float,
+) -> NDArray:
+    """conventional RLS with O((n_channel*n_filter)^2) operations per sample
+
+    :param extended: witness data with n_filter samples of history at the start
+    :param target: target value for every output
+    :param n_filter: Length of the FIR filter
+    :param n_bridge: number of leading windows that only update the statistics
+    :param weights: lag ordered coefficients (updated in place)
+    :param inverse_correlation: inverse of the weighted autocorrelation matrix (updated in place)
+    :param forgetting_factor: exponential forgetting factor
+
+    :return: prediction
+    """
+    n_steps = extended.shape[1] - n_filter
+    n_taps = len(weights)
+    inverse_forgetting = 1 / forgetting_factor
+    prediction = np.zeros(max(0, n_steps - n_bridge))
+    for step in range(n_steps):
+        x = _regressor(extended, n_filter + step, n_filter)
+        px = inverse_correlation @ x
+        denominator = forgetting_factor + x @ px
+        gain = px / denominator
+        # the outer product of px with itself keeps the matrix exactly symmetric,
+        # which prevents the divergence of the textbook update
+        inverse_denominator = 1 / denominator
+        for i in range(n_taps):
+            for j in range(n_taps):
+                inverse_correlation[i, j] = (
+                    inverse_correlation[i, j] - px[i] * px[j] * inverse_denominator
+                ) * inverse_forgetting
+
+        if step >= n_bridge:
+            pred = weights @ x
+            prediction[step - n_bridge] = pred
+            weights += gain * (target[step - n_bridge] - pred)
+    return prediction
+
+
+@numba.njit
+def _ftf_restart(
+    forward: NDArray,
+    forward_energy: NDArray,
+    backward: NDArray,
+    gain: NDArray,
+    regularization: float,
+):
+    """initialize a fast transversal state that only contains the regularization"""
+    forward[:] = 0
+    backward[:] = 0
+    forward_energy[:] = regularization * np.eye(forward.shape[1])
+    gain[:] = 0
+
+
+@numba.njit
+def _ftf_update(
+    x_previous: NDArray,
+    x: NDArray,
+    u_new: NDArray,
+    u_old: NDArray,
+    age: int,
+    forward: NDArray,
+    forward_energy: NDArray,
+    backward: NDArray,
+    gain: NDArray,
+    forgetting_factor: float,
+) -> float:
+    """advance a fast transversal state by one sample
+
+    A state only sees the samples since it was started, older samples are replaced by zeros.
+    The conversion factor and the backward prediction error are calculated directly instead
+    of with their recursions. The pseudo-inverse of the forward prediction error covariance
+    keeps linearly dependent channels usable.
+
+    :param age: number of samples the state processed before
+
+    :return: conversion factor, which is in (0, 1] unless the state diverged
+    """
+    n_channel = forward.shape[1]
+    n_taps = len(gain)
+    if age * n_channel < n_taps:
+        x_previous = x_previous.copy()
+        x_previous[age * n_channel :] = 0
+        x = x.copy()
+        x[(age + 1) * n_channel :] = 0
+        u_old = np.zeros(n_channel)
+    conversion_previous = 1 / (1 + x_previous @ gain)
+
+    # forward prediction of the new sample yields the gain of the extended regressor
+    alpha = u_new - forward.T @ x_previous
+    scaled = np.linalg.pinv(forward_energy) @ alpha / forgetting_factor
+    gain_extended = np.empty(n_taps + n_channel)
+    gain_extended[:n_channel] = scaled
+    gain_extended[n_channel:] = gain - forward @ scaled
+    forward += conversion_previous * np.outer(gain, alpha)
+    forward_energy *= forgetting_factor
+    forward_energy += conversion_previous * np.outer(alpha, alpha)
+
+    # the backward predictor removes the oldest sample
+    gain[:] = gain_extended[:n_taps] + backward @ gain_extended[n_taps:]
+    conversion = 1 / (1 + x @ gain)
+    beta = u_old - backward.T @ x
+    backward += conversion * np.outer(gain, beta)
+    return conversion
+
+
+@numba.njit
+def _ftf_loop(
+    extended: NDArray,
+    target: NDArray,
+    n_filter: int,
+    n_bridge: int,
+    weights: NDArray,
+    forward: NDArray,
+    forward_energy: NDArray,
+    backward: NDArray,
+    gain: NDArray,
+    age: NDArray,
+    forgetting_factor: float,
+    regularization: float,
+    restart_interval: int,
+) -> tuple[NDArray, int]:
+    """multichannel fast transversal RLS with O(n_channel^2*n_filter) operations per sample
+
+    The state arrays have a leading dimension of two. Index 0 holds the state that is used
+    for the coefficient updates, index 1 a younger state that is started once the first one
+    is restart_interval samples old and replaces it after another restart_interval samples.
+    Exponential forgetting makes both equivalent by then, but the rounding errors
+    of the younger state had less time to accumulate. A restart_interval of 0 disables this.
+    If the conversion factor leaves the interval (0, 1], the state is replaced immediately.
+    The coefficients are not updated while the used state is younger than n_filter samples.
+
+    :param extended: witness data with n_filter samples of history at the start
+    :param target: target value for every output
+    :param n_filter: Length of the FIR filter
+    :param n_bridge: number of leading windows that only update the statistics
+    :param weights: lag ordered coefficients (updated in place)
+    :param forward: forward prediction matrices (2, n_channel*n_filter, n_channel) (updated in place)
+    :param forward_energy: forward prediction error covariances (2, n_channel, n_channel) (updated in place)
+    :param backward: backward prediction matrices (2, n_channel*n_filter, n_channel) (updated in place)
+    :param gain: normalized a priori gains of the last regressor (2, n_channel*n_filter) (updated in place)
+    :param age: number of samples processed by each state, -1 for inactive states (updated in place)
+    :param forgetting_factor: exponential forgetting factor
+    :param regularization: initial autocorrelation scale
+    :param restart_interval: age of the state at which the younger state is started
+
+    :return: prediction, number of replacements because of divergence
+    """
+    n_steps = extended.shape[1] - n_filter
+    prediction = np.zeros(max(0, n_steps - n_bridge))
+    n_rescue = 0
+
+    # the entering and leaving samples in double precision
+    u_new = np.empty(extended.shape[0])
+    u_old = np.empty(extended.shape[0])
+    x_previous = _regressor(extended, n_filter - 1, n_filter)
+    for step in range(n_steps):
+        end = n_filter + step
+        x = _regressor(extended, end, n_filter)
+        u_new[:] = extended[:, end]
+        u_old[:] = extended[:, end - n_filter]
+
+        if restart_interval > 0 and age[0] >= restart_interval and age[1] < 0:
+            _ftf_restart(
+                forward[1], forward_energy[1], backward[1], gain[1], regularization
+            )
+            age[1] = 0
+
+        conversion = np.zeros(2)
+        for idx in range(2):
+            if age[idx] >= 0:
+                conversion[idx] = _ftf_update(
+                    x_previous,
+                    x,
+                    u_new,
+                    u_old,
+                    age[idx],
+                    forward[idx],
+                    forward_energy[idx],
+                    backward[idx],
+                    gain[idx],
+                    forgetting_factor,
+                )
+                age[idx] += 1
+        if not 0 < conversion[1] <= 1:
+            age[1] = -1
+
+        diverged = not 0 < conversion[0] <= 1
+        if diverged:
+            n_rescue += 1
+        if diverged or (restart_interval > 0 and age[1] >= restart_interval):
+            if age[1] > 0:
+                forward[0] = forward[1]
+                forward_energy[0] = forward_energy[1]
+                backward[0] = backward[1]
+                gain[0] = gain[1]
+                conversion[0] = conversion[1]
+                age[0] = age[1]
+            else:
+                _ftf_restart(
+                    forward[0], forward_energy[0], backward[0], gain[0], regularization
+                )
+                age[0] = 0
+            age[1] = -1
+
+        if step >= n_bridge:
+            pred = weights @ x
+            prediction[step - n_bridge] = pred
+            if age[0] >= n_filter:
+                weights += conversion[0] * gain[0] * (target[step - n_bridge] - pred)
+
+        x_previous = x
+    return prediction, n_rescue
+
+
+class RLSFilter(FilterBase):
+    """Recursive Least Squares filter implementation
+
+    The coefficients minimize the exponentially weighted squared prediction error
+    of all previous samples. This converges much faster than LMS and requires no step size tuning.
+    The conventional algorithm requires O((n_channel*n_filter)^2) operations per sample, the
+    fast transversal variant O(n_channel^2*n_filter). Both produce the same result up to rounding errors.
+    To bound the accumulation of rounding errors, the fast variant periodically replaces its state
+    with a restarted one. The statistics this discards have a relative weight of RESTART_PRECISION,
+    so the forgetting factor should be below one. For a forgetting factor of one, no restarts happen.
+
+    The filter keeps the last n_filter witness samples. If the next input does not continue
+    them, the windows that bridge the previous and the new data update the correlation estimates
+    (but not the coefficients), which keeps the shift structure the fast variant relies on.
+
+    :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
+    :param idx_target: Position of the prediction
+    :param n_channel: Number of witness sensor channels
+    :param forgetting_factor: Exponential weight of previous samples (0 < forgetting_factor <= 1).
+                              The effective memory is about 1/(1-forgetting_factor) samples.
+    :param regularization: Scale of the initial autocorrelation estimate.
+                           Small values make the initial convergence faster but less stable.
+    :param algorithm: 'conventional' or 'fast_transversal'
+
+    >>> import saftig as sg
+    >>> n_filter = 32
+    >>> witness, target = sg.TestDataGenerator(0.1).generate(int(2e4))
+    >>> filt = sg.RLSFilter(n_filter, 0, 1, algorithm="fast_transversal")
+    >>> filt.condition(witness, target)
+    >>> prediction = filt.apply(witness, target) # check on the data used for conditioning
+    >>> residual_rms = sg.RMS(target-prediction)
+    >>> residual_rms > 0.05 and residual_rms < 0.15 # the expected RMS in this test scenario is 0.1
+    True
+
+    """
+
+    #: The current FIR coefficients of the RLS filter
+    filter_state: NDArray
+    filter_name = "RLS"
+    _state_attributes = (
+        "filter_state",
+        "n_rescue",
+        "_history",
+        "_inverse_correlation",
+        "_forward",
+        "_forward_energy",
+        "_backward",
+        "_gain",
+        "_age",
+    )
+
+    def __init__(
+        self,
+        n_filter: int,
+        idx_target: int,
+        n_channel: int = 1,
+        forgetting_factor: float = 0.999,
+        regularization: float = 1e-2,
+        algorithm: str = "conventional",
+    ):
+        super().__init__(n_filter, idx_target, n_channel)
+        self.forgetting_factor = forgetting_factor
+        self.regularization = regularization
+        self.algorithm = algorithm
+
+        assert 0 < self.forgetting_factor <= 1, "forgetting_factor must be in (0, 1]"
+        assert self.regularization > 0, "regularization must be positive"
+        assert self.algorithm in (
+            "conventional",
+            "fast_transversal",
+        ), f"unknown algorithm '{algorithm}'"
+
+        #: number of samples after which the fast transversal state is restarted
+        self.restart_interval = (
+            int(np.ceil(np.log(RESTART_PRECISION) / np.log(self.forgetting_factor)))
+            if self.forgetting_factor < 1
+            else 0
+        )
+        #: number of times the fast transversal state diverged and was replaced
+        self.n_rescue = 0
+        self.reset()
+
+    def reset(self):
+        """reset the filter coefficients and correlation estimates"""
+        n_taps = self.n_channel * self.n_filter
+        self.filter_state = np.zeros((self.n_channel, self.n_filter))
+        self._history = np.zeros((self.n_channel, self.n_filter))
+
+        # initial autocorrelation regularization * diag(forgetting_factor^-lag)
+        # is consistent with the shift structure of the fast transversal algorithm
+        lag_weights = np.repeat(
+            self.forgetting_factor ** np.arange(self.n_filter), self.n_channel
+        )
+        self._inverse_correlation = np.diag(lag_weights / self.regularization)
+        self._forward = np.zeros((2, n_taps, self.n_channel))
+        self._forward_energy = np.array(
+            [self.regularization * np.eye(self.n_channel)] * 2
+        )
+        self._backward = np.zeros((2, n_taps, self.n_channel))
+        self._gain = np.zeros((2, n_taps))
+        self._age = np.array([0, -1])
+
+    def condition(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+    ):
+        """Use an input dataset to condition the filter
+
+        :param witness: Witness sensor data
+        :param target: Target sensor data
+        """
+        self.apply(witness, target, update_state=True)
+
+    def apply(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+        pad: bool = True,
+        update_state: bool = False,
+    ) -> NDArray:
+        """Apply the filter to input data
+
+        :param witness: Witness sensor data
+        :param target: Target sensor data
+        :param pad: if True, apply padding zeros so that the length matches the target signal
+        :param update_state: if True, the filter state will be changed. If false, the filter state will remain
+
+        :return: prediction
+        """
+        witness, target = self.check_data_dimensions(witness, target)
+        assert target is not None, "Target data must be supplied"
+
+        n_filter = self.n_filter
+        offset_target = n_filter - self.idx_target - 1
+        pred_length = len(target) - n_filter + 1
+
+        # skip the windows that were already processed if the data continues the history
+        continuous = witness.shape[1] >= n_filter - 1 and np.array_equal(
+            witness[:, : n_filter - 1], self._history[:, 1:]
+        )
+        n_skip = n_filter - 1 if continuous else 0
+        n_bridge = n_filter - 1 - n_skip
+        target_used = target[offset_target : offset_target + max(0, pred_length)]
+
+        # only the first n_filter windows overlap the history, the kernels read the
+        # remaining windows directly from the input (without a copy of the whole array)
+        head = np.concatenate(
+            [self._history, witness[:, n_skip : n_skip + n_filter]], axis=1
+        )
+        tail = witness[:, n_skip:]
+        n_head = head.shape[1] - n_filter - n_bridge
+        segments = [(head, target_used[: max(0, n_head)], n_bridge)]
+        if tail.shape[1] > n_filter:
+            segments.append((tail, target_used[max(0, n_head) :], 0))
+
+        # lag ordered coefficients
+        weights = np.flip(self.filter_state, axis=1).T.flatten()
+        predictions = []
+        n_rescue = 0
+        if self.algorithm == "conventional":
+            inverse_correlation = self._inverse_correlation.copy()
+            for extended, segment_target, segment_bridge in segments:
+                predictions.append(
+                    _rls_loop(
+                        extended,
+                        segment_target,
+                        n_filter,
+                        segment_bridge,
+                        weights,
+                        inverse_correlation,
+                        self.forgetting_factor,
+                    )
+                )
+        else:
+            fast_state = (
+                self._forward.copy(),
+                self._forward_energy.copy(),
+                self._backward.copy(),
+                self._gain.copy(),
+                self._age.copy(),
+            )
+            for extended, segment_target, segment_bridge in segments:
+                segment_prediction, segment_rescue = _ftf_loop(
+                    extended,
+                    segment_target,
+                    n_filter,
+                    segment_bridge,
+                    weights,
+                    *fast_state,
+                    self.forgetting_factor,
+                    self.regularization,
+                    self.restart_interval,
+                )
+                predictions.append(segment_prediction)
+                n_rescue += segment_rescue
+        prediction = np.concatenate(predictions)
+
+        if update_state:
+            self.filter_state = np.flip(
+                weights.reshape(n_filter, self.n_channel).T, axis=1
+            ).copy()
+            self._history = np.array(segments[-1][0][:, -n_filter:], dtype=np.float64)
+            if self.algorithm == "conventional":
+                self._inverse_correlation = inverse_correlation
+            else:
+                (
+                    self._forward,
+                    self._forward_energy,
+                    self._backward,
+                    self._gain,
+                    self._age,
+                ) = fast_state
+                self.n_rescue += n_rescue
+
+        if pad:
+            # input shorter than n_filter yields no predictions, the output is all padding
+            n_pre = min(offset_target, len(target))
+            prediction = np.concatenate(
+                [
+                    np.zeros(n_pre),
+                    prediction,
+                    np.zeros(len(target) - n_pre - len(prediction)),
+                ]
+            )
+
+        return prediction
@@ -2,13 +2,135 @@
 
 from typing import Optional
 from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
 from warnings import warn
+import os
 
 import numpy as np
 from numpy.typing import NDArray
 
 from .common import FilterBase
-from .wf import wf_calculate, wf_apply
+from .wf import wf_solve, wf_solve_cg, wf_apply
+from .correlation import (
+    SlidingCorrelationSums,
+    wf_correlation_ranges,
+    wf_lags_from_sums,
+)
+
+#: dtypes of the witness, target and prediction arrays in shared memory
+_SHARED_DTYPES = (np.float64, np.float64, np.longdouble)
+
+
+def _process_blocks(
+    witness: NDArray,
+    target: NDArray,
+    prediction: NDArray,
+    block_indices: Sequence[int] | NDArray,
+    n_filter: int,
+    idx_target: int,
+    context_pre: int,
+    context_post: int,
+    solver: str = "pinv",
+    tol: float = 1e-8,
+) -> tuple[bool, Optional[NDArray], list[int]]:
+    """calculate and apply the WF for a contiguous span of UWF blocks
+
+    :param witness: Witness sensor data (2D array)
+    :param target: Target sensor data
+    :param prediction: output array, block k is written to prediction[k*n_filter : (k+1)*n_filter]
+    :param block_indices: the blocks to process
+    :param n_filter: Length of the FIR filter
+    :param idx_target: Position of the prediction
+    :param context_pre: samples before the block that are used for the conditioning
+    :param context_post: samples after the block that are used for the conditioning
+    :param solver: 'pinv' or 'levinson' (see wf_solve()) or 'cg' (see wf_solve_cg())
+    :param tol: relative residual tolerance of the cg solver
+
+    :return: True if all blocks had full rank, filter coefficients of the last block,
+             cg iterations per block
+    """
+    # the correlation sums of overlapping conditioning windows are updated incrementally
+    sums = SlidingCorrelationSums(witness, target, n_filter)
+
+    all_full_rank = True
+    filter_state = None
+    iteration_counts = []
+    for block in block_indices:
+        idx = n_filter - 1 + block * n_filter
+
+        # calculate filter coefficients
+        window_start = max(0, idx - context_pre)
+        window_stop = min(len(target), idx + n_filter + context_post)
+        symmetric, range_ww, range_ws = wf_correlation_ranges(
+            window_stop - window_start, n_filter, idx_target
+        )
+        r_ww, r_ws = sums.update(
+            (range_ww[0] + window_start, range_ww[1] + window_start),
+            (range_ws[0] + window_start, range_ws[1] + window_start),
+        )
+        lags = wf_lags_from_sums(r_ww, r_ws, n_filter, idx_target, symmetric)
+        if solver == "cg":
+            # the previous block is a good initial guess
+            filter_state, full_rank, n_iter = wf_solve_cg(
+                *lags, WFC_initial=filter_state, tol=tol
+            )
+            iteration_counts.append(n_iter)
+            if not full_rank:
+                filter_state, full_rank = wf_solve(*lags)
+        else:
+            filter_state, full_rank = wf_solve(*lags, solver=solver)
+        all_full_rank &= full_rank
+
+        # apply
+        w_sel = witness[:, idx - n_filter + 1 : min(idx + n_filter, len(target))]
+        prediction[
+            block * n_filter : block * n_filter + w_sel.shape[1] - n_filter + 1
+        ] = wf_apply(filter_state, w_sel)
+    return all_full_rank, filter_state, iteration_counts
+
+
+def _process_blocks_shared(
+    names: tuple[str, str, str],
+    shapes: tuple[tuple, tuple, tuple],
+    block_indices: Sequence[int] | NDArray,
+    n_filter: int,
+    idx_target: int,
+    context_pre: int,
+    context_post: int,
+    solver: str = "pinv",
+    tol: float = 1e-8,
+) -> tuple[bool, Optional[NDArray], list[int]]:
+    """_process_blocks() on arrays that are stored in shared memory (for worker processes)
+
+    :param names: shared memory names for witness, target and prediction
+    :param shapes: array shapes for witness, target and prediction
+
+    The remaining parameters are passed to _process_blocks().
+    """
+    buffers = [shared_memory.SharedMemory(name=name) for name in names]
+    arrays: list[NDArray] = []
+    try:
+        arrays = [
+            np.ndarray(shape, dtype=dtype, buffer=buffer.buf)
+            for buffer, shape, dtype in zip(buffers, shapes, _SHARED_DTYPES)
+        ]
+        return _process_blocks(
+            arrays[0],
+            arrays[1],
+            arrays[2],
+            block_indices,
+            n_filter,
+            idx_target,
+            context_pre,
+            context_post,
+            solver,
+            tol,
+        )
+    finally:
+        del arrays
+        for buffer in buffers:
+            buffer.close()
 
 
 class UpdatingWienerFilter(FilterBase):
@@ -19,6 +141,17 @@ class UpdatingWienerFilter(FilterBase):
     :param n_channel: Number of witness sensor channels
     :param context_pre: how many additional samples before the current block are used to update the filters
     :param context_post: how many additional samples after the current block are used to update the filters
+    :param n_jobs: number of workers for apply(), -1 uses all CPUs. The blocks are split into contiguous
+                   spans, one per worker. Each span pays for one full correlation at its start.
+    :param executor: 'process' shares the input data with worker processes through shared memory,
+                     'thread' uses a thread pool (the numpy/scipy routines mostly release the GIL).
+                     With many processes, limiting the BLAS threads per process (e.g. OMP_NUM_THREADS=1)
+                     avoids oversubscription.
+    :param solver: 'pinv' or 'levinson' (see saftig.wf.wf_solve()) or 'cg' for a conjugate gradient
+                   iteration that starts from the coefficients of the previous block (see saftig.wf.wf_solve_cg()).
+                   The iteration counts are stored in iteration_counts. Blocks that do not converge
+                   fall back to the dense solution.
+    :param tol: relative residual tolerance of the cg solver
 
 
     >>> import saftig as sg
@@ -32,9 +165,11 @@ class UpdatingWienerFilter(FilterBase):
 
     """
 
-    #: The FIR coefficients of the WF
-    filter_state: NDArray
+    #: The FIR coefficients of the WF of the last block
+    filter_state: NDArray | None = None
     filter_name = "UWF"
+    # the conditioning uses samples after the current block
+    supports_streaming = False
 
     def __init__(
         self,
@@ -43,10 +178,25 @@ class UpdatingWienerFilter(FilterBase):
         n_channel: int = 1,
         context_pre: int = 0,
         context_post: int = 0,
+        n_jobs: int = 1,
+        executor: str = "process",
+        solver: str = "pinv",
+        tol: float = 1e-8,
     ):
         super().__init__(n_filter, idx_target, n_channel)
         self.context_pre = context_pre
         self.context_post = context_post
+        self.n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else n_jobs
+        self.executor = executor
+
+        assert self.n_jobs > 0, "n_jobs must be a positive integer or -1"
+        self.solver = solver
+        self.tol = tol
+        #: cg solver iterations for each block of the last apply() call
+        self.iteration_counts = np.zeros(0, dtype=int)
+
+        assert self.solver in ("pinv", "levinson", "cg"), f"unknown solver '{solver}'"
+        assert self.executor in ("process", "thread"), f"unknown executor '{executor}'"
 
     def condition(
         self,
@@ -77,52 +227,128 @@ class UpdatingWienerFilter(FilterBase):
 
         :return: prediction, bool indicating if all WF updates had full rank
         """
+        # the data is not converted here, the correlations are calculated segment wise
+        # in double precision (worker processes receive a float64 copy in shared memory)
         witness, target = self.check_data_dimensions(witness, target)
 
-        all_full_rank = True
+        # blocks end once the conditioning window is shorter than one filter length
+        n_blocks = 0
         additional_padding = 0
-        prediction = []
         for idx in range(self.n_filter - 1, len(target), self.n_filter):
-            # calculate filter coefficients
-            selection_conditioning = np.arange(
-                max(0, idx - self.context_pre),
-                min(len(target), idx + self.n_filter + self.context_post),
-            )
-            if len(selection_conditioning) < self.n_filter:
-                additional_padding = len(selection_conditioning)
+            window_start = max(0, idx - self.context_pre)
+            window_stop = min(len(target), idx + self.n_filter + self.context_post)
+            if window_stop - window_start < self.n_filter:
+                additional_padding = window_stop - window_start
                 break
-            self.filter_state, full_rank = wf_calculate(
-                witness[:, selection_conditioning],
-                target[selection_conditioning],
-                self.n_filter,
-                idx_target=self.idx_target,
-            )
-            all_full_rank &= (
-                full_rank  # a numpy bool doesn't mix well with non-numpy here
-            )
+            n_blocks += 1
+        n_prediction = max(
+            0, min(n_blocks * self.n_filter, len(target) - self.n_filter + 1)
+        )
 
-            # apply
-            w_sel = witness[
-                :,
-                max(0, idx - self.n_filter + 1) : min(idx + self.n_filter, len(target)),
+        spans = (
+            [
+                span
+                for span in np.array_split(
+                    np.arange(n_blocks), min(self.n_jobs, n_blocks)
+                )
+                if len(span) > 0
             ]
-            if w_sel.shape[1] < self.n_filter:
-                additional_padding = w_sel.shape[1]
-                break
-            p = wf_apply(self.filter_state, w_sel)
-            prediction += list(p)
+            if n_blocks > 0
+            else []
+        )
+        parameters = (
+            self.n_filter,
+            self.idx_target,
+            self.context_pre,
+            self.context_post,
+            self.solver,
+            self.tol,
+        )
+
+        # the blocks are written directly into the padded output
+        n_pre = self.n_filter - 1 - self.idx_target if pad else 0
+        n_post = self.idx_target + additional_padding if pad else 0
+        output = np.zeros(n_pre + n_prediction + n_post, dtype=_SHARED_DTYPES[2])
+        prediction = output[n_pre : n_pre + n_prediction]
+
+        if len(spans) <= 1:
+            results = [
+                _process_blocks(witness, target, prediction, span, *parameters)
+                for span in spans
+            ]
+        elif self.executor == "thread":
+            with ThreadPoolExecutor(len(spans)) as pool:
+                results = list(
+                    pool.map(
+                        lambda span: _process_blocks(
+                            witness, target, prediction, span, *parameters
+                        ),
+                        spans,
+                    )
+                )
+        else:
+            results = self._apply_processes(
+                witness, target, prediction, spans, parameters
+            )
 
-        if not all_full_rank:
+        if len(results) > 0:
+            self.filter_state = results[-1][1]
+        self.iteration_counts = np.array(
+            [n_iter for result in results for n_iter in result[2]], dtype=int
+        )
+        if not all(result[0] for result in results):
             warn("Warning: not all UWF blocks had full rank", RuntimeWarning)
 
-        if pad:
-            prediction_npy = np.concatenate(
-                [
-                    np.zeros(self.n_filter - 1 - self.idx_target),
-                    prediction,
-                    np.zeros(self.idx_target + additional_padding),
-                ]
+        return output
+
+    def _apply_processes(
+        self,
+        witness: NDArray,
+        target: NDArray,
+        prediction: NDArray,
+        spans: list[NDArray],
+        parameters: tuple,
+    ) -> list:
+        """process the block spans in worker processes, sharing all arrays through shared memory
+
+        :param prediction: output array, the result is copied into it
+
+        :return: results of _process_blocks() for all spans
+        """
+        shapes = (witness.shape, target.shape, prediction.shape)
+        buffers = [
+            shared_memory.SharedMemory(
+                create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
             )
-        else:
-            prediction_npy = np.array(prediction)
-        return prediction_npy
+            for shape, dtype in zip(shapes, _SHARED_DTYPES)
+        ]
+        arrays: list[NDArray] = []
+        try:
+            arrays = [
+                np.ndarray(shape, dtype=dtype, buffer=buffer.buf)
+                for buffer, shape, dtype in zip(buffers, shapes, _SHARED_DTYPES)
+            ]
+            arrays[0][:] = witness
+            arrays[1][:] = target
+            arrays[2][:] = 0
+
+            names: tuple[str, str, str] = (
+                buffers[0].name,
+                buffers[1].name,
+                buffers[2].name,
+            )
+            with ProcessPoolExecutor(len(spans)) as pool:
+                futures = [
+                    pool.submit(
+                        _process_blocks_shared, names, shapes, span, *parameters
+                    )
+                    for span in spans
+                ]
+                results = [future.result() for future in futures]
+            prediction[:] = arrays[2]
+        finally:
+            del arrays
+            for buffer in buffers:
+                buffer.close()
+                buffer.unlink()
+        return results
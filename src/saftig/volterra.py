@@ -0,0 +1,272 @@
+"""Second order Volterra LMS filter with a sparse set of cross-terms"""
+
+from collections.abc import Sequence
+import numpy as np
+from numpy.typing import NDArray
+import numba
+
+from .common import FilterBase
+
+
+def volterra_terms(
+    n_filter: int,
+    n_channel: int,
+    channel_pairs: Sequence[tuple[int, int]] | None = None,
+    lag_bandwidth: int = 0,
+) -> NDArray:
+    """Build the index structure of the second order terms of a Volterra filter
+
+    Each term is the product of two samples of the input window. Samples are addressed by their
+    index in the flattened window, channel * n_filter + position. Every product is included once.
+
+    :param n_filter: Length of the FIR filter
+    :param n_channel: Number of witness sensor channels
+    :param channel_pairs: Channel combinations that are coupled. Defaults to all pairs including each channel with itself.
+    :param lag_bandwidth: Maximum distance of the two samples within the window
+
+    :return: integer array with shape (n_terms, 2)
+
+    >>> volterra_terms(3, 1, lag_bandwidth=1)
+    array([[0, 0],
+           [0, 1],
+           [1, 1],
+           [1, 2],
+           [2, 2]])
+
+    """
+    if channel_pairs is None:
+        channel_pairs = [(a, b) for a in range(n_channel) for b in range(a, n_channel)]
+    assert lag_bandwidth >= 0, "lag_bandwidth must not be negative"
+
+    terms = set()
+    for channel_a, channel_b in channel_pairs:
+        assert (
+            0 <= channel_a < n_channel and 0 <= channel_b < n_channel
+        ), "channel index out of range"
+        for position_a in range(n_filter):
+            for position_b in range(
+                max(0, position_a - lag_bandwidth),
+                min(n_filter, position_a + lag_bandwidth + 1),
+            ):
+                first = channel_a * n_filter + position_a
+                second = channel_b * n_filter + position_b
+                terms.add((min(first, second), max(first, second)))
+    return np.array(sorted(terms), dtype=np.int64).reshape(-1, 2)
+
+
+@numba.njit(error_model="numpy")
+def _volterra_loop(
+    witness: NDArray,
+    target: NDArray,
+    n_filter: int,
+    idx_target: int,
+    linear_state: NDArray,
+    quadratic_state: NDArray,
+    terms: NDArray,
+    normalized: bool,
+    step_scale: float,
+    coefficient_clipping: float | None,
+) -> tuple[NDArray, int, int]:
+    """Run the Volterra LMS filter over input sequences
+
+    The cost per sample is O(n_channel * n_filter + n_terms).
+
+    :param linear_state: linear coefficients (n_channel, n_filter) (updated in place)
+    :param quadratic_state: coefficients of the second order terms (n_terms) (updated in place)
+    :param terms: flattened window indices of the factors of each second order term (n_terms, 2)
+
+    :return: Prediction, Target offset, Prediction length
+    """
+    n_channel = witness.shape[0]
+    n_terms = terms.shape[0]
+    offset_target = n_filter - idx_target - 1
+    pred_length = len(target) - n_filter + 1
+
+    channels = terms // n_filter
+    positions = terms % n_filter
+
+    prediction = np.empty(max(pred_length, 0), dtype=np.float64)
+    products = np.empty(n_terms)
+    for idx in range(0, pred_length):
+        # evaluate the second order terms once per sample
+        for term in range(n_terms):
+            products[term] = (
+                witness[channels[term, 0], idx + positions[term, 0]]
+                * witness[channels[term, 1], idx + positions[term, 1]]
+            )
+
+        # make prediction
+        pred = 0.0
+        norm = 0.0
+        for channel in range(n_channel):
+            for k in range(n_filter):
+                sample = witness[channel, idx + k]
+                pred += linear_state[channel, k] * sample
+                norm += sample * sample
+        for term in range(n_terms):
+            pred += quadratic_state[term] * products[term]
+            norm += products[term] * products[term]
+        err = target[idx + offset_target] - pred
+        prediction[idx] = pred
+
+        # update filter
+        factor = 2 * step_scale * err
+        if normalized:
+            if norm < 0:
+                raise ValueError(
+                    "Overflow! You are probably passing integers of insufficient precision to this function."
+                )
+            factor /= norm
+
+        for channel in range(n_channel):
+            for k in range(n_filter):
+                linear_state[channel, k] += factor * witness[channel, idx + k]
+                if coefficient_clipping is not None:
+                    linear_state[channel, k] = min(
+                        max(linear_state[channel, k], -coefficient_clipping),
+                        coefficient_clipping,
+                    )
+        for term in range(n_terms):
+            quadratic_state[term] += factor * products[term]
+            if coefficient_clipping is not None:
+                quadratic_state[term] = min(
+                    max(quadratic_state[term], -coefficient_clipping),
+                    coefficient_clipping,
+                )
+
+    return prediction, offset_target, pred_length
+
+
+class VolterraLMSFilter(FilterBase):
+    r"""Second order Volterra LMS filter with a configurable sparse set of cross-terms
+    Implements: :math:`x[n] = \sum_i\sum_t H_{it} w_i[n-t] + \sum_{(i,t,j,s)} Q_{itjs} w_i[n-t] w_j[n-s]`
+    where the second sum runs over the selected terms only.
+
+    A full second order kernel has O((n_channel * n_filter)^2) terms. The terms can be limited
+    to specific channel pairs (e.g. the angular and length channels of a coupling) and to samples
+    that are at most lag_bandwidth apart. The cost per sample scales with the number of active terms.
+    The coefficients are updated jointly with NLMS normalization over the linear and second order inputs.
+
+    :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
+    :param idx_target: Position of the prediction
+    :param n_channel: Number of witness sensor channels
+    :param normalized: If True: NLMS, else LMS
+    :param step_scale: The learning rate of the LMS filter
+    :param coefficient_clipping: If set to a positive float, FIR filter coefficients will be limited to this value. This can increase filter stability.
+    :param channel_pairs: Coupled channel combinations, see volterra_terms(). Defaults to all pairs.
+    :param lag_bandwidth: Maximum distance of the two samples of a term within the window
+
+    >>> import saftig as sg
+    >>> n_filter = 32
+    >>> witness, target = sg.TestDataGenerator(0.1).generate(int(5e4))
+    >>> filt = sg.VolterraLMSFilter(n_filter, 0, 1, lag_bandwidth=2)
+    >>> len(filt.terms)
+    93
+    >>> filt.condition(witness, target)
+    >>> prediction = filt.apply(witness, target) # check on the data used for conditioning
+    >>> residual_rms = sg.RMS((target-prediction)[1000:])
+    >>> residual_rms > 0.05 and residual_rms < 0.15 # the expected RMS in this test scenario is 0.1
+    True
+
+    """
+
+    #: The current linear FIR coefficients
+    filter_state: NDArray
+    #: The current coefficients of the second order terms
+    quadratic_state: NDArray
+    #: Flattened window indices (channel * n_filter + position) of the two factors of each second order term
+    terms: NDArray
+    filter_name = "VolterraLMS"
+    _state_attributes = ("filter_state", "quadratic_state")
+
+    def __init__(
+        self,
+        n_filter: int,
+        idx_target: int,
+        n_channel: int = 1,
+        normalized: bool = True,
+        step_scale: float = 0.1,
+        coefficient_clipping: float | None = None,
+        channel_pairs: Sequence[tuple[int, int]] | None = None,
+        lag_bandwidth: int = 0,
+    ):
+        super().__init__(n_filter, idx_target, n_channel)
+        self.normalized = normalized
+        self.step_scale = step_scale
+        self.coefficient_clipping = coefficient_clipping
+        self.channel_pairs = channel_pairs
+        self.lag_bandwidth = lag_bandwidth
+
+        assert self.step_scale > 0, "Step scale must be positive"
+        assert (
+            self.coefficient_clipping is None or self.coefficient_clipping > 0
+        ), "coefficient_clipping must be positive"
+
+        self.terms = volterra_terms(n_filter, n_channel, channel_pairs, lag_bandwidth)
+        self.reset()
+
+    def reset(self):
+        """reset the filter coefficients to zero"""
+        self.filter_state = np.zeros((self.n_channel, self.n_filter))
+        self.quadratic_state = np.zeros(len(self.terms))
+
+    def condition(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+    ):
+        """Use an input dataset to condition the filter
+
+        :param witness: Witness sensor data
+        :param target: Target sensor data
+        """
+        self.apply(witness, target, update_state=True)
+
+    def apply(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+        pad: bool = True,
+        update_state: bool = False,
+    ) -> NDArray:
+        """Apply the filter to input data
+
+        :param witness: Witness sensor data
+        :param target: Target sensor data
+        :param pad: if True, apply padding zeros so that the length matches the target signal
+        :param update_state: if True, the filter state will be changed. If false, the filter state will remain
+
+        :return: prediction
+        """
+        witness, target = self.check_data_dimensions(witness, target)
+        assert target is not None, "Target data must be supplied"
+
+        linear_state = np.array(self.filter_state, dtype=np.float64)
+        quadratic_state = np.array(self.quadratic_state, dtype=np.float64)
+        prediction, offset_target, pred_length = _volterra_loop(
+            witness,
+            target,
+            self.n_filter,
+            self.idx_target,
+            linear_state,
+            quadratic_state,
+            self.terms,
+            self.normalized,
+            self.step_scale,
+            self.coefficient_clipping,
+        )
+
+        if update_state:
+            self.filter_state = linear_state
+            self.quadratic_state = quadratic_state
+
+        if pad:
+            prediction = np.concatenate(
+                [
+                    np.zeros(offset_target),
+                    prediction,
+                    np.zeros(len(target) - pred_length - offset_target),
+                ]
+            )
+
+        return prediction
@@ -5,10 +5,22 @@ from collections.abc import Sequence
 from warnings import warn
 
 import numpy as np
-from numpy.typing import NDArray
+from numpy.typing import NDArray, DTypeLike
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy.signal import correlate
+from scipy.fft import rfft, irfft, next_fast_len
 
 from .common import FilterBase, make_2d_array
+from .cache import CoefficientCache
+from .toeplitz import block_levinson, block_toeplitz_cg
+from .correlation import wf_correlation_lags, CorrelationAccumulator
+
+#: The levinson condition estimate can exceed the true reciprocal condition number by
+#: orders of magnitude. The rank tolerance is increased by this factor to compensate.
+LEVINSON_RANK_MARGIN = 1e3
+
+#: Supported precisions for wf_apply()
+APPLY_DTYPES = (np.dtype(np.float32), np.dtype(np.float64), np.dtype(np.longdouble))
 
 
 def mean_cross_correlation_offset(
@@ -28,84 +40,173 @@ def mean_cross_correlation_offset(
     return correlate(A, B[offset:], mode="valid")
 
 
+def wf_correlations(
+    witness: NDArray,
+    target: NDArray,
+    n_filter: int,
+    idx_target: int = 0,
+) -> Tuple[NDArray, NDArray]:
+    """calculate the correlations that define the WF normal equations
+
+    The witness autocorrelation matrix is block-Toeplitz, see saftig.correlation.wf_correlation_lags().
+
+    :param witness: Witness sensor data (2D array)
+    :param target: Target sensor data (1D array)
+    :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
+    :param idx_target: offset of the prediction relative to the end of the array
+
+    :return: r_ww[channel_a, channel_b, lag], r_ws[channel, lag]
+    """
+    return wf_correlation_lags(witness, target, n_filter, idx_target)
+
+
+def wf_assemble_r_matrix(r_ww: NDArray) -> NDArray:
+    """build the dense block-Toeplitz autocorrelation matrix from its lags
+
+    All blocks are strided views on the lag vectors, the result is written with a single copy.
+
+    :param r_ww: autocorrelation lags as returned by wf_correlations()
+
+    :return: (n_channel*n_filter, n_channel*n_filter) matrix
+    """
+    n_channel, _, n_filter = r_ww.shape
+
+    # two-sided lag vector: lags_two_sided[..., n_filter - 1 + d] = r_ww[..., abs(d)]
+    lags_two_sided = np.concatenate([np.flip(r_ww[..., 1:], axis=-1), r_ww], axis=-1)
+    # blocks[a, b, i, j] = lags_two_sided[a, b, i + (n_filter - 1 - j)] = r_ww[a, b, abs(i-j)]
+    blocks = sliding_window_view(lags_two_sided, n_filter, axis=-1)[..., ::-1]
+    return blocks.transpose(0, 2, 1, 3).reshape(
+        n_channel * n_filter, n_channel * n_filter
+    )
+
+
+def wf_solve(
+    r_ww: NDArray,
+    r_ws: NDArray,
+    solver: str = "pinv",
+    rcond: float = 1e-10,
+) -> Tuple[NDArray, bool]:
+    """solve the WF normal equations for the FIR coefficients
+
+    :param r_ww: witness autocorrelation lags as returned by wf_correlations()
+    :param r_ws: witness-target cross-correlation lags as returned by wf_correlations()
+                 A 2D array for one target or a 3D array (target, channel, lag) for multiple targets.
+                 All targets share one factorization of the autocorrelation matrix.
+    :param solver: 'pinv' for a dense pseudo-inverse or 'levinson' for the block-Toeplitz
+                   recursion. The levinson solver falls back to 'pinv' for badly conditioned systems.
+    :param rcond: levinson solver only: reciprocal condition estimate below which the
+                  dense solver is used instead. The rank tolerance of the dense solver
+                  (scaled by LEVINSON_RANK_MARGIN) acts as a lower limit.
+
+    :return: filter coefficients (with a leading target axis for 3D r_ws), full_rank (bool)
+    """
+    n_channel, n_filter = r_ws.shape[-2:]
+    # right hand sides as (target, channel, lag)
+    rhs = r_ws.reshape(-1, n_channel, n_filter)
+    assert solver in ("pinv", "levinson"), f"unknown solver '{solver}'"
+
+    WFC = None
+    full_rank = True
+    if solver == "levinson":
+        # reorder into (lag, channel, channel) blocks
+        solution, rcond_estimate = block_levinson(
+            r_ww.transpose(2, 0, 1), rhs.transpose(2, 1, 0)
+        )
+        # size-aware tolerance, comparable to np.linalg.matrix_rank()
+        rank_tolerance = (
+            n_channel * n_filter * np.finfo(np.float64).eps * LEVINSON_RANK_MARGIN
+        )
+        full_rank = bool(rcond_estimate > rank_tolerance)
+        if rcond_estimate > max(rcond, rank_tolerance):
+            WFC = solution.transpose(2, 1, 0)
+
+    if WFC is None:
+        R_ww = wf_assemble_r_matrix(r_ww)
+
+        # calculate pseudo-inverse correlation matrix of inputs and the filter coefficients
+        # for some reason the scipy.linalg implementations were extremely slow on white noise test case => using numpy
+        full_rank = bool(np.linalg.matrix_rank(R_ww, hermitian=True) == len(R_ww[0]))
+        R_ww_inv = np.linalg.pinv(R_ww, hermitian=True)
+        WFC = R_ww_inv.dot(rhs.reshape(len(rhs), -1).T).T.reshape(rhs.shape)
+
+    # unwrap into seperate FIR filters
+    WFC = np.flip(WFC, axis=-1).reshape(r_ws.shape)
+    return WFC, full_rank
+
+
+def wf_solve_cg(
+    r_ww: NDArray,
+    r_ws: NDArray,
+    WFC_initial: Optional[NDArray] = None,
+    tol: float = 1e-8,
+    max_iter: Optional[int] = None,
+) -> Tuple[NDArray, bool, int]:
+    """solve the WF normal equations iteratively, see saftig.toeplitz.block_toeplitz_cg()
+
+    This is efficient if a good initial guess is known, e.g. the coefficients of a WF
+    that was conditioned on similar data.
+
+    :param r_ww: witness autocorrelation lags as returned by wf_correlations()
+    :param r_ws: witness-target cross-correlation lags as returned by wf_correlations()
+    :param WFC_initial: initial filter coefficients with the shape of the result (optional)
+    :param tol: relative residual tolerance
+    :param max_iter: maximum number of iterations
+
+    :return: filter coefficients (with a leading target axis for 3D r_ws), converged (bool), number of iterations
+    """
+    n_channel, n_filter = r_ws.shape[-2:]
+    rhs = r_ws.reshape(-1, n_channel, n_filter)
+    initial = None
+    if WFC_initial is not None:
+        initial = np.flip(np.reshape(WFC_initial, rhs.shape), axis=-1).transpose(
+            2, 1, 0
+        )
+
+    solution, n_iter, converged = block_toeplitz_cg(
+        r_ww.transpose(2, 0, 1),
+        rhs.transpose(2, 1, 0),
+        initial=initial,
+        tol=tol,
+        max_iter=max_iter,
+    )
+    WFC = np.flip(solution.transpose(2, 1, 0), axis=-1).reshape(r_ws.shape)
+    return WFC, converged, n_iter
+
+
 def wf_calculate(
     witness: Sequence | NDArray,
     target: Sequence | NDArray,
     n_filter: int,
     idx_target: int = 0,
+    solver: str = "pinv",
+    rcond: float = 1e-10,
 ) -> Tuple[NDArray, bool]:
     """caluclate the FIR coefficients for a wiener filter
 
     :param witness: Witness sensor data
-    :param witness: Target sensor data
+    :param witness: Target sensor data (1D array or 2D array for multiple targets)
     :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
     :param idx_target: offset of the prediction relative to the end of the array
+    :param solver: solver for the normal equations, see wf_solve()
+    :param rcond: levinson fallback threshold, see wf_solve()
 
-    :return: filter coefficients, full_rank (bool)
+    :return: filter coefficients (target, channel, tap) for 2D targets, else (channel, tap), full_rank (bool)
     """
-    target_npy: NDArray = np.array(target)
+    target_npy: NDArray = np.asarray(target)
     witness_npy: NDArray = make_2d_array(witness)
+    assert target_npy.ndim in (1, 2), "target must be a 1D or 2D array"
     assert (
-        witness_npy.shape[1] == target_npy.shape[0]
+        witness_npy.shape[1] == target_npy.shape[-1]
     ), "Missmatch between witness_npy and target_npy data shape"
     assert (
-        n_filter <= target_npy.shape[0]
+        n_filter <= target_npy.shape[-1]
     ), "Input data must be at least one filter length"
 
-    # calculate input autocorrelation and cross-correlation to target_npy
-    # R_ws[channel, time]
-    R_ws = np.array(
-        [
-            mean_cross_correlation_offset(target_npy, A, n_filter, idx_target)
-            for A in witness_npy
-        ]
-    ).flatten(order="C")
-
-    def calc_r_matrix(A, B, n_filter):
-        """calculate the cross correlation matrix of a and b"""
-        cc = correlate(A, B[: -n_filter + 1], mode="valid")
-        return np.array(
-            [np.concatenate([cc[i::-1], cc[1 : n_filter - i]]) for i in range(n_filter)]
-        )
-
-    def calc_r_matrix_symmetric(A, B, n_filter):
-        """calculate the cross correlation matrix of a and b and average positive and negative lag
-        to make the result symmetric (as is expected for an autocorrelation)
-        """
-        cc = correlate(A, B[n_filter:-n_filter], mode="valid")
-        cc = np.concatenate(
-            [[cc[n_filter]], (cc[n_filter + 1 :] + cc[n_filter - 1 :: -1]) / 2]
-        )
-        return np.array(
-            [np.concatenate([cc[i::-1], cc[1 : n_filter - i]]) for i in range(n_filter)]
-        )
-
-    if (
-        len(target_npy) >= 3 * n_filter
-    ):  # using both sides is only possible if enough data is provided
-        R_ww = np.block(
-            [
-                [calc_r_matrix_symmetric(A, B, n_filter) for B in witness_npy]
-                for A in witness_npy
-            ]
-        )
-    else:
-        R_ww = np.block(
-            [[calc_r_matrix(A, B, n_filter) for B in witness_npy] for A in witness_npy]
-        )
-
-    # calculate pseudo-inverse correlation matrix of inputs and the filter coefficients
-    # for some reason the scipy.linalg implementations were extremely slow on white noise test case => using numpy
-    full_rank = bool(np.linalg.matrix_rank(R_ww, hermitian=True) == len(R_ww[0]))
-    R_ww_inv = np.linalg.pinv(R_ww, hermitian=True)
-    WFC = R_ww_inv.dot(np.array(R_ws))
-
-    # unwrap into seperate FIR filters
-    WFC = WFC.reshape((len(witness), n_filter))
-    WFC = np.array([np.flip(i) for i in WFC])
+    r_ww, r_ws = wf_correlations(witness_npy, target_npy, n_filter, idx_target)
+    WFC, full_rank = wf_solve(r_ww, r_ws, solver=solver, rcond=rcond)
 
     assert (
-        len(WFC[0]) == n_filter
+        WFC.shape[-1] == n_filter
     ), "input data was to short resulting in an incompatible filter"
 
     return WFC, full_rank
@@ -114,19 +215,84 @@ def wf_calculate(
 def wf_apply(
     WFC: Sequence | NDArray,
     witness: Sequence | NDArray,
+    dtype: DTypeLike = np.longdouble,
 ) -> NDArray:
     """apply the WF to witness data
 
+    :param WFC: FIR filter coefficients (channel, tap)
     :param witness: Witness sensor data
-    :param target: Target sensor data
+    :param dtype: Precision of the calculation. np.longdouble uses a direct correlation in
+                  extended precision. np.float64 and np.float32 use overlap-save FFT convolution,
+                  which is much faster for long filters.
 
     :return: prediction
+
+    >>> import numpy as np
+    >>> witness, WFC = np.random.normal(size=(2, 1000)), np.random.normal(size=(2, 32))
+    >>> reference = wf_apply(WFC, witness)
+    >>> bool(np.allclose(wf_apply(WFC, witness, dtype=np.float64), reference))
+    True
+
     """
-    assert len(witness[0]) >= len(WFC[0]), "Input minimum lenght is one filter length"
-    witness_npy = np.array(witness).astype(np.longdouble)
-    return np.sum(
-        [correlate(A, WF, mode="valid") for A, WF in zip(witness_npy, WFC)], axis=0
-    )
+    WFC_npy = np.asarray(WFC)
+    witness_npy = np.asarray(witness)
+    assert (
+        witness_npy.shape[1] >= WFC_npy.shape[1]
+    ), "Input minimum lenght is one filter length"
+
+    dtype = np.dtype(dtype)
+    assert dtype in APPLY_DTYPES, f"dtype must be one of {APPLY_DTYPES}"
+
+    prediction = np.zeros(witness_npy.shape[1] - WFC_npy.shape[1] + 1, dtype=dtype)
+    if dtype == np.longdouble:
+        for A, WF in zip(witness_npy, WFC_npy):
+            prediction += correlate(A.astype(np.longdouble), WF, mode="valid")
+    else:
+        _overlap_save(WFC_npy.astype(dtype), witness_npy, prediction)
+    return prediction
+
+
+def _overlap_save(WFC: NDArray, witness: NDArray, out: NDArray) -> None:
+    """overlap-save FIR filtering of all channels, the channel sum is written to out
+
+    :param WFC: FIR filter coefficients (channel, tap) in the target precision
+    :param witness: Witness sensor data (channel, sample)
+    :param out: preallocated output array of length n_sample - n_filter + 1
+    """
+    n_filter = WFC.shape[1]
+    n_fft = next_fast_len(max(4 * n_filter, 1024), real=True)
+    step = n_fft - n_filter + 1
+    blocks_per_batch = max(1, 2**20 // n_fft)
+
+    # the conjugate turns the convolution into a correlation
+    filter_spectrum = rfft(WFC, n_fft).conj()
+
+    for batch_start in range(0, len(out), step * blocks_per_batch):
+        n_blocks = min(blocks_per_batch, -(-(len(out) - batch_start) // step))
+        batch_length = n_blocks * step + n_filter - 1
+        batch = witness[:, batch_start : batch_start + batch_length].astype(
+            WFC.dtype, copy=False
+        )
+        # only the final block of the last batch can be incomplete, rfft() zero pads it
+        # without copying the whole batch
+        n_complete = n_blocks if batch.shape[1] == batch_length else n_blocks - 1
+
+        # the channels are summed in the frequency domain
+        spectrum = np.zeros((n_blocks, n_fft // 2 + 1), dtype=filter_spectrum.dtype)
+        for channel in range(len(WFC)):
+            if n_complete > 0:
+                blocks = sliding_window_view(batch[channel], n_fft)[::step]
+                spectrum[:n_complete] += (
+                    rfft(blocks[:n_complete], n_fft) * filter_spectrum[channel]
+                )
+            if n_complete < n_blocks:
+                spectrum[n_complete] += (
+                    rfft(batch[channel, n_complete * step :], n_fft)
+                    * filter_spectrum[channel]
+                )
+
+        batch_out = out[batch_start : batch_start + n_blocks * step]
+        batch_out[:] = irfft(spectrum, n_fft)[:, :step].ravel()[: len(batch_out)]
 
 
 class WienerFilter(FilterBase):
@@ -135,6 +301,15 @@ class WienerFilter(FilterBase):
     :param n_filter: Length of the FIR filter (how many samples are in the input window per output sample)
     :param idx_target: Position of the prediction
     :param n_channel: Number of witness sensor channels
+    :param solver: Solver for the normal equations. 'pinv' uses a dense pseudo-inverse,
+                   'levinson' uses the block-Toeplitz structure and falls back to 'pinv'
+                   for badly conditioned data.
+    :param rcond: Levinson solver only: reciprocal condition estimate below which the dense
+                  solver is used instead
+    :param apply_dtype: Precision used by apply(), see wf_apply(). np.float64 or np.float32
+                        trade bit-exactness for a much higher throughput.
+    :param cache: If given, condition() looks up the coefficients for the same data and
+                  parameters in this cache before it calculates them (see saftig.cache.CoefficientCache)
 
     >>> import saftig as sg
     >>> n_filter = 128
@@ -148,28 +323,131 @@ class WienerFilter(FilterBase):
     >>> residual_rms > 0.05 and residual_rms < 0.15 # the expected RMS in this test scenario is 0.1
     True
 
+    Data that does not fit into memory can be passed in chunks
+
+    >>> for idx in range(0, len(target), 10000):
+    ...     filt.partial_condition(witness[:, idx : idx + 10000], target[idx : idx + 10000])
+    >>> _coefficients, full_rank = filt.finalize()
+
+    Multiple targets can share one solution of the witness autocorrelation
+
+    >>> import numpy as np
+    >>> targets = np.array([target, 2 * target])
+    >>> _coefficients, full_rank = filt.condition(witness, targets)
+    >>> filt.apply(witness).shape
+    (2, 100000)
+
     """
 
     #: The FIR coefficients of the WF
     filter_state: NDArray | None = None
     filter_name = "WF"
+    _accumulator: CorrelationAccumulator | None = None
+    _unsaved_parameters = ("cache",)
+
+    def __init__(
+        self,
+        n_filter: int,
+        idx_target: int,
+        n_channel: int = 1,
+        solver: str = "pinv",
+        rcond: float = 1e-10,
+        apply_dtype: DTypeLike = np.longdouble,
+        cache: Optional[CoefficientCache] = None,
+    ):
+        super().__init__(n_filter, idx_target, n_channel)
+        self.solver = solver
+        self.rcond = rcond
+        self.apply_dtype = np.dtype(apply_dtype)
+        self.cache = cache
+
+        assert self.solver in ("pinv", "levinson"), f"unknown solver '{solver}'"
+        assert (
+            self.apply_dtype in APPLY_DTYPES
+        ), f"apply_dtype must be one of {APPLY_DTYPES}"
 
     def condition(
         self,
-        witness: Sequence,
-        target: Sequence,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
     ):
         """Use an input dataset to condition the filter
+        Pending chunks from partial_condition() are discarded.
 
         :param witness: Witness sensor data
-        :param target: Target sensor data
+        :param target: Target sensor data (1D array or 2D array with one row per target)
+        """
+        self.requries_apply_target = False
+        # chunks from partial_condition() are discarded
+        self._accumulator = None
+
+        witness_npy, target_npy = self.check_data_dimensions(witness, target)
+
+        cached = None
+        if self.cache is not None:
+            key = self.cache.key(
+                witness_npy,
+                target_npy,
+                n_filter=self.n_filter,
+                idx_target=self.idx_target,
+                solver=self.solver,
+                rcond=self.rcond,
+            )
+            cached = self.cache.get(key)
+
+        if cached is None:
+            self.filter_state, full_rank = wf_calculate(
+                witness_npy,
+                target_npy,
+                self.n_filter,
+                idx_target=self.idx_target,
+                solver=self.solver,
+                rcond=self.rcond,
+            )
+            if self.cache is not None:
+                self.cache.put(key, self.filter_state, full_rank)
+        else:
+            self.filter_state, full_rank = cached
+
+        if not full_rank:
+            warn("Warning: Filter is not of full rank", RuntimeWarning)
+        return self.filter_state, full_rank
+
+    def partial_condition(
+        self,
+        witness: Sequence | NDArray,
+        target: Sequence | NDArray,
+    ) -> None:
+        """Add a chunk of data to the conditioning dataset
+        The chunks are treated as one continuous dataset. Call finalize() after the last chunk.
+        The memory usage only depends on the chunk size and not on the total data length.
+
+        :param witness: Witness sensor data chunk
+        :param target: Target sensor data chunk (1D array or 2D array with one row per target)
         """
         self.requries_apply_target = False
 
         witness_npy, target_npy = self.check_data_dimensions(witness, target)
 
-        self.filter_state, full_rank = wf_calculate(
-            witness_npy, target_npy, self.n_filter, idx_target=self.idx_target
+        if self._accumulator is None:
+            self._accumulator = CorrelationAccumulator(
+                self.n_channel, self.n_filter, self.idx_target
+            )
+        self._accumulator.add(witness_npy, target_npy)
+
+    def finalize(self) -> Tuple[NDArray, bool]:
+        """Calculate the filter from the chunks passed to partial_condition()
+        The result matches condition() on the concatenated chunks.
+        """
+        if self._accumulator is None:
+            raise RuntimeError(
+                "partial_condition() must be called before finalize() can be used."
+            )
+
+        r_ww, r_ws = self._accumulator.finalize()
+        self._accumulator = None
+        self.filter_state, full_rank = wf_solve(
+            r_ww, r_ws, solver=self.solver, rcond=self.rcond
         )
 
         if not full_rank:
@@ -190,7 +468,7 @@ class WienerFilter(FilterBase):
         :param pad: if True, apply padding zeros so that the length matches the target signal
         :param update_state: ignored
 
-        :return: prediction
+        :return: prediction, 2D array with one row per target if conditioned on multiple targets
         """
         witness, target = self.check_data_dimensions(witness, target)
         if self.filter_state is None:
@@ -198,13 +476,15 @@ class WienerFilter(FilterBase):
                 "The filter must be conditioned before apply() can be used."
             )
 
-        prediction = wf_apply(self.filter_state, witness)
+        prediction = np.array(
+            [
+                wf_apply(WFC, witness, self.apply_dtype)
+                for WFC in self.filter_state.reshape(-1, *self.filter_state.shape[-2:])
+            ]
+        )
         if pad:
-            prediction = np.concatenate(
-                [
-                    np.zeros(self.n_filter - 1 - self.idx_target),
-                    prediction,
-                    np.zeros(self.idx_target),
-                ]
+            prediction = np.pad(
+                prediction,
+                [(0, 0), (self.n_filter - 1 - self.idx_target, self.idx_target)],
             )
-        return prediction
+        return prediction.reshape(self.filter_state.shape[:-2] + prediction.shape[-1:])
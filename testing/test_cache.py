@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import saftig as sg
+
+
+class TestCoefficientCache(unittest.TestCase):
+    """tests for the coefficient cache and its use in the WienerFilter"""
+
+    def setUp(self):
+        self.witness, self.target = sg.TestDataGenerator([0.1] * 2).generate(int(1e4))
+
+    def test_key(self):
+        """the key must depend on the content, dtype and shape of the data and the parameters"""
+        key = sg.CoefficientCache.key(self.witness, self.target, n_filter=32)
+        self.assertEqual(
+            key, sg.CoefficientCache.key(self.witness.copy(), self.target, n_filter=32)
+        )
+        # non-contiguous input is hashed in chunks
+        self.assertEqual(
+            key,
+            sg.CoefficientCache.key(
+                np.asfortranarray(self.witness), self.target, n_filter=32
+            ),
+        )
+
+        changed = self.target.copy()
+        changed[-1] += 1e-12
+        for other in (
+            sg.CoefficientCache.key(self.witness, changed, n_filter=32),
+            sg.CoefficientCache.key(self.witness, self.target, n_filter=16),
+            sg.CoefficientCache.key(
+                self.witness.astype(np.float32), self.target, n_filter=32
+            ),
+            sg.CoefficientCache.key(self.witness.T, self.target, n_filter=32),
+        ):
+            self.assertNotEqual(key, other)
+
+    def test_key_layout(self):
+        """the key must only depend on the content, not on the memory layout"""
+        n_samples = 2 * sg.cache.HASH_CHUNK_SIZE + 100
+        data = np.random.normal(size=(2, n_samples + 50))
+
+        view = data[:, :n_samples]
+        for other in (view.copy(), np.asfortranarray(view)):
+            self.assertEqual(
+                sg.CoefficientCache.key(view), sg.CoefficientCache.key(other)
+            )
+
+        # content that matches the contiguous data when it is read in column chunks
+        chunk = sg.cache.HASH_CHUNK_SIZE
+        contiguous = np.random.normal(size=(2, 2 * chunk))
+        interleaved = np.asfortranarray(
+            contiguous.reshape(2, 2, chunk).transpose(1, 0, 2).reshape(2, 2 * chunk)
+        )
+        self.assertFalse(np.array_equal(contiguous, interleaved))
+        self.assertNotEqual(
+            sg.CoefficientCache.key(contiguous), sg.CoefficientCache.key(interleaved)
+        )
+
+    def test_wiener_filter(self):
+        """cached coefficients must match the calculated ones"""
+        cache = sg.CoefficientCache()
+        reference = sg.WienerFilter(32, 3, 2).condition(self.witness, self.target)
+
+        for expected_hits in (0, 1, 2):
+            filt = sg.WienerFilter(32, 3, 2, cache=cache)
+            coefficients, full_rank = filt.condition(self.witness, self.target)
+            self.assertTrue(np.array_equal(coefficients, reference[0]))
+            self.assertEqual(full_rank, reference[1])
+            self.assertEqual(cache.hits, expected_hits)
+        self.assertEqual(cache.misses, 1)
+
+        # other parameters are not answered from the cache
+        sg.WienerFilter(32, 4, 2, cache=cache).condition(self.witness, self.target)
+        self.assertEqual(cache.misses, 2)
+
+        # modifying the coefficients must not change the cache
+        filt.filter_state[:] = 0
+        coefficients, _ = sg.WienerFilter(32, 3, 2, cache=cache).condition(
+            self.witness, self.target
+        )
+        self.assertTrue(np.array_equal(coefficients, reference[0]))
+
+    def test_memory_eviction(self):
+        """the least recently used entries are removed from memory"""
+        coefficients = np.zeros(100)
+        cache = sg.CoefficientCache(max_memory_bytes=2 * coefficients.nbytes)
+        for key in ("a", "b", "a", "c"):
+            cache.put(key, coefficients, True)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.memory_hits, cache.misses), (2, 1))
+
+    def test_disk_store(self):
+        """entries are shared through the directory and evicted by size"""
+        coefficients = np.random.normal(size=(2, 1000))
+        with tempfile.TemporaryDirectory() as directory:
+            cache = sg.CoefficientCache(directory)
+            cache.put("a", coefficients, False)
+
+            other = sg.CoefficientCache(directory)
+            cached = other.get("a")
+            assert cached is not None
+            self.assertTrue(np.array_equal(cached[0], coefficients))
+            self.assertFalse(cached[1])
+            self.assertEqual((other.disk_hits, other.memory_hits), (1, 0))
+            other.get("a")
+            self.assertEqual((other.disk_hits, other.memory_hits), (1, 1))
+
+            entry_size = os.path.getsize(os.path.join(directory, "a.npz"))
+            # the oldest file is removed first
+            os.utime(os.path.join(directory, "a.npz"), (0, 0))
+            limited = sg.CoefficientCache(directory, max_disk_bytes=2 * entry_size)
+            for key in ("b", "c"):
+                limited.put(key, coefficients, True)
+            self.assertEqual(sorted(os.listdir(directory)), ["b.npz", "c.npz"])
+
+            limited.clear()
+            self.assertEqual(os.listdir(directory), [])
+            self.assertIsNone(limited.get("b"))
+
+    def test_save_load(self):
+        """the cache is not part of the stored filter"""
+        filt = sg.WienerFilter(32, 0, 2, cache=sg.CoefficientCache())
+        filt.condition(self.witness, self.target)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "filter.saftig")
+            filt.save(path)
+            loaded = sg.FilterBase.load(path, mmap=False)
+        self.assertIsNone(loaded.cache)
+        self.assertTrue(np.array_equal(loaded.filter_state, filt.filter_state))
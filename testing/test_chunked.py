@@ -0,0 +1,135 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+import warnings
+
+import numpy as np
+
+import saftig as sg
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+class TestApplyChunks(unittest.TestCase):
+    """tests for the chunked application of filters to large datasets"""
+
+    def setUp(self):
+        self.witness, self.target = sg.TestDataGenerator([0.1] * 2).generate(5000)
+
+    def conditioned_filters(self, n_filter=32, idx_target=5):
+        """all filters that support streaming, conditioned on the test data"""
+        for filter_class in sg.all_filters:
+            filt = filter_class(n_filter, idx_target, 2)
+            if not filt.supports_streaming:
+                continue
+            with warnings.catch_warnings():  # warnings are expected here
+                warnings.simplefilter("ignore")
+                filt.condition(self.witness, self.target)
+            yield filt
+
+    def test_matches_apply(self):
+        """the chunked result must match apply() on the whole dataset"""
+        for filt in self.conditioned_filters():
+            for pad in (True, False):
+                reference = filt.apply(self.witness, self.target, pad=pad)
+                for chunk_size in (32, 999, 5000, 10000):
+                    prediction = sg.apply_chunks(
+                        filt, self.witness, self.target, chunk_size=chunk_size, pad=pad
+                    )
+                    self.assertEqual(prediction.shape, reference.shape)
+                    self.assertTrue(np.allclose(prediction, reference))
+
+    def test_multiple_targets(self):
+        """a WF conditioned on multiple targets predicts all of them chunk by chunk"""
+        targets = np.array([self.target, -2 * self.target])
+        filt = sg.WienerFilter(32, 5, 2)
+        filt.condition(self.witness, targets)
+        for pad in (True, False):
+            reference = filt.apply(self.witness, pad=pad)
+            prediction = sg.apply_chunks(
+                filt, self.witness, targets, chunk_size=999, pad=pad
+            )
+            self.assertEqual(prediction.shape, reference.shape)
+            self.assertTrue(np.allclose(prediction, reference))
+
+    def test_update_state(self):
+        """the filter state must only change with update_state"""
+        filt = sg.LMSFilter(32, 0, 2)
+        reference = sg.LMSFilter(32, 0, 2)
+
+        sg.apply_chunks(filt, self.witness, self.target, chunk_size=700)
+        self.assertTrue(np.all(filt.filter_state == 0))
+
+        sg.apply_chunks(
+            filt, self.witness, self.target, chunk_size=700, update_state=True
+        )
+        reference.apply(self.witness, self.target, update_state=True)
+        self.assertTrue(np.allclose(filt.filter_state, reference.filter_state))
+
+    def test_unsupported_filter(self):
+        """filters that cannot stream must raise an exception"""
+        filt = sg.UpdatingWienerFilter(32, 0, 2)
+        self.assertRaises(
+            NotImplementedError, sg.apply_chunks, filt, self.witness, self.target
+        )
+
+    def test_memory(self):
+        """the memory usage must be bounded by the chunk size, not the data length"""
+        n_sample, chunk_size = int(1e6), 10000
+        filt = sg.LMSFilter(32, 0, 2)
+        with tempfile.TemporaryDirectory() as directory:
+            witness = np.lib.format.open_memmap(
+                os.path.join(directory, "witness.npy"), "w+", shape=(2, n_sample)
+            )
+            target = np.lib.format.open_memmap(
+                os.path.join(directory, "target.npy"), "w+", shape=(n_sample,)
+            )
+            witness[:] = np.sin(np.arange(n_sample) / 10)
+            target[:] = np.cos(np.arange(n_sample) / 10)
+            out = np.lib.format.open_memmap(
+                os.path.join(directory, "prediction.npy"), "w+", shape=(n_sample,)
+            )
+            sg.apply_chunks(filt, witness[:, :chunk_size], target[:chunk_size])  # jit
+
+            tracemalloc.start()
+            try:
+                sg.apply_chunks(filt, witness, target, out, chunk_size)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            del witness, target, out
+        self.assertLess(peak, 20 * chunk_size * 8)
+
+    def test_npy_files(self):
+        """apply_to_file() on .npy files"""
+        filt = sg.LMSFilter(32, 5, 2)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [
+                os.path.join(directory, name)
+                for name in ("witness.npy", "target.npy", "prediction.npy")
+            ]
+            np.save(paths[0], self.witness)
+            np.save(paths[1], self.target)
+            sg.apply_to_file(filt, *paths, chunk_size=1000)
+            prediction = np.load(paths[2])
+        self.assertTrue(np.allclose(prediction, filt.apply(self.witness, self.target)))
+
+    @unittest.skipIf(h5py is None, "h5py is not installed")
+    def test_hdf5_files(self):
+        """apply_to_file() with data and prediction in one HDF5 file"""
+        filt = sg.WienerFilter(32, 5, 2)
+        filt.condition(self.witness, self.target)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.h5")
+            with h5py.File(path, "w") as file:
+                file["witness"] = self.witness
+                file["target"] = self.target
+            sg.apply_to_file(filt, path, path, path, chunk_size=1000, pad=False)
+            with h5py.File(path, "r") as file:
+                prediction = file["prediction"][:]
+        reference = filt.apply(self.witness, self.target, pad=False)
+        self.assertTrue(np.allclose(prediction, reference))
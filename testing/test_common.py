@@ -0,0 +1,99 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import saftig as sg
+
+
+class TestFilterFile(unittest.TestCase):
+    """tests for the file format of FilterBase.save() and FilterBase.load()"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "filter.saftig")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_layout(self):
+        """the arrays must be aligned and memory mapped without a copy"""
+        filt = sg.PolynomialLMSFilter(100, 0, 3, order=3)
+        filt.filter_state = np.arange(filt.filter_state.size, dtype=float).reshape(
+            filt.filter_state.shape
+        )
+        filt.save(self.path)
+
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(len(sg.common.FILE_MAGIC)), sg.common.FILE_MAGIC)
+            version, header_length = struct.unpack("<BI", file.read(5))
+        self.assertEqual(version, sg.common.FILE_FORMAT_VERSION)
+        self.assertEqual(
+            (len(sg.common.FILE_MAGIC) + 5 + header_length) % sg.common.FILE_ALIGNMENT,
+            0,
+        )
+
+        loaded = sg.PolynomialLMSFilter.load(self.path)
+        self.assertIsInstance(loaded.filter_state, np.memmap)
+        self.assertEqual(loaded.order, 3)
+        self.assertTrue(np.array_equal(loaded.filter_state, filt.filter_state))
+
+        # in place changes must not be written back to the file
+        loaded.filter_state[:] = 0
+        reloaded = sg.FilterBase.load(self.path)
+        self.assertTrue(np.array_equal(reloaded.filter_state, filt.filter_state))
+        del loaded, reloaded
+
+    def test_parameters(self):
+        """constructor parameters with numpy types must be restored"""
+        filt = sg.WienerFilter(16, 2, 2, solver="levinson", apply_dtype=np.float32)
+        filt.save(self.path)
+        loaded = sg.FilterBase.load(self.path)
+        self.assertEqual(loaded.solver, "levinson")
+        self.assertEqual(loaded.apply_dtype, np.float32)
+        self.assertIsNone(loaded.filter_state)
+
+    def test_invalid_files(self):
+        """reading other files, newer versions or other filter classes must fail"""
+        with open(self.path, "wb") as file:
+            file.write(b"not a filter")
+        self.assertRaises(ValueError, sg.FilterBase.load, self.path)
+
+        sg.LMSFilter(16, 0, 1).save(self.path)
+        self.assertRaises(ValueError, sg.WienerFilter.load, self.path)
+
+        with open(self.path, "r+b") as file:
+            file.seek(len(sg.common.FILE_MAGIC))
+            file.write(struct.pack("<B", sg.common.FILE_FORMAT_VERSION + 1))
+        self.assertRaises(ValueError, sg.FilterBase.load, self.path)
+
+    def rewrite_header(self, **changes):
+        """replace entries of the json header of the stored file"""
+        with open(self.path, "rb") as file:
+            magic = file.read(len(sg.common.FILE_MAGIC))
+            version, header_length = struct.unpack("<BI", file.read(5))
+            header = json.loads(file.read(header_length))
+            data = file.read()
+        header.update(changes)
+        encoded = json.dumps(header).encode()
+        with open(self.path, "wb") as file:
+            file.write(magic)
+            file.write(struct.pack("<BI", version, len(encoded)))
+            file.write(encoded)
+            file.write(data)
+
+    def test_untrusted_header(self):
+        """modules outside of saftig must not be imported and only state attributes are set"""
+        sg.LMSFilter(16, 0, 1).save(self.path)
+        self.assertIsInstance(sg.FilterBase.load(self.path, mmap=False), sg.LMSFilter)
+
+        self.rewrite_header(module="this", **{"class": "LMSFilter"})
+        self.assertRaises(ValueError, sg.FilterBase.load, self.path)
+        self.assertNotIn("this", sys.modules)
+
+        self.rewrite_header(module="saftig.lms", values={"n_filter": 1})
+        self.assertRaises(ValueError, sg.FilterBase.load, self.path)
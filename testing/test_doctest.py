@@ -4,11 +4,19 @@ import saftig as sg
 module_list = [
     sg.common,
     sg.evaluation,
+    sg.chunked,
     sg.wf,
+    sg.cache,
+    sg.fdwf,
+    sg.toeplitz,
+    sg.correlation,
     sg.uwf,
     sg.lms,
+    sg.fdlms,
+    sg.rls,
     sg.lms_c,
     sg.polylms,
+    sg.volterra,
 ]
 
 
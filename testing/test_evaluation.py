@@ -68,6 +68,19 @@ class TestResidualAmplitudeRatio(unittest.TestCase):
         )
 
 
+class TestRankConfigurations(unittest.TestCase):
+    """tests for rank_configurations()"""
+
+    def test_order(self):
+        """the configuration with the lowest residual must be ranked first"""
+        target = np.sin(np.linspace(0, 10, 100))
+        predictions = [0 * target, 0.9 * target, 0.5 * target]
+        ranking = sg.rank_configurations(target, predictions, ["zero", "0.9", "0.5"])
+
+        self.assertEqual([config for _, config in ranking], ["0.9", "0.5", "zero"])
+        self.assertAlmostEqual(ranking[0][0], 0.01)
+
+
 class TestMeasureRuntime(unittest.TestCase):
     """tests for residual_amplitude_ratio() and indirectly for residual_power_ratio()"""
 
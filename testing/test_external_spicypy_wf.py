@@ -28,3 +28,17 @@ class TestSpicypyWienerFilter(unittest.TestCase, TestFilter):
         warn(
             "The performance test is disabled for spicypy WF, because it is very slow."
         )
+
+    def test_readonly_float32_input(self):
+        warn(
+            "The float32 input test is disabled for spicypy WF, because spicypy calculates in the precision of the input."
+        )
+
+    def test_input_memory(self):
+        warn(
+            "The input memory test is disabled for spicypy WF, because the data is copied into spicypy time series."
+        )
+
+    def test_save_load(self):
+        filt = saftig.external.SpicypyWienerFilter(32, 0, 1)
+        self.assertRaises(NotImplementedError, filt.save, "unused")
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+
+import saftig as sg
+
+from .test_filters import TestFilter
+
+
+class TestFrequencyDomainLMSFilter(unittest.TestCase, TestFilter):
+    """tests for the frequency domain LMS filter implementation"""
+
+    __test__ = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        test_configurations = [
+            {"normalized": True},
+            {"normalized": True, "coefficient_clipping": 2},
+            {"normalized": False, "step_scale": 0.001},
+        ]
+        self.set_target(sg.FrequencyDomainLMSFilter, test_configurations)
+
+    def test_update_state_setting(self):
+        """check that the filter state only changes if update_state is set"""
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(2e4))
+
+        for filt in self.instantiate_filters(n_filter=32, n_channel=2):
+            filt.apply(witness, target, update_state=False)
+            self.assertTrue(bool(np.all(filt.filter_state == 0)))
+
+            filt.apply(witness, target, update_state=True)
+            self.assertTrue(bool(np.any(filt.filter_state != 0)))
+
+    def test_block_prediction(self):
+        """compare the overlap-save prediction to a direct calculation with fixed coefficients"""
+        n_filter = 16
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(1000)
+
+        filt = sg.FrequencyDomainLMSFilter(n_filter, 0, 2)
+        filt.condition(witness, target)
+        filter_state = filt.filter_state.copy()
+        prediction = filt.apply(witness, target, pad=False)
+
+        # the first block is predicted before any update
+        reference = sg.wf.wf_apply(filter_state, witness[:, : 2 * n_filter - 1])
+        self.assertTrue(np.allclose(prediction[:n_filter], reference))
+
+    def test_zero_lead_in(self):
+        """check that bins without witness power do not produce NaN"""
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(2e4))
+        witness[:, :500] = 0
+        target[:500] = 0
+
+        for filt in self.instantiate_filters(n_filter=32, n_channel=2):
+            prediction = filt.apply(witness, target, update_state=True)
+            self.assertTrue(np.all(np.isfinite(prediction)))
+            self.assertTrue(np.all(np.isfinite(filt.filter_state)))
+            self.assertLess(sg.RMS((target - prediction)[10000:]), 0.15)
@@ -0,0 +1,105 @@
+import unittest
+import numpy as np
+
+import saftig as sg
+
+from .test_filters import TestFilter
+
+
+class TestFrequencyDomainWienerFilter(unittest.TestCase, TestFilter):
+    """Tests for the frequency domain WF"""
+
+    __test__ = True
+    supports_multiple_targets = True
+
+    expected_performance = {
+        # noise level, (acceptance min, acceptance_max)
+        0.0: (0, 0.05),
+        # the per-bin solution has more degrees of freedom than n_filter taps and fits
+        # slightly more of the noise on the conditioning data than the WF
+        0.1: (0.045, 0.15),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_target(
+            sg.FrequencyDomainWienerFilter,
+            [{}, {"n_fft": 512, "window": "boxcar", "overlap": 0}],
+        )
+
+    def test_conditioning_warning(self):
+        """check that a warning is thrown if the CSD matrices do not have full rank"""
+        witness, target = sg.TestDataGenerator([0.1]).generate(int(1e4))
+
+        # using two identical input datasets produces non-full-rank CSD matrices
+        witness = [witness[0], witness[0]]
+
+        for filt in self.instantiate_filters(128, n_channel=2):
+            self.assertWarns(RuntimeWarning, filt.condition, witness, target)
+
+    def test_recovers_fir_system(self):
+        """check that the default parameters find the taps of a known FIR system
+        The impulse response fills half of the filter length, which is the worst case
+        for the windowing bias of short segments.
+        """
+        n_filter, n_taps, noise_level = 16, 8, 0.01
+        rng = np.random.default_rng(0)
+        for idx_target in (0, 5):
+            for n_samples in (int(2e4), int(1e5)):
+                witness = rng.normal(size=(2, n_samples))
+                taps = np.zeros((2, n_filter))
+                taps[:, :n_taps] = rng.normal(size=(2, n_taps))
+                target = np.pad(
+                    sg.wf.wf_apply(taps, witness, np.float64),
+                    (n_filter - 1 - idx_target, idx_target),
+                ) + noise_level * rng.normal(size=n_samples)
+
+                filt = sg.FrequencyDomainWienerFilter(n_filter, idx_target, 2)
+                coefficients, full_rank = filt.condition(witness, target)
+                self.assertTrue(full_rank)
+                self.assertTrue(np.allclose(coefficients, taps, atol=0.01))
+
+                residual = sg.RMS((target - filt.apply(witness))[n_filter:-n_filter])
+                self.assertLess(residual, 1.2 * noise_level)
+
+    def test_matches_wiener_filter(self):
+        """check that the prediction is close to the time domain solution"""
+        n_filter = 64
+        witness, target = sg.TestDataGenerator([0.1] * 3).generate(int(5e4))
+        reference = sg.WienerFilter(n_filter, 10, 3).condition(witness, target)[0]
+        reference_residual = sg.RMS(
+            target[:-n_filter] - sg.wf.wf_apply(reference, witness)[1:]
+        )
+
+        for filt in self.instantiate_filters(n_filter, 10, n_channel=3):
+            filt.condition(witness, target)
+            residual = sg.RMS(target[:-n_filter] - filt.apply(witness, pad=False)[1:])
+            self.assertLess(residual, 1.1 * reference_residual)
+
+    def test_multiple_targets(self):
+        """check that multiple targets match separate conditioning"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(1e4))
+        targets = np.array([target, -2 * target])
+
+        for filt in self.instantiate_filters(n_filter, 3, n_channel=2):
+            coefficients = filt.condition(witness, targets)[0]
+            self.assertEqual(coefficients.shape, (2, 2, n_filter))
+            self.assertEqual(filt.apply(witness).shape, targets.shape)
+
+            reference = filt.condition(witness, target)[0]
+            self.assertTrue(np.allclose(coefficients[0], reference))
+            self.assertTrue(np.allclose(coefficients[1], -2 * reference))
+
+    def test_long_filter(self):
+        """check filter lengths for which the dense time domain system would not fit into memory"""
+        n_filter, n_channel = 2**14, 4
+        witness, target = sg.TestDataGenerator([0.1] * n_channel).generate(2**20)
+
+        filt = sg.FrequencyDomainWienerFilter(n_filter, 0, n_channel)
+        coefficients, full_rank = filt.condition(witness, target)
+        self.assertTrue(full_rank)
+        self.assertEqual(coefficients.shape, (n_channel, n_filter))
+
+        residual = sg.RMS(target - filt.apply(witness))
+        self.assertLess(residual, 0.15)
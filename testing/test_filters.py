@@ -1,6 +1,12 @@
-from typing import Iterable
+from typing import Iterable, cast
+import os
+import tempfile
+import tracemalloc
+import unittest
 import warnings
 
+import numpy as np
+
 import saftig as sg
 
 
@@ -15,6 +21,8 @@ class TestFilter:
     target_filter: type[sg.FilterBase]
     # to-be-tested configurations
     default_filter_parameters: list = [{}]
+    # True if condition() accepts 2D targets with one row per target
+    supports_multiple_targets = False
 
     # settings to check performance
     expected_performance = {
@@ -126,3 +134,123 @@ class TestFilter:
 
                     self.assertGreater(residual, acceptable_residual[0])
                     self.assertLess(residual, acceptable_residual[1])
+
+    def test_push(self):
+        """Check that streaming chunks matches processing the data at once"""
+        n_filter, idx_target = 32, 3
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(2000)
+        chunk_edges = [0, 5, 20, 200, 201, 700, 1500, 2000]
+
+        targets = [target]
+        if self.supports_multiple_targets:
+            targets.append(np.array([target, -2 * target]))
+
+        for target in targets:
+            for filt, reference_filter in zip(
+                self.instantiate_filters(n_filter, idx_target, n_channel=2),
+                self.instantiate_filters(n_filter, idx_target, n_channel=2),
+            ):
+                if not filt.supports_streaming:
+                    self.assertRaises(NotImplementedError, filt.push, witness, target)
+                    continue
+
+                with warnings.catch_warnings():  # warnings are expected here
+                    warnings.simplefilter("ignore")
+                    filt.condition(witness, target)
+                    reference_filter.condition(witness, target)
+
+                prediction = np.concatenate(
+                    [
+                        filt.push(witness[:, start:stop], target[..., start:stop])
+                        for start, stop in zip(chunk_edges[:-1], chunk_edges[1:])
+                    ],
+                    axis=-1,
+                )
+                reference = reference_filter.apply(witness, target, update_state=True)
+                self.assertEqual(prediction.shape, reference.shape)
+
+                # the output is delayed by idx_target samples
+                self.assertTrue(
+                    np.allclose(
+                        prediction[..., idx_target:], reference[..., :-idx_target]
+                    )
+                )
+                self.assertTrue(
+                    np.allclose(filt.filter_state, reference_filter.filter_state)
+                )
+
+    def test_readonly_float32_input(self):
+        """Check that read-only float32 input is accepted and matches the same values as float64"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(1e4))
+        witness_32, target_32 = witness.astype(np.float32), target.astype(np.float32)
+        witness_32.flags.writeable = False
+        target_32.flags.writeable = False
+
+        for filt, reference_filter in zip(
+            self.instantiate_filters(n_filter, n_channel=2),
+            self.instantiate_filters(n_filter, n_channel=2),
+        ):
+            with warnings.catch_warnings():  # warnings are expected here
+                warnings.simplefilter("ignore")
+                filt.condition(witness_32, target_32)
+                reference_filter.condition(
+                    witness_32.astype(np.float64), target_32.astype(np.float64)
+                )
+                prediction = filt.apply(witness_32, target_32)
+                reference = reference_filter.apply(
+                    witness_32.astype(np.float64), target_32.astype(np.float64)
+                )
+
+            self.assertTrue(np.allclose(prediction, reference, atol=1e-4))
+
+    def test_input_memory(self, n_samples: int = int(1e4)):
+        """Check that apply() does not copy the input data
+        The peak of the memory allocated during apply() must stay below the input size.
+        """
+        n_filter, n_channel = 16, 8
+        witness, target = sg.TestDataGenerator([0.1] * n_channel).generate(n_samples)
+        # short data with the same layout, so that kernels are compiled before the measurement
+        witness_short, target_short = witness[:, :2000].copy(), target[:2000].copy()
+        for array in (witness, target, witness_short, target_short):
+            array.flags.writeable = False
+
+        for filt in self.instantiate_filters(n_filter, n_channel=n_channel):
+            with warnings.catch_warnings():  # warnings are expected here
+                warnings.simplefilter("ignore")
+                filt.condition(witness_short, target_short)
+                filt.apply(witness_short, target_short)
+
+                tracemalloc.start()
+                try:
+                    filt.apply(witness, target)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+
+            # the mixin is only used together with unittest.TestCase
+            cast(unittest.TestCase, self).assertLess(peak, witness.nbytes)
+
+    def test_save_load(self):
+        """Check that a stored filter continues exactly like the original"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(4000)
+        first, second = slice(0, 2000), slice(2000, None)
+
+        for filt in self.instantiate_filters(n_filter, idx_target=3, n_channel=2):
+            with warnings.catch_warnings():  # warnings are expected here
+                warnings.simplefilter("ignore")
+                filt.condition(witness[:, first], target[first])
+                reference = filt.apply(witness[:, second], target[second])
+
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, "filter.saftig")
+                    filt.save(path)
+                    for mmap in (True, False):
+                        loaded = sg.FilterBase.load(path, mmap)
+                        self.assertIs(type(loaded), type(filt))
+                        prediction = loaded.apply(
+                            witness[:, second], target[second], update_state=True
+                        )
+                        self.assertTrue(np.array_equal(prediction, reference))
+                    del loaded
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import unittest
+
+import saftig as sg
+
+
+class TestLazyImport(unittest.TestCase):
+    """tests for the lazy loading of filters and submodules"""
+
+    def test_cold_import(self):
+        """importing the package must not load heavy dependencies"""
+        code = (
+            "import sys, saftig;"
+            "print(sorted(m for m in ('numba', 'scipy', 'spicypy', 'saftig._lms_c') if m in sys.modules))"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code], text=True)
+        self.assertEqual(output.strip(), "[]")
+
+    def test_attributes(self):
+        """lazy attributes resolve to the objects of their submodules"""
+        self.assertIs(sg.LMSFilter, sg.lms.LMSFilter)
+        self.assertEqual(len(sg.all_filters), len(set(sg.all_filters)))
+        self.assertIn(sg.WienerFilter, sg.all_filters)
+        self.assertIn("VolterraLMSFilter", dir(sg))
+        with self.assertRaises(AttributeError):
+            sg.NotAFilter  # pylint: disable=pointless-statement
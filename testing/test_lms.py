@@ -33,3 +33,39 @@ class TestLMSFilter(unittest.TestCase, TestFilter):
             # check for no changes when True
             filt.apply(witness, target, update_state=True)
             self.assertTrue(bool(np.any(filt.filter_state != 0)))
+
+    def test_parameter_sweep(self):
+        """the batched sweep must reproduce the individual filters exactly"""
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(5000)
+        witness[:, 1000:1500] *= 1e4  # exercise the shared normalization
+
+        configurations = [
+            {"step_scale": 0.01},
+            {"step_scale": 0.1, "coefficient_clipping": 2},
+            {"normalized": False, "step_scale": 1e-11},  # stable despite the burst
+        ]
+        predictions = sg.lms.lms_parameter_sweep(witness, target, 32, 5, configurations)
+
+        self.assertEqual(predictions.shape, (3, len(target)))
+        for configuration, prediction in zip(configurations, predictions):
+            reference = sg.LMSFilter(32, 5, 2, **configuration).apply(witness, target)
+            self.assertTrue(np.array_equal(prediction, reference))
+
+    def test_running_normalization(self):
+        """compare the running NLMS normalization to a direct calculation"""
+        n_filter = 16
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(3000)
+        witness[
+            :, 1000:1500
+        ] *= 1e4  # strong cancellation when the burst leaves the window
+
+        filt = sg.LMSFilter(n_filter, 0, 2, step_scale=0.1)
+        prediction = filt.apply(witness, target, pad=False, update_state=True)
+
+        filter_state = np.zeros((2, n_filter))
+        for idx, pred in enumerate(prediction):
+            w_sel = witness[:, idx : idx + n_filter]
+            self.assertAlmostEqual(pred, np.sum(filter_state * w_sel), delta=1e-9)
+            err = target[idx + n_filter - 1] - np.sum(filter_state * w_sel)
+            filter_state += 2 * 0.1 * err * w_sel / np.sum(w_sel * w_sel)
+        self.assertTrue(np.allclose(filt.filter_state, filter_state))
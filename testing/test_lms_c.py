@@ -1,4 +1,6 @@
 import unittest
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 import saftig as sg
@@ -20,3 +22,84 @@ class TestLMSFilterC(unittest.TestCase, TestFilter):
             {"normalized": False, "step_scale": 0.001},
         ]
         self.set_target(sg.LMSFilterC, test_configurations)
+
+    def test_process_matches_step(self):
+        """compare the batch kernel to the per-sample step() calls"""
+        n_filter = 16
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(2000)
+
+        for parameters in self.default_filter_parameters:
+            filt = sg.LMSFilterC(n_filter, 3, 2, **parameters)
+            prediction = filt.apply(witness, target, pad=False, update_state=True)
+
+            reference_filter = sg.LMSFilterC(n_filter, 3, 2, **parameters).filter
+            for idx, pred in enumerate(prediction):
+                reference = reference_filter.step(
+                    witness[:, idx : idx + n_filter], target[idx + n_filter - 4]
+                )
+                self.assertAlmostEqual(pred, reference, delta=1e-9)
+
+    def test_process_threads(self):
+        """check that several filters can run in parallel threads with a caller supplied output"""
+        witness, target = sg.TestDataGenerator([0.1]).generate(int(1e4))
+        filters = [sg.LMSFilterC(32, 0, 1) for _ in range(4)]
+        outputs = [np.zeros(len(target) - 31) for _ in filters]
+
+        with ThreadPoolExecutor(4) as pool:
+            list(
+                pool.map(
+                    lambda args: args[0].filter.process(witness, target, out=args[1]),
+                    zip(filters, outputs),
+                )
+            )
+
+        reference = sg.LMSFilterC(32, 0, 1).apply(witness, target, pad=False)
+        for output in outputs:
+            self.assertTrue(np.array_equal(output, reference))
+
+    def test_float32(self):
+        """check that the float32 variant matches the float64 result within its precision"""
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(1e4))
+
+        reference = sg.LMSFilterC(32, 0, 2).apply(witness, target)
+        prediction = sg.LMSFilterC(32, 0, 2, dtype=np.float32).apply(witness, target)
+        self.assertEqual(prediction.dtype, np.float32)
+        self.assertLess(sg.RMS(prediction - reference), 1e-3 * sg.RMS(reference))
+
+    def test_filter_state(self):
+        """check the coefficient view, setter, reset and pickling"""
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(1e4))
+
+        for dtype in [np.float64, np.float32]:
+            filt = sg.LMSFilterC(32, 0, 2, dtype=dtype)
+            view = filt.filter_state
+            self.assertEqual(view.shape, (2, 32))
+            self.assertEqual(view.dtype, dtype)
+
+            filt.condition(witness, target)
+            self.assertTrue(np.any(view != 0))  # the view shares the buffer
+
+            # warm start from a Wiener filter solution
+            wf = sg.WienerFilter(32, 0, 2)
+            wf.condition(witness, target)
+            filt.filter_state = wf.filter_state
+            self.assertTrue(np.allclose(view, wf.filter_state, atol=1e-6))
+
+            copy = pickle.loads(pickle.dumps(filt))
+            self.assertTrue(np.array_equal(copy.filter_state, filt.filter_state))
+            self.assertTrue(
+                np.array_equal(copy.apply(witness, target), filt.apply(witness, target))
+            )
+
+            filt.reset()
+            self.assertTrue(np.all(view == 0))
+            self.assertTrue(np.any(copy.filter_state != 0))
+
+    def test_reinitialization(self):
+        """calling __init__ again must not invalidate existing coefficient views"""
+        filt = sg.LMSFilterC(32, 0, 2)
+        view = filt.filter_state
+        self.assertRaises(RuntimeError, filt.filter.__init__, 64, 0, 2, 0.1)
+        self.assertEqual(filt.filter.coefficients.shape, (2, 32))
+        view[:] = 1
+        self.assertTrue(np.all(filt.filter.coefficients == 1))
@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 
 import saftig as sg
 
@@ -21,3 +22,22 @@ class TestPolynomialLMSFilter(TestLMSFilter):
             {"order": 1, "normalized": False, "step_scale": 0.001},
         ]
         self.set_target(sg.PolynomialLMSFilter, test_configurations)
+
+    def test_power_terms(self):
+        """compare the kernel with a direct calculation of the polynomial terms"""
+        n_filter, order = 8, 3
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(300)
+
+        filt = sg.PolynomialLMSFilter(n_filter, 0, 2, step_scale=0.1, order=order)
+        prediction = filt.apply(witness, target, pad=False, update_state=True)
+
+        filter_state = np.zeros((order, 2, n_filter))
+        for idx, pred in enumerate(prediction):
+            w_sel = witness[:, idx : idx + n_filter]
+            terms = np.array([w_sel ** (i + 1) for i in range(order)])
+            self.assertAlmostEqual(pred, np.sum(filter_state * terms), delta=1e-9)
+            err = target[idx + n_filter - 1] - np.sum(filter_state * terms)
+            norm = np.sum(w_sel * w_sel)
+            for i in range(order):
+                filter_state[i] += 2 * 0.1 * err * terms[i] / norm ** ((i + 2) / 2)
+        self.assertTrue(np.allclose(filt.filter_state, filter_state))
@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+
+import saftig as sg
+
+from .test_filters import TestFilter
+
+
+class TestRLSFilter(unittest.TestCase, TestFilter):
+    """tests for the Recursive Least Squares filter implementation"""
+
+    __test__ = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        test_configurations = [
+            {"algorithm": "conventional"},
+            {"algorithm": "fast_transversal"},
+            {"algorithm": "fast_transversal", "forgetting_factor": 0.99},
+        ]
+        self.set_target(sg.RLSFilter, test_configurations)
+
+    def test_update_state_setting(self):
+        """check that the filter state only changes if update_state is set"""
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(2e4))
+
+        for filt in self.instantiate_filters(n_filter=32, n_channel=2):
+            filt.apply(witness, target, update_state=False)
+            self.assertTrue(bool(np.all(filt.filter_state == 0)))
+
+            filt.apply(witness, target, update_state=True)
+            self.assertTrue(bool(np.any(filt.filter_state != 0)))
+
+    def test_least_squares_solution(self):
+        """without forgetting, the coefficients must solve the regularized least squares problem"""
+        n_filter, n_channel, regularization = 8, 2, 1e-2
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(500)
+
+        filt = sg.RLSFilter(
+            n_filter, 0, n_channel, forgetting_factor=1, regularization=regularization
+        )
+        filt.condition(witness, target)
+
+        # the windows that overlap the zero initialized history only enter the autocorrelation
+        padded = np.concatenate([np.zeros((n_channel, n_filter - 1)), witness], axis=1)
+        windows = np.array(
+            [
+                padded[:, idx : idx + n_filter].flatten()
+                for idx in range(witness.shape[1])
+            ]
+        )
+        correlation = (
+            regularization * np.eye(n_filter * n_channel) + windows.T @ windows
+        )
+        cross_correlation = windows[n_filter - 1 :].T @ target[n_filter - 1 :]
+        reference = np.linalg.solve(correlation, cross_correlation)
+
+        self.assertTrue(np.allclose(filt.filter_state.flatten(), reference))
+
+    def test_fast_transversal(self):
+        """the fast transversal variant must match the conventional algorithm, also across calls"""
+        witness, target = sg.TestDataGenerator([0.1] * 3).generate(int(1e4))
+
+        conventional = sg.RLSFilter(16, 3, 3)
+        fast = sg.RLSFilter(16, 3, 3, algorithm="fast_transversal")
+        for segment in [slice(0, 6000), slice(6000, None), slice(2000, 4000)]:
+            predictions = [
+                filt.apply(witness[:, segment], target[segment], update_state=True)
+                for filt in (conventional, fast)
+            ]
+            self.assertTrue(np.allclose(*predictions))
+        self.assertTrue(np.allclose(conventional.filter_state, fast.filter_state))
+        self.assertEqual(fast.n_rescue, 0)
+
+    def test_fast_transversal_restart(self):
+        """replacing the fast transversal state with a restarted one must not change the result noticeably"""
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(1e4))
+
+        conventional = sg.RLSFilter(16, 0, 2, forgetting_factor=0.98)
+        fast = sg.RLSFilter(
+            16, 0, 2, forgetting_factor=0.98, algorithm="fast_transversal"
+        )
+        self.assertLess(fast.restart_interval, len(target) / 4)
+
+        predictions = [filt.apply(witness, target) for filt in (conventional, fast)]
+        self.assertTrue(np.allclose(*predictions, atol=1e-6))
+
+    def test_short_input(self):
+        """check that input shorter than n_filter is padded to the target length"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(20)
+
+        for idx_target in (0, 3, n_filter - 1):
+            for filt in self.instantiate_filters(n_filter, idx_target, n_channel=2):
+                prediction = filt.apply(witness, target)
+                self.assertEqual(prediction.shape, target.shape)
+                self.assertTrue(np.all(prediction == 0))
@@ -1,5 +1,7 @@
 import unittest
 
+import numpy as np
+
 import saftig as sg
 
 from .test_filters import TestFilter
@@ -17,6 +19,15 @@ class TestUpdatingWienerFilter(unittest.TestCase, TestFilter):
             [{"context_pre": 128 * 40, "context_post": 128 * 40}],
         )
 
+    def test_input_memory(self, n_samples: int = int(1e4)):
+        """the workspace of the correlations grows with the context and the pinv solver
+        needs several matrices of the system size, both are limited here"""
+        self.set_target(
+            sg.UpdatingWienerFilter,
+            [{"context_pre": 64, "context_post": 64, "solver": "levinson"}],
+        )
+        super().test_input_memory(n_samples)
+
     def test_conditioning_warning(self):
         """check that a warning is thrown if the conditioning function is caled"""
         n_filter = 128
@@ -50,3 +61,74 @@ class TestUpdatingWienerFilter(unittest.TestCase, TestFilter):
             filt = sg.UpdatingWienerFilter(n_filter, 0, 1, context_post=context_len)
             pred = filt.apply(witness, target)
             self.assertEqual(len(pred), len(target))
+
+    def test_incremental_statistics(self):
+        """compare the incrementally updated correlations to a full calculation per block"""
+        n_filter = 16
+        witness, target = sg.TestDataGenerator([0.1, 0.1]).generate(n_filter * 100)
+
+        for context_pre, context_post, idx_target in [
+            (20 * n_filter, 20 * n_filter, 0),
+            (3 * n_filter, 0, 5),
+            (0, n_filter, 0),
+        ]:
+            filt = sg.UpdatingWienerFilter(
+                n_filter,
+                idx_target,
+                2,
+                context_pre=context_pre,
+                context_post=context_post,
+            )
+            prediction = filt.apply(witness, target, pad=False)
+
+            reference = []
+            for idx in range(n_filter - 1, len(target), n_filter):
+                selection = slice(
+                    max(0, idx - context_pre),
+                    min(len(target), idx + n_filter + context_post),
+                )
+                if len(target[selection]) < n_filter:
+                    break
+                WFC, _ = sg.wf.wf_calculate(
+                    witness[:, selection], target[selection], n_filter, idx_target
+                )
+                reference += list(
+                    sg.wf.wf_apply(WFC, witness[:, idx - n_filter + 1 : idx + n_filter])
+                )
+            self.assertTrue(np.allclose(prediction, reference))
+
+    def test_parallel_execution(self):
+        """check that parallel block processing matches the serial result"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1, 0.1]).generate(n_filter * 50)
+        parameters = {"context_pre": 10 * n_filter, "context_post": 10 * n_filter}
+
+        serial = sg.UpdatingWienerFilter(n_filter, 3, 2, **parameters)
+        reference = serial.apply(witness, target)
+        for executor in ["thread", "process"]:
+            filt = sg.UpdatingWienerFilter(
+                n_filter, 3, 2, n_jobs=3, executor=executor, **parameters
+            )
+            prediction = filt.apply(witness, target)
+            self.assertEqual(prediction.shape, reference.shape)
+            self.assertTrue(np.allclose(prediction, reference))
+            self.assertTrue(np.allclose(filt.filter_state, serial.filter_state))
+
+    def test_cg_solver(self):
+        """compare the warm-started cg solver to the dense solution"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1, 0.1]).generate(n_filter * 50)
+        parameters = {"context_pre": 10 * n_filter, "context_post": 10 * n_filter}
+
+        reference = sg.UpdatingWienerFilter(n_filter, 0, 2, **parameters).apply(
+            witness, target
+        )
+        filt = sg.UpdatingWienerFilter(
+            n_filter, 0, 2, solver="cg", tol=1e-10, **parameters
+        )
+        prediction = filt.apply(witness, target)
+
+        self.assertTrue(np.allclose(prediction, reference, atol=1e-6))
+        self.assertEqual(len(filt.iteration_counts), len(target) // n_filter)
+        # warm starts need far fewer iterations than the system size (2 * n_filter)
+        self.assertLess(np.median(filt.iteration_counts), n_filter)
@@ -0,0 +1,94 @@
+import unittest
+import numpy as np
+
+import saftig as sg
+
+from .test_filters import TestFilter
+
+
+class TestVolterraLMSFilter(unittest.TestCase, TestFilter):
+    """tests for the Volterra LMS filter implementation"""
+
+    __test__ = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        test_configurations = [
+            {},
+            {"lag_bandwidth": 2, "coefficient_clipping": 2},
+            {"channel_pairs": [(0, 0)], "lag_bandwidth": 1},
+        ]
+        self.set_target(sg.VolterraLMSFilter, test_configurations)
+
+    def test_update_state_setting(self):
+        """check that the filter state only changes if update_state is set"""
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(int(2e4))
+
+        for filt in self.instantiate_filters(n_filter=32, n_channel=2):
+            filt.apply(witness, target, update_state=False)
+            self.assertTrue(bool(np.all(filt.filter_state == 0)))
+            self.assertTrue(bool(np.all(filt.quadratic_state == 0)))
+
+            filt.apply(witness, target, update_state=True)
+            self.assertTrue(bool(np.any(filt.filter_state != 0)))
+
+    def test_terms(self):
+        """check the selection of the second order terms"""
+        terms = sg.volterra.volterra_terms(
+            4, 2, channel_pairs=[(1, 0)], lag_bandwidth=1
+        )
+
+        self.assertEqual(len(terms), 4 + 2 * 3)
+        for first, second in terms:
+            self.assertEqual(first // 4, 0)
+            self.assertEqual(second // 4, 1)
+            self.assertLessEqual(abs(first % 4 - second % 4), 1)
+
+        # the full kernel contains every product exactly once
+        full = sg.volterra.volterra_terms(4, 2, lag_bandwidth=3)
+        self.assertEqual(len(full), 8 * 9 // 2)
+        self.assertEqual(len(np.unique(full, axis=0)), len(full))
+
+    def test_reference(self):
+        """compare the kernel with a direct calculation"""
+        n_filter = 6
+        witness, target = sg.TestDataGenerator([0.1] * 2).generate(300)
+
+        filt = sg.VolterraLMSFilter(n_filter, 2, 2, step_scale=0.1, lag_bandwidth=1)
+        prediction = filt.apply(witness, target, pad=False, update_state=True)
+
+        linear_state = np.zeros((2, n_filter))
+        quadratic_state = np.zeros(len(filt.terms))
+        for idx, pred in enumerate(prediction):
+            w_sel = witness[:, idx : idx + n_filter]
+            products = np.prod(w_sel.flatten()[filt.terms], axis=1)
+            reference = np.sum(linear_state * w_sel) + products @ quadratic_state
+            self.assertAlmostEqual(pred, reference, delta=1e-9)
+
+            err = target[idx + n_filter - 3] - reference
+            norm = np.sum(w_sel**2) + np.sum(products**2)
+            linear_state += 2 * 0.1 * err * w_sel / norm
+            quadratic_state += 2 * 0.1 * err * products / norm
+        self.assertTrue(np.allclose(filt.filter_state, linear_state))
+        self.assertTrue(np.allclose(filt.quadratic_state, quadratic_state))
+
+    def test_bilinear_coupling(self):
+        """a bilinear coupling between two channels can only be removed with cross-terms"""
+        rng = np.random.default_rng(0)
+        witness = rng.normal(size=(2, int(5e4)))
+        target = witness[0] + 0.5 * witness[0] * np.roll(witness[1], 1)
+
+        linear = sg.LMSFilter(4, 0, 2)
+        volterra = sg.VolterraLMSFilter(
+            4, 0, 2, channel_pairs=[(0, 1)], lag_bandwidth=1
+        )
+        residuals = []
+        for filt in (linear, volterra):
+            prediction = filt.apply(witness, target, update_state=True)
+            residuals.append(
+                sg.residual_amplitude_ratio(target, prediction, start=int(4e4))
+            )
+
+        self.assertGreater(residuals[0], 0.3)
+        self.assertLess(residuals[1], 0.01)
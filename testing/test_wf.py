@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 
 import saftig as sg
 
@@ -9,10 +10,11 @@ class TestWienerFilter(unittest.TestCase, TestFilter):
     """Tests for the WF"""
 
     __test__ = True
+    supports_multiple_targets = True
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.set_target(sg.WienerFilter)
+        self.set_target(sg.WienerFilter, [{}, {"solver": "levinson"}])
 
     def test_conditioning_warning(self):
         """check that a warning is thrown if the autocorrelation array does not have full rank"""
@@ -33,3 +35,116 @@ class TestWienerFilter(unittest.TestCase, TestFilter):
         for filt in self.instantiate_filters(n_filter):
             filt.condition(witness, target)
             filt.apply(witness)
+
+    def test_levinson_matches_pinv(self):
+        """check that the block-Toeplitz solver yields the dense solution"""
+        n_filter = 32
+        for n_samples in [n_filter * 2, int(1e4)]:  # short and long data handling
+            witness, target = sg.TestDataGenerator([0.1, 0.2, 0.3]).generate(n_samples)
+
+            for idx_target in [0, n_filter - 1]:
+                coefficients = []
+                for solver in ["pinv", "levinson"]:
+                    filt = sg.WienerFilter(n_filter, idx_target, 3, solver=solver)
+                    coefficients.append(filt.condition(witness, target)[0])
+                self.assertTrue(np.allclose(*coefficients, rtol=1e-6, atol=1e-9))
+
+    def test_partial_condition_matches_condition(self):
+        """check that chunked conditioning yields the one-shot result"""
+        n_filter = 32
+        for n_samples in [n_filter * 2, int(1e4)]:  # short and long data handling
+            witness, target = sg.TestDataGenerator([0.1, 0.2]).generate(n_samples)
+
+            for chunk_size in [7, n_filter, 1000]:
+                for filt in self.instantiate_filters(n_filter, 3, n_channel=2):
+                    reference = filt.condition(witness, target)[0]
+
+                    for idx in range(0, n_samples, chunk_size):
+                        filt.partial_condition(
+                            witness[:, idx : idx + chunk_size],
+                            target[idx : idx + chunk_size],
+                        )
+                    coefficients = filt.finalize()[0]
+                    self.assertTrue(np.allclose(coefficients, reference))
+
+    def test_levinson_rank_flag(self):
+        """check that the levinson solver reports rank deficient systems for any rcond setting"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1]).generate(int(1e4))
+
+        # using two identical input datasets produces non-full-rank autocorrelation matrices
+        witness = [witness[0], witness[0]]
+
+        for rcond in [1e-10, 0]:
+            filt = sg.WienerFilter(n_filter, 0, 2, solver="levinson", rcond=rcond)
+            self.assertWarns(RuntimeWarning, filt.condition, witness, target)
+
+    def test_condition_discards_pending_chunks(self):
+        """check that condition() does not leak chunks into a later finalize()"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1]).generate(int(1e4))
+        other_witness, other_target = sg.TestDataGenerator([0.1]).generate(int(1e4))
+
+        filt = sg.WienerFilter(n_filter, 0, 1)
+        reference = filt.condition(witness, target)[0]
+
+        filt.partial_condition(other_witness, other_target)
+        filt.condition(other_witness, other_target)
+        self.assertRaises(RuntimeError, filt.finalize)
+
+        filt.partial_condition(witness, target)
+        self.assertTrue(np.allclose(filt.finalize()[0], reference))
+
+    def test_assemble_r_matrix(self):
+        """check the block-Toeplitz structure of the assembled autocorrelation matrix"""
+        n_channel, n_filter = 3, 5
+        r_ww = np.random.normal(size=(n_channel, n_channel, n_filter))
+        R_ww = sg.wf.wf_assemble_r_matrix(r_ww)
+
+        for a in range(n_channel):
+            for b in range(n_channel):
+                for i in range(n_filter):
+                    for j in range(n_filter):
+                        self.assertEqual(
+                            R_ww[a * n_filter + i, b * n_filter + j],
+                            r_ww[a, b, abs(i - j)],
+                        )
+
+    def test_multiple_targets(self):
+        """check that conditioning on multiple targets matches individual filters"""
+        n_filter = 32
+        witness, target = sg.TestDataGenerator([0.1, 0.2]).generate(int(1e4))
+        targets = np.array([target, np.roll(target, 3), -target])
+
+        for filt in self.instantiate_filters(n_filter, 5, n_channel=2):
+            coefficients = filt.condition(witness, targets)[0]
+            prediction = filt.apply(witness)
+            self.assertEqual(coefficients.shape, (3, 2, n_filter))
+            self.assertEqual(prediction.shape, targets.shape)
+
+            for idx, single_target in enumerate(targets):
+                filt.condition(witness, single_target)
+                self.assertTrue(np.allclose(coefficients[idx], filt.filter_state))
+                self.assertTrue(np.allclose(prediction[idx], filt.apply(witness)))
+
+            # chunked conditioning
+            for idx in range(0, len(target), 3000):
+                filt.partial_condition(
+                    witness[:, idx : idx + 3000], targets[:, idx : idx + 3000]
+                )
+            self.assertTrue(np.allclose(filt.finalize()[0], coefficients))
+
+    def test_apply_dtype(self):
+        """check the overlap-save paths against the extended precision direct correlation"""
+        witness = np.random.normal(size=(2, 5000))
+        for n_filter in [1, 32, 1500]:
+            WFC = np.random.normal(size=(2, n_filter))
+            reference = sg.wf.wf_apply(WFC, witness)
+
+            for dtype, tolerance in [(np.float64, 1e-9), (np.float32, 1e-3)]:
+                prediction = sg.wf.wf_apply(WFC, witness, dtype=dtype)
+                self.assertEqual(prediction.dtype, dtype)
+                self.assertEqual(prediction.shape, reference.shape)
+                self.assertTrue(
+                    np.allclose(prediction, reference, atol=tolerance * n_filter)
+                )
@@ -0,0 +1,51 @@
+"""Compare the runtime of the dense R_ww assembly before and after vectorization."""
+
+from timeit import timeit
+
+import numpy as np
+from numpy.typing import NDArray
+
+from saftig.wf import wf_assemble_r_matrix
+
+N_FILTER_VALUES = [128, 256, 512, 1024, 2048, 4096, 8192]
+N_CHANNEL = 2
+
+
+def assemble_r_matrix_loop(r_ww: NDArray) -> NDArray:
+    """The previous implementation: one concatenate per row and np.block"""
+    n_filter = r_ww.shape[2]
+
+    def calc_r_matrix(cc):
+        return np.array(
+            [np.concatenate([cc[i::-1], cc[1 : n_filter - i]]) for i in range(n_filter)]
+        )
+
+    return np.block([[calc_r_matrix(cc) for cc in row] for row in r_ww])
+
+
+def main():
+    """measure both implementations for a range of filter lengths"""
+    print(f"n_channel = {N_CHANNEL}")
+    print(f"{'n_filter':>8} {'loop [s]':>10} {'strided [s]':>12} {'speedup':>8}")
+    for n_filter in N_FILTER_VALUES:
+        r_ww = np.random.normal(size=(N_CHANNEL, N_CHANNEL, n_filter))
+        assert np.array_equal(
+            assemble_r_matrix_loop(r_ww), wf_assemble_r_matrix(r_ww)
+        ), "implementations disagree"
+
+        repetitions = max(1, 2048 // n_filter)
+        t_loop = timeit(lambda: assemble_r_matrix_loop(r_ww), number=repetitions)
+        # single channel results can be views, the copy is included for a fair comparison
+        t_strided = timeit(
+            lambda: np.ascontiguousarray(wf_assemble_r_matrix(r_ww)),
+            number=repetitions,
+        )
+        t_loop /= repetitions
+        t_strided /= repetitions
+        print(
+            f"{n_filter:>8} {t_loop:>10.4f} {t_strided:>12.4f} {t_loop / t_strided:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compare conditioning time, peak memory and residual of the time and frequency domain WF."""
+
+from time import perf_counter
+import tracemalloc
+
+import numpy as np
+
+import saftig as sg
+
+N_CHANNEL = 4
+N_SAMPLE = 2**20
+N_FILTER_VALUES = [256, 1024, 4096, 16384, 32768]
+#: largest filter for which the dense time domain solution is calculated
+MAX_N_FILTER_WF = 1024
+
+
+def measure(filt, witness, target):
+    """condition the filter and return the runtime [s], peak traced memory [MB] and residual RMS"""
+    tracemalloc.start()
+    try:
+        start = perf_counter()
+        filt.condition(witness, target)
+        runtime = perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    residual = sg.RMS((target - filt.apply(witness))[filt.n_filter :])
+    return runtime, peak / 1e6, residual
+
+
+def main():
+    """condition both filters for a range of filter lengths"""
+    witness, target = sg.TestDataGenerator([0.1] * N_CHANNEL).generate(N_SAMPLE)
+    print(f"n_channel = {N_CHANNEL}, n_sample = {N_SAMPLE}")
+    print(
+        f"{'n_filter':>8} {'filter':>6} {'time [s]':>9} {'peak [MB]':>10} {'residual':>9}"
+    )
+    for n_filter in N_FILTER_VALUES:
+        filters = [sg.FrequencyDomainWienerFilter(n_filter, 0, N_CHANNEL)]
+        if n_filter <= MAX_N_FILTER_WF:
+            filters.append(
+                sg.WienerFilter(n_filter, 0, N_CHANNEL, apply_dtype=np.float64)
+            )
+        for filt in filters:
+            runtime, peak, residual = measure(filt, witness, target)
+            print(
+                f"{n_filter:>8} {filt.filter_name:>6} {runtime:>9.3f} {peak:>10.1f} {residual:>9.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
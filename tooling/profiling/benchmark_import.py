@@ -0,0 +1,40 @@
+"""Measure the cold start time of saftig imports in fresh interpreters."""
+
+import subprocess
+import sys
+from statistics import median
+from timeit import default_timer
+
+N_REPETITION = 10
+
+STATEMENTS = [
+    ("python startup", "pass"),
+    ("numpy", "import numpy"),
+    ("import saftig", "import saftig"),
+    ("WienerFilter", "from saftig import WienerFilter"),
+    ("LMSFilter", "from saftig import LMSFilter"),
+    ("all_filters", "from saftig import all_filters"),
+    ("external", "from saftig.external import SpicypyWienerFilter"),
+]
+
+
+def cold_start_time(statement: str) -> float:
+    """median wall time of a fresh interpreter that executes the statement"""
+    times = []
+    for _ in range(N_REPETITION):
+        start = default_timer()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        times.append(default_timer() - start)
+    return median(times)
+
+
+def main():
+    """measure all statements"""
+    print(f"median of {N_REPETITION} fresh interpreters")
+    print(f"{'statement':>16} {'time [ms]':>10}")
+    for name, statement in STATEMENTS:
+        print(f"{name:>16} {1e3 * cold_start_time(statement):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
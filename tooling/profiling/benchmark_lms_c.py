@@ -0,0 +1,34 @@
+"""Compare the throughput of the numba LMSFilter with the C implementation in both precisions."""
+
+from timeit import timeit
+
+import numpy as np
+
+import saftig as sg
+
+N_FILTER_VALUES = [32, 128, 512, 2048]
+N_CHANNEL = 2
+N_SAMPLE = int(5e4)
+
+FILTERS = [
+    ("LMSFilter (numba)", sg.LMSFilter, {}),
+    ("LMSFilterC float64", sg.LMSFilterC, {"dtype": np.float64}),
+    ("LMSFilterC float32", sg.LMSFilterC, {"dtype": np.float32}),
+]
+
+
+def main():
+    """measure all implementations for a range of filter lengths"""
+    witness, target = sg.TestDataGenerator([0.1] * N_CHANNEL).generate(N_SAMPLE)
+    print(f"n_channel = {N_CHANNEL}, n_sample = {N_SAMPLE}")
+    print(f"{'n_filter':>8} {'filter':>20} {'samples/s':>12}")
+    for n_filter in N_FILTER_VALUES:
+        for name, filter_class, parameters in FILTERS:
+            filt = filter_class(n_filter, 0, N_CHANNEL, **parameters)
+            filt.apply(witness[:, : 2 * n_filter], target[: 2 * n_filter])  # jit warmup
+            runtime = timeit(lambda: filt.apply(witness, target), number=3) / 3
+            print(f"{n_filter:>8} {name:>20} {N_SAMPLE / runtime:>12.3g}")
+
+
+if __name__ == "__main__":
+    main()
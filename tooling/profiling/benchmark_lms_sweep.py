@@ -0,0 +1,57 @@
+"""Compare a batched LMS parameter sweep with conditioning individual LMSFilter instances."""
+
+from timeit import timeit
+
+import saftig as sg
+
+N_FILTER_VALUES = [32, 128, 512, 2048]
+N_CHANNEL = 2
+N_SAMPLE = int(2e4)
+
+CONFIGURATIONS = [
+    {
+        "normalized": normalized,
+        "step_scale": step_scale,
+        "coefficient_clipping": clipping,
+    }
+    for normalized in [True, False]
+    for step_scale in [0.001, 0.003, 0.01, 0.03, 0.1]
+    for clipping in [None, 10]
+]
+
+
+def main():
+    """measure both approaches for a range of filter lengths"""
+    witness, target = sg.TestDataGenerator([0.1] * N_CHANNEL).generate(N_SAMPLE)
+    print(
+        f"n_config = {len(CONFIGURATIONS)}, n_channel = {N_CHANNEL}, n_sample = {N_SAMPLE}"
+    )
+    print(f"{'n_filter':>8} {'individual [s]':>15} {'sweep [s]':>10} {'speedup':>8}")
+    for n_filter in N_FILTER_VALUES:
+        filters = [
+            sg.LMSFilter(n_filter, 0, N_CHANNEL, **configuration)
+            for configuration in CONFIGURATIONS
+        ]
+        short = slice(0, 2 * n_filter)
+        for filt in filters:  # jit warmup
+            filt.apply(witness[:, short], target[short])
+        sg.lms.lms_parameter_sweep(
+            witness[:, short], target[short], n_filter, 0, CONFIGURATIONS
+        )
+
+        t_individual = timeit(
+            lambda: [filt.apply(witness, target) for filt in filters], number=1
+        )
+        t_sweep = timeit(
+            lambda: sg.lms.lms_parameter_sweep(
+                witness, target, n_filter, 0, CONFIGURATIONS
+            ),
+            number=1,
+        )
+        print(
+            f"{n_filter:>8} {t_individual:>15.3g} {t_sweep:>10.3g} {t_individual / t_sweep:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Measure storing and loading large Wiener filters with FilterBase.save() and FilterBase.load()."""
+
+import os
+import tempfile
+from timeit import timeit
+
+import numpy as np
+
+import saftig as sg
+
+N_CHANNEL = 32
+N_FILTER_VALUES = [1024, 4096, 16384]
+N_REPETITION = 5
+
+
+def main():
+    """save and load filters with random coefficients"""
+    print(f"n_channel = {N_CHANNEL}, best of {N_REPETITION}")
+    print(
+        f"{'n_filter':>8} {'size [MB]':>10} {'save [ms]':>10} {'load mmap [ms]':>15} {'load read [ms]':>15}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "filter.saftig")
+        for n_filter in N_FILTER_VALUES:
+            filt = sg.WienerFilter(n_filter, 0, N_CHANNEL)
+            filt.filter_state = np.random.normal(size=(N_CHANNEL, n_filter))
+
+            times = [
+                min(timeit(function, number=1) for _ in range(N_REPETITION))
+                for function in (
+                    lambda: filt.save(path),
+                    lambda: sg.FilterBase.load(path, mmap=True),
+                    lambda: sg.FilterBase.load(path, mmap=False),
+                )
+            ]
+            print(
+                f"{n_filter:>8} {os.path.getsize(path) / 1e6:>10.1f} {1e3 * times[0]:>10.2f} "
+                f"{1e3 * times[1]:>15.2f} {1e3 * times[2]:>15.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Compare accuracy and throughput of the wf_apply() precision options."""
+
+from timeit import timeit
+
+import numpy as np
+
+from saftig.wf import wf_apply, APPLY_DTYPES
+
+N_FILTER_VALUES = [32, 256, 2048, 8192]
+N_CHANNEL = 2
+N_SAMPLE = int(2e5)
+
+
+def main():
+    """measure all precisions for a range of filter lengths"""
+    witness = np.random.normal(size=(N_CHANNEL, N_SAMPLE))
+    print(f"n_channel = {N_CHANNEL}, n_sample = {N_SAMPLE}")
+    print(f"{'n_filter':>8} {'dtype':>12} {'samples/s':>12} {'max error':>10}")
+    for n_filter in N_FILTER_VALUES:
+        WFC = np.random.normal(size=(N_CHANNEL, n_filter))
+        reference = wf_apply(WFC, witness)
+
+        for dtype in APPLY_DTYPES:
+            repetitions = 3
+            runtime = timeit(lambda: wf_apply(WFC, witness, dtype), number=repetitions)
+            error = np.max(np.abs(wf_apply(WFC, witness, dtype) - reference))
+            print(
+                f"{n_filter:>8} {str(dtype):>12} {repetitions * N_SAMPLE / runtime:>12.3g} {float(error):>10.2e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
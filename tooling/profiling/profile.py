@@ -20,11 +20,20 @@ IGNORE_FILTER_OPTIONS = {"coefficient_clipping", "step_scale"}
 # filter, additional_filter_config, skip_conditioning
 FILTER_CONFIGURATIONS = [
     (sg.WienerFilter, {}, False),
+    (sg.FrequencyDomainWienerFilter, {}, False),
     (sg.UpdatingWienerFilter, {"context_pre": 3000}, True),
     (sg.LMSFilter, {"normalized": True, "coefficient_clipping": 10}, False),
     (sg.LMSFilterC, {"normalized": True}, False),
+    (
+        sg.FrequencyDomainLMSFilter,
+        {"normalized": True, "coefficient_clipping": 10},
+        False,
+    ),
+    (sg.RLSFilter, {"algorithm": "conventional"}, False),
+    (sg.RLSFilter, {"algorithm": "fast_transversal"}, False),
     (sg.PolynomialLMSFilter, {"order": 1, "coefficient_clipping": 10}, False),
     (sg.PolynomialLMSFilter, {"order": 3, "coefficient_clipping": 10}, False),
+    (sg.VolterraLMSFilter, {"lag_bandwidth": 2, "coefficient_clipping": 10}, False),
 ]
 
 if DEBUG: